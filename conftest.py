@@ -0,0 +1,2 @@
+# test_server.py is a manual smoke server that blocks on import, not a test module
+collect_ignore = ['test_server.py']
@@ -1,14 +1,30 @@
 import asyncio
 import logging
+import os
 from typing import Dict, List
 from .base_agent import Agent
+from .message_bus import MessageBus
+from .batch_store import BatchStore
+from .agent_process import ProcessAgentGroup, UsageSampler, watch_config
+from .compute import LoopLagMonitor
+from .memory import MemoryGovernor
 from .data_collector_agent import DataCollectorAgent
 from .data_processor_agent import DataProcessorAgent
+from ..config import config
 
 class AgentManager:
     def __init__(self):
         self.agents: Dict[str, Agent] = {}
+        self.groups: Dict[str, ProcessAgentGroup] = {}
         self.tasks: List[asyncio.Task] = []
+        self.usage = UsageSampler(os.getpid())
+        self.loop_monitor = LoopLagMonitor()
+        self.memory_governor = MemoryGovernor(
+            budget=config.memory.budget_mb * 2**20 or None,
+            interval=config.memory.check_interval
+        )
+        self.bus = MessageBus(maxsize=config.messaging.mailbox_size)
+        self.batch_store = BatchStore(use_shared_memory=config.messaging.shared_memory)
         
         # Set up logging
         logging.basicConfig(
@@ -18,16 +34,40 @@ class AgentManager:
         )
         self.logger = logging.getLogger('agent_manager')
         
-    def register_agent(self, agent: Agent):
-        """Register a new agent in the system"""
+    def register_agent(self, agent: Agent, placement: str = "local", replicas: int = 1):
+        """Register a new agent in the system
+        
+        ``placement="local"`` runs the agent as a task on the manager's event
+        loop; ``placement="process"`` runs ``replicas`` copies of it in worker
+        processes, rebuilt there from the agent's class, id and name.
+        """
+        if placement not in ("local", "process"):
+            raise ValueError(f"Unknown agent placement: {placement}")
         self.agents[agent.agent_id] = agent
-        self.logger.info(f"Registered agent: {agent.name} ({agent.agent_id})")
+        
+        if placement == "process":
+            if not self.batch_store.use_shared_memory:
+                # Batches must be reachable from the worker processes
+                self.batch_store = BatchStore(use_shared_memory=True)
+                for other in self.agents.values():
+                    other.batch_store = self.batch_store
+            self.groups[agent.agent_id] = ProcessAgentGroup(
+                agent, replicas=replicas, mailbox_size=config.messaging.mailbox_size,
+                vnodes=config.sharding.virtual_nodes
+            )
+            self.bus.register(agent.agent_id)
+        else:
+            agent.attach_bus(self.bus, self.batch_store)
+        self.logger.info(f"Registered agent: {agent.name} ({agent.agent_id}, {placement})")
         
     async def start_agent(self, agent_id: str):
         """Start a specific agent"""
         if agent_id in self.agents:
             agent = self.agents[agent_id]
-            task = asyncio.create_task(agent.run())
+            if agent_id in self.groups:
+                task = asyncio.create_task(self.groups[agent_id].run(self.bus))
+            else:
+                task = asyncio.create_task(agent.run())
             self.tasks.append(task)
             self.logger.info(f"Started agent: {agent.name}")
             
@@ -35,9 +75,18 @@ class AgentManager:
         """Stop a specific agent"""
         if agent_id in self.agents:
             agent = self.agents[agent_id]
-            agent.is_active = False
+            if agent_id in self.groups:
+                self.groups[agent_id].stop()
+            else:
+                agent.stop()
             self.logger.info(f"Stopped agent: {agent.name}")
             
+    async def scale_agent(self, agent_id: str, replicas: int):
+        """Change the number of worker processes of a process-placed agent"""
+        if agent_id not in self.groups:
+            raise ValueError(f"Agent {agent_id} is not running in worker processes")
+        await self.groups[agent_id].scale(replicas)
+            
     async def start_all_agents(self):
         """Start all registered agents"""
         for agent_id in self.agents:
@@ -50,7 +99,14 @@ class AgentManager:
             
     async def run(self):
         """Main run loop for the agent manager"""
+        config_watcher = asyncio.create_task(watch_config())
         try:
+            self.loop_monitor.start()
+            # Worker processes govern their own agents
+            self.memory_governor.start(
+                lambda: [agent for agent_id, agent in self.agents.items() if agent_id not in self.groups]
+            )
+            
             # Start all agents
             await self.start_all_agents()
             
@@ -61,17 +117,32 @@ class AgentManager:
             self.logger.error(f"Error in agent manager: {str(e)}")
         finally:
             await self.stop_all_agents()
+            # Let worker processes shut down before their batches are released
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.batch_store.close()
+            self.loop_monitor.stop()
+            self.memory_governor.stop()
+            config_watcher.cancel()
             
     def get_agent_status(self, agent_id: str) -> dict:
         """Get the current status of a specific agent"""
+        if agent_id in self.groups:
+            return self.groups[agent_id].get_status()
         if agent_id in self.agents:
             agent = self.agents[agent_id]
-            return {
+            status = {
                 'name': agent.name,
+                'placement': 'local',
                 'is_active': agent.is_active,
                 'last_activity': agent.last_activity,
-                'state': agent.get_state()
+                'state': agent.get_state(),
+                'process': self.usage.sample(),
+                'loop_lag': self.loop_monitor.get_stats(),
+                'memory': agent.memory_usage()
             }
+            if hasattr(agent, 'compute'):
+                status['compute'] = agent.compute.get_stats()
+            return status
         return None
         
     def get_system_status(self) -> dict:
@@ -79,4 +150,16 @@ class AgentManager:
         return {
             agent_id: self.get_agent_status(agent_id)
             for agent_id in self.agents
-        } 
\ No newline at end of file
+        }
+        
+    def get_loop_metrics(self) -> dict:
+        """Get event loop lag statistics of the manager process"""
+        return self.loop_monitor.get_stats()
+        
+    def get_memory_metrics(self) -> dict:
+        """Get the memory budget and what the manager process released to stay under it"""
+        return self.memory_governor.get_stats()
+        
+    def get_message_metrics(self) -> dict:
+        """Get queue depth and latency metrics for every message edge"""
+        return self.bus.get_metrics()
@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Type
+from .base_agent import Agent
+from .batch_store import BatchStore
+from .message_bus import MessageBus
+from .consistent_hash import HashRing
+from .compute import LoopLagMonitor
+from .memory import MemoryGovernor
+from ..config import config
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+STATUS_INTERVAL = 5.0
+POLL_INTERVAL = 0.5
+JOIN_TIMEOUT = 10.0
+HANDOFF_TIMEOUT = 60.0
+CONFIG_CHECK_INTERVAL = 30.0
+
+def process_usage(pid: int) -> Optional[Dict[str, float]]:
+    """Cumulative CPU seconds and resident memory of a process, or None if it is gone"""
+    try:
+        if psutil is not None:
+            proc = psutil.Process(pid)
+            cpu = proc.cpu_times()
+            return {'cpu_seconds': cpu.user + cpu.system, 'rss_bytes': proc.memory_info().rss}
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            rss_pages = int(f.read().split()[1])
+        return {
+            'cpu_seconds': (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'),
+            'rss_bytes': rss_pages * os.sysconf('SC_PAGE_SIZE')
+        }
+    except Exception:
+        return None
+
+async def watch_config(interval: float = CONFIG_CHECK_INTERVAL):
+    """Reload the configuration whenever .env or the environment changes"""
+    logger = logging.getLogger('config')
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if config.reload_if_changed():
+                logger.info("Configuration changed, reloaded")
+        except Exception as e:
+            logger.error(f"Error reloading configuration: {str(e)}")
+
+class UsageSampler:
+    """CPU percentage and RSS of a process, measured between successive samples"""
+
+    def __init__(self, pid: int, min_interval: float = 1.0):
+        self.pid = pid
+        self.min_interval = min_interval
+        self.last = None
+        self.cached = None
+
+    def sample(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        if self.cached is not None and now - self.last[0] < self.min_interval:
+            return self.cached
+        usage = process_usage(self.pid)
+        if usage is None:
+            return {'pid': self.pid}
+        cpu_percent = 0.0
+        if self.last is not None and now > self.last[0]:
+            cpu_percent = 100.0 * (usage['cpu_seconds'] - self.last[1]) / (now - self.last[0])
+        self.last = (now, usage['cpu_seconds'])
+        self.cached = {
+            'pid': self.pid,
+            'cpu_percent': round(cpu_percent, 1),
+            'cpu_seconds': round(usage['cpu_seconds'], 2),
+            'rss_bytes': usage['rss_bytes']
+        }
+        return self.cached
+
+def run_agent_process(agent_cls: Type[Agent], agent_id: str, name: str, replica: int,
+                      inbox, outbox, mailbox_size: int):
+    """Entry point of a worker process hosting one replica of an agent"""
+    logging.basicConfig(
+        filename='agent_system.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(_host_agent(agent_cls, agent_id, name, replica, inbox, outbox, mailbox_size))
+    except KeyboardInterrupt:
+        pass
+
+async def _host_agent(agent_cls: Type[Agent], agent_id: str, name: str, replica: int,
+                      inbox, outbox, mailbox_size: int):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def forward(sender_id: str, target_id: str, content: Dict[str, Any]):
+        # Every other agent lives in the parent (or another worker); route via the parent
+        outbox.put(('message', sender_id, target_id, content))
+
+    bus = MessageBus(maxsize=mailbox_size, forward=forward)
+    store = BatchStore(use_shared_memory=True)
+    agent = agent_cls(agent_id, name)
+    agent.attach_bus(bus, store)
+    loop_monitor = LoopLagMonitor()
+    loop_monitor.start()
+    memory_governor = MemoryGovernor(
+        budget=config.memory.budget_mb * 2**20 or None,
+        interval=config.memory.check_interval
+    )
+    memory_governor.start(lambda: [agent])
+
+    async def pump_inbox():
+        while agent.is_active:
+            # Wait for data without holding the queue's read lock: a replica
+            # that dies while blocked in get() leaves it locked for its restart
+            if not await loop.run_in_executor(executor, inbox._reader.poll, POLL_INTERVAL):
+                continue
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                continue
+            if item is None:
+                # Let the agent work through what it already received
+                while bus.pending(agent_id):
+                    await asyncio.sleep(POLL_INTERVAL)
+                agent.stop()
+                break
+            sender_id, content = item
+            await bus.send(sender_id, agent_id, content)
+
+    async def report_status():
+        while agent.is_active:
+            status = {
+                'is_active': agent.is_active,
+                'last_activity': agent.last_activity,
+                'state': agent.get_state(),
+                'loop_lag': loop_monitor.get_stats(),
+                'memory': agent.memory_usage(),
+                'memory_governor': memory_governor.get_stats()
+            }
+            if hasattr(agent, 'compute'):
+                status['compute'] = agent.compute.get_stats()
+            outbox.put(('status', replica, os.getpid(), status))
+            await asyncio.sleep(STATUS_INTERVAL)
+
+    tasks = [
+        asyncio.create_task(pump_inbox()),
+        asyncio.create_task(report_status()),
+        asyncio.create_task(watch_config())
+    ]
+    try:
+        await agent.run()
+    finally:
+        for task in tasks:
+            task.cancel()
+        loop_monitor.stop()
+        memory_governor.stop()
+        executor.shutdown(wait=False)
+
+class AgentProcess:
+    """Parent-side handle of one worker process hosting an agent replica"""
+
+    def __init__(self, group: 'ProcessAgentGroup', replica: int):
+        self.group = group
+        self.replica = replica
+        # The inbox outlives the process, so queued messages survive a restart
+        self.inbox = group.ctx.Queue(maxsize=group.mailbox_size)
+        self.process = None
+        self.sampler = None
+        self.restarts = 0
+        self.failed_at = None
+        self.status: Dict[str, Any] = {}
+
+    def start(self):
+        self.process = self.group.ctx.Process(
+            target=run_agent_process,
+            args=(self.group.agent_cls, self.group.agent_id, self.group.name, self.replica,
+                  self.inbox, self.group.outbox, self.group.mailbox_size),
+            name=f"{self.group.agent_id}-{self.replica}"
+        )
+        self.process.start()
+        self.sampler = UsageSampler(self.process.pid)
+        self.failed_at = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def check(self, max_restarts: int, logger: logging.Logger):
+        """Restart the process with exponential backoff if it has died"""
+        if self.process is None or self.is_alive():
+            return
+        now = time.monotonic()
+        if self.failed_at is None:
+            self.failed_at = now
+            logger.error(f"Replica {self.process.name} exited with code {self.process.exitcode}")
+        if self.restarts >= max_restarts:
+            return
+        if now - self.failed_at >= min(2 ** self.restarts, 60):
+            self.restarts += 1
+            logger.info(f"Restarting replica {self.process.name} (restart {self.restarts})")
+            self.start()
+
+    def stop(self, wait: bool = False):
+        """Ask the process to exit after its queued messages; a full inbox terminates it unless ``wait``"""
+        if not self.is_alive():
+            return
+        try:
+            self.inbox.put(None, wait, HANDOFF_TIMEOUT if wait else None)
+        except queue.Full:
+            self.process.terminate()
+
+    def join(self, timeout: float = JOIN_TIMEOUT):
+        if self.process is None:
+            return
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
+            'replica': self.replica,
+            'alive': self.is_alive(),
+            'restarts': self.restarts,
+            'exitcode': self.process.exitcode if self.process is not None else None,
+            'last_activity': self.status.get('last_activity'),
+            'state': self.status.get('state', {}),
+            'loop_lag': self.status.get('loop_lag', {}),
+            'compute': self.status.get('compute', {}),
+            'memory': self.status.get('memory', {}),
+            'memory_governor': self.status.get('memory_governor', {})
+        }
+        if self.is_alive():
+            status.update(self.sampler.sample())
+        return status
+
+class ProcessAgentGroup:
+    """A logical agent served by one or more worker processes
+
+    The group owns the agent's mailbox on the parent bus and forwards each
+    message to a replica over bounded multiprocessing queues, so a slow
+    replica still pushes back on its senders. Messages that name a
+    ``partition`` (or ``source``) go to the replica owning that key on a
+    consistent hash ring, so per-partition state stays on one replica; other
+    messages are spread round-robin. Replicas send their own
+    messages and periodic status reports back through a shared outbox. Dead
+    replicas are restarted with exponential backoff, up to ``max_restarts``.
+    """
+
+    def __init__(self, agent: Agent, replicas: int = 1, mailbox_size: int = 100, max_restarts: int = 5,
+                 vnodes: int = 64):
+        self.agent_cls = type(agent)
+        self.agent_id = agent.agent_id
+        self.name = agent.name
+        self.mailbox_size = mailbox_size
+        self.max_restarts = max_restarts
+        self.ctx = mp.get_context('spawn')
+        self.outbox = self.ctx.Queue()
+        self.replicas: List[AgentProcess] = [AgentProcess(self, i) for i in range(replicas)]
+        self.ring = HashRing(range(replicas), vnodes=vnodes)
+        self.owners: Dict[str, int] = {}
+        self.is_active = True
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.logger = logging.getLogger(f"agent.{self.name}")
+        # Held while a message is routed, and for the whole of a rebalance
+        self.routing = asyncio.Lock()
+        # Replicas acknowledge released partitions to this id, which never reaches the bus
+        self.control_id = f"{self.agent_id}.control"
+        self.handoffs: Dict[int, asyncio.Future] = {}
+        self._next = 0
+        self._next_handoff = 0
+        self._tasks: List[asyncio.Task] = []
+
+    async def run(self, bus: MessageBus):
+        """Start the replicas and route messages until the group is stopped"""
+        for replica in self.replicas:
+            replica.start()
+        self.logger.info(f"Started {len(self.replicas)} worker process(es) for {self.name}")
+
+        self._tasks = [
+            asyncio.create_task(self._forward(bus)),
+            asyncio.create_task(self._pump_outbox(bus)),
+            asyncio.create_task(self._supervise())
+        ]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            if self.is_active:
+                raise
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        self.is_active = False
+        for task in self._tasks:
+            task.cancel()
+
+    def get_status(self) -> Dict[str, Any]:
+        replicas = [replica.get_status() for replica in self.replicas]
+        activity = [r['last_activity'] for r in replicas if r['last_activity'] is not None]
+        return {
+            'name': self.name,
+            'placement': 'process',
+            'is_active': self.is_active and any(r['alive'] for r in replicas),
+            'last_activity': max(activity) if activity else None,
+            'state': replicas[0]['state'] if replicas else {},
+            'replicas': replicas
+        }
+
+    async def scale(self, replicas: int):
+        """Add or remove replicas and hand moved partitions over to their new owners
+
+        Routing is paused for the whole hand-off. Surviving replicas that lose
+        partitions first work through their backlog, then save and drop that
+        state and acknowledge it; removed replicas save everything on exit. Only
+        then do messages reach the new owners, which load the saved state.
+        """
+        current = len(self.replicas)
+        if replicas < 1 or replicas == current:
+            return
+        loop = asyncio.get_running_loop()
+        async with self.routing:
+            for index in range(current, replicas):
+                replica = AgentProcess(self, index)
+                self.replicas.append(replica)
+                self.ring.add(index)
+                if self._tasks:
+                    replica.start()
+            removed = []
+            for index in range(current - 1, replicas - 1, -1):
+                self.ring.remove(index)
+                removed.append(self.replicas.pop())
+
+            moved: Dict[int, List[str]] = {}
+            for key, old in self.owners.items():
+                new = self.ring.get(key)
+                if new != old:
+                    if old < len(self.replicas):
+                        moved.setdefault(old, []).append(key)
+                    self.owners[key] = new
+            handoffs = []
+            for index, keys in moved.items():
+                self._next_handoff += 1
+                self.handoffs[self._next_handoff] = loop.create_future()
+                handoffs.append(self._next_handoff)
+                await loop.run_in_executor(
+                    self.executor, self.replicas[index].inbox.put,
+                    (self.control_id, {'type': 'release_partitions', 'partitions': keys, 'handoff': self._next_handoff})
+                )
+
+            for replica in removed:
+                await loop.run_in_executor(self.executor, replica.stop, True)
+            await asyncio.gather(*(loop.run_in_executor(None, replica.join, HANDOFF_TIMEOUT) for replica in removed))
+            if handoffs and self._tasks:
+                try:
+                    await asyncio.wait_for(
+                        asyncio.gather(*(self.handoffs[handoff] for handoff in handoffs)), HANDOFF_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    self.logger.warning(f"Timed out waiting for {self.name} replicas to release moved partitions")
+            for handoff in handoffs:
+                self.handoffs.pop(handoff, None)
+        self.logger.info(
+            f"Scaled {self.name} from {current} to {replicas} replicas, "
+            f"moved {sum(len(keys) for keys in moved.values())} partitions"
+        )
+
+    def _pick_replica(self, message: Dict[str, Any]) -> AgentProcess:
+        content = message['content']
+        key = content.get('partition', content.get('source')) if isinstance(content, dict) else None
+        if key is not None:
+            index = self.ring.get(key)
+            self.owners[key] = index
+            return self.replicas[index]
+        alive = [replica for replica in self.replicas if replica.is_alive()] or self.replicas
+        replica = alive[self._next % len(alive)]
+        self._next += 1
+        return replica
+
+    async def _forward(self, bus: MessageBus):
+        loop = asyncio.get_running_loop()
+        while self.is_active:
+            message = await bus.receive(self.agent_id)
+            async with self.routing:
+                replica = self._pick_replica(message)
+                # Blocks while the replica's inbox is full
+                await loop.run_in_executor(self.executor, replica.inbox.put, (message['from'], message['content']))
+
+    async def _pump_outbox(self, bus: MessageBus):
+        loop = asyncio.get_running_loop()
+        while self.is_active:
+            try:
+                item = await loop.run_in_executor(self.executor, self.outbox.get, True, POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item[0] == 'message':
+                _, sender_id, target_id, content = item
+                if target_id == self.control_id:
+                    self._acknowledge(content)
+                else:
+                    await bus.send(sender_id, target_id, content)
+            elif item[0] == 'status':
+                _, index, pid, status = item
+                # Removed or restarted replicas may have reports still queued
+                if index < len(self.replicas) and self.replicas[index].pid == pid:
+                    self.replicas[index].status = status
+
+    def _acknowledge(self, content: Dict[str, Any]):
+        handoff = self.handoffs.get(content.get('handoff'))
+        if handoff is not None and not handoff.done():
+            handoff.set_result(content.get('partitions'))
+
+    async def _supervise(self):
+        while self.is_active:
+            await asyncio.sleep(1.0)
+            for replica in self.replicas:
+                replica.check(self.max_restarts, self.logger)
+
+    async def _shutdown(self):
+        for replica in self.replicas:
+            replica.stop()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, replica.join) for replica in self.replicas))
+        self.executor.shutdown(wait=False)
+        self.logger.info(f"Stopped worker processes for {self.name}")
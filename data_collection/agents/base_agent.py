@@ -1,17 +1,27 @@
 from abc import ABC, abstractmethod
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import asyncio
 from datetime import datetime
+import pandas as pd
+from .batch_store import BatchRef
+from .memory import estimate_size
 
 class Agent(ABC):
+    # Seconds between timer-driven process() calls; None wakes only on messages
+    tick_interval: Optional[float] = None
+    
     def __init__(self, agent_id: str, name: str):
         self.agent_id = agent_id
         self.name = name
         self.state = {}
-        self.messages = []
+        self.bus = None
+        self.batch_store = None
         self.is_active = True
         self.last_activity = datetime.now()
+        self._waiter = None
+        # Long-lived structures whose size is reported and governed, by name
+        self.tracked_memory: Dict[str, Any] = {}
         
         # Set up logging for this agent
         self.logger = logging.getLogger(f"agent.{name}")
@@ -23,31 +33,84 @@ class Agent(ABC):
     
     @abstractmethod
     async def process(self):
-        """Main processing loop for the agent"""
+        """Handle the work that is due: new messages or an elapsed timer"""
+        pass
+    
+    async def handle_message(self, message: Dict[str, Any]):
+        """Accept one incoming message; called before process() for every message"""
+        pass
+    
+    async def release_partitions(self, partitions: List[str]):
+        """Persist and drop the state of partitions that moved to another replica"""
         pass
     
+    async def _release(self, message: Dict[str, Any]):
+        content = message['content']
+        await self.release_partitions(content['partitions'])
+        # The sender holds the partitions' messages back until this arrives
+        await self.send_message(message['from'], {
+            'type': 'partitions_released',
+            'handoff': content.get('handoff'),
+            'partitions': content['partitions']
+        })
+    
     @abstractmethod
     async def cleanup(self):
         """Cleanup resources when agent is stopping"""
         pass
     
-    async def send_message(self, target_agent_id: str, message: Dict[str, Any]):
-        """Send a message to another agent"""
-        self.messages.append({
-            'timestamp': datetime.now(),
-            'from': self.agent_id,
-            'to': target_agent_id,
-            'content': message
-        })
-        self.logger.info(f"Sent message to {target_agent_id}")
+    def attach_bus(self, bus, batch_store=None):
+        """Connect the agent to a message bus and create its mailbox"""
+        self.bus = bus
+        self.batch_store = batch_store
+        bus.register(self.agent_id)
+        
+    def share_batch(self, data):
+        """Put a payload in the shared batch store and return a reference to send instead"""
+        if self.batch_store is None:
+            return data
+        return self.batch_store.put(data)
+        
+    def read_batch(self, payload) -> pd.DataFrame:
+        """Resolve a received payload (batch reference or raw records) to a DataFrame"""
+        if isinstance(payload, BatchRef):
+            df = self.batch_store.to_pandas(payload)
+            self.batch_store.release(payload)
+            return df
+        return pd.DataFrame(payload)
     
-    async def receive_message(self) -> Dict[str, Any]:
-        """Receive and process the next message in the queue"""
-        if self.messages:
-            message = self.messages.pop(0)
+    async def send_message(self, target_agent_id: str, message: Dict[str, Any]) -> bool:
+        """Send a message to another agent, waiting while its mailbox is full; returns whether it was delivered"""
+        if self.bus is None:
+            self.logger.warning(f"Cannot send message to {target_agent_id}: no message bus attached")
+            return False
+        if await self.bus.send(self.agent_id, target_agent_id, message):
+            self.logger.info(f"Sent message to {target_agent_id}")
+            return True
+        if self.batch_store is not None:
+            # Undeliverable; nobody else will release the shared batches
+            for value in message.values():
+                if isinstance(value, BatchRef):
+                    self.batch_store.release(value)
+        return False
+    
+    async def receive_message(self, timeout: Optional[float] = 0) -> Dict[str, Any]:
+        """Receive the next message from the mailbox, or None if none arrives within timeout"""
+        if self.bus is None:
+            return None
+        message = await self.bus.receive(self.agent_id, timeout)
+        if message:
             self.logger.info(f"Received message from {message['from']}")
-            return message
-        return None
+        return message
+    
+    async def wait_for_messages(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Wait for the next message, then drain whatever else is already queued"""
+        messages = []
+        message = await self.receive_message(timeout)
+        while message:
+            messages.append(message)
+            message = await self.receive_message()
+        return messages
     
     def update_state(self, new_state: Dict[str, Any]):
         """Update the agent's internal state"""
@@ -58,14 +121,71 @@ class Agent(ABC):
         """Get the current state of the agent"""
         return self.state.copy()
     
+    def track_memory(self, name: str, structure):
+        """Register a long-lived structure for size reporting and memory governance"""
+        self.tracked_memory[name] = structure
+        return structure
+    
+    def memory_usage(self) -> Dict[str, int]:
+        """Estimated bytes held by each tracked structure"""
+        return {
+            name: structure.nbytes if isinstance(getattr(structure, 'nbytes', None), int) else estimate_size(structure)
+            for name, structure in self.tracked_memory.items()
+        }
+    
+    def release_memory(self):
+        """Close tracked structures, deleting anything they spilled to disk"""
+        for structure in self.tracked_memory.values():
+            if hasattr(structure, 'close'):
+                structure.close()
+    
+    def stop(self):
+        """Stop the run loop, waking the agent if it is waiting for messages"""
+        self.is_active = False
+        if self._waiter is not None:
+            self._waiter.cancel()
+    
+    async def _next_messages(self, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        self._waiter = asyncio.ensure_future(self.wait_for_messages(timeout))
+        try:
+            return await self._waiter
+        except asyncio.CancelledError:
+            if self.is_active:
+                raise
+            return []
+        finally:
+            self._waiter = None
+    
     async def run(self):
-        """Main run loop for the agent"""
+        """Main run loop for the agent
+        
+        The agent sleeps until a message arrives or its next tick is due, so an
+        idle agent uses no CPU and messages are handled as soon as they land.
+        """
+        loop = asyncio.get_running_loop()
         try:
             await self.initialize()
+            next_tick = loop.time() if self.tick_interval is not None else None
             while self.is_active:
-                await self.process()
-                await asyncio.sleep(1)  # Prevent CPU overuse
+                timeout = None if next_tick is None else max(0.0, next_tick - loop.time())
+                messages = await self._next_messages(timeout)
+                if not self.is_active:
+                    break
+                    
+                for message in messages:
+                    if message['content'].get('type') == 'release_partitions':
+                        await self._release(message)
+                    else:
+                        await self.handle_message(message)
+                    
+                tick_due = next_tick is not None and loop.time() >= next_tick
+                if messages or tick_due:
+                    await self.process()
+                    self.last_activity = datetime.now()
+                if tick_due:
+                    next_tick = loop.time() + self.tick_interval
         except Exception as e:
             self.logger.error(f"Error in agent {self.name}: {str(e)}")
         finally:
-            await self.cleanup() 
\ No newline at end of file
+            await self.cleanup()
+            self.release_memory()
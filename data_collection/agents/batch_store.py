@@ -0,0 +1,179 @@
+import itertools
+import logging
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Union
+import pandas as pd
+from ..columnar_store import columnar_available, to_arrow_table
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+@dataclass(frozen=True)
+class BatchRef:
+    """Small, picklable handle to an immutable batch held by a BatchStore"""
+    batch_id: str
+    num_rows: int
+    columns: tuple
+    nbytes: int
+    shm_name: Optional[str] = None
+
+class BatchStore:
+    """Immutable columnar batches shared between agents by reference
+
+    Producers ``put`` a list of records or a DataFrame and send the returned
+    ``BatchRef`` instead of the data itself; consumers ``get`` the Arrow table
+    (or ``to_pandas``) and ``release`` the reference once they are done.
+
+    In-process batches are kept as Arrow tables and handed out without copying.
+    With ``use_shared_memory=True`` each batch is written once, as an Arrow IPC
+    stream, into a ``multiprocessing.shared_memory`` segment that agents in
+    other processes can map by name. Without pyarrow, DataFrames are stored and
+    shared as-is within the process.
+    """
+
+    def __init__(self, use_shared_memory: bool = False):
+        if use_shared_memory and not columnar_available():
+            raise ImportError("pyarrow is required for shared-memory batches")
+        self.use_shared_memory = use_shared_memory
+        self.batches: Dict[str, Any] = {}
+        self.segments: Dict[str, shared_memory.SharedMemory] = {}
+        self.created = set()
+        self._ids = itertools.count()
+        self.logger = logging.getLogger('batch_store')
+
+    def put(self, data: Union[List[Dict[str, Any]], pd.DataFrame]) -> BatchRef:
+        """Store a batch and return a reference to it"""
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        batch_id = f"{os.getpid()}-{next(self._ids)}"
+
+        if not columnar_available():
+            self.batches[batch_id] = df
+            return BatchRef(batch_id, len(df), tuple(df.columns), int(df.memory_usage(deep=False).sum()))
+
+        table = to_arrow_table(df)
+        if not self.use_shared_memory:
+            self.batches[batch_id] = table
+            return BatchRef(batch_id, table.num_rows, tuple(table.column_names), table.nbytes)
+
+        # Size the IPC stream first so it can be written straight into the segment
+        mock = pa.MockOutputStream()
+        _write_stream(mock, table)
+        size = mock.size()
+
+        segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        _write_stream(pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf)), table)
+        # Ownership passes to whoever releases the reference, possibly another
+        # process; the producer keeps no mapping of its own
+        _untrack(segment)
+        self.created.add(segment.name)
+        segment.close()
+        return BatchRef(batch_id, table.num_rows, tuple(table.column_names), size, shm_name=segment.name)
+
+    def get(self, ref: BatchRef):
+        """Return the batch as an Arrow table (or a DataFrame without pyarrow)"""
+        if ref.shm_name is None:
+            return self.batches[ref.batch_id]
+        segment = self._attach(ref.shm_name)
+        return pa.ipc.open_stream(pa.py_buffer(segment.buf)[:ref.nbytes]).read_all()
+
+    def to_pandas(self, ref: BatchRef) -> pd.DataFrame:
+        """Return the batch as a DataFrame
+
+        In-process numeric columns without nulls are zero-copy, read-only views
+        of the Arrow buffers: replacing a column is fine, in-place edits need a
+        ``copy()`` first. Shared-memory batches are copied out of the segment
+        before decoding, so no column (string columns stay Arrow-backed on
+        recent pandas) pins the segment and ``release`` can unlink it.
+        """
+        if ref.shm_name is None:
+            batch = self.get(ref)
+            return batch if isinstance(batch, pd.DataFrame) else batch.to_pandas(split_blocks=True)
+        segment = self._attach(ref.shm_name)
+        with segment.buf[:ref.nbytes] as view:
+            data = bytes(view)
+        return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+    def release(self, ref: BatchRef):
+        """Drop a batch once its consumer is done with it"""
+        self.batches.pop(ref.batch_id, None)
+        if ref.shm_name is None:
+            return
+        self.created.discard(ref.shm_name)
+        segment = self.segments.pop(ref.shm_name, None) or self._attach(ref.shm_name)
+        try:
+            segment.close()
+            _unlink(segment)
+        except BufferError:
+            # A table built on the segment is still alive; keep it until close()
+            self.segments[ref.shm_name] = segment
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Release every batch this store still holds"""
+        self.batches.clear()
+        for name in self.created - set(self.segments):
+            try:
+                self.segments[name] = _open_segment(name)
+            except FileNotFoundError:
+                pass  # already released by a consumer in another process
+        for name, segment in list(self.segments.items()):
+            try:
+                segment.close()
+                _unlink(segment)
+            except FileNotFoundError:
+                pass
+            except BufferError as e:
+                self.logger.warning(f"Could not release shared batch {name}: {str(e)}")
+        self.segments.clear()
+        self.created.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'batches': len(self.batches),
+            'segments': len(self.segments),
+            'nbytes': sum(getattr(b, 'nbytes', 0) for b in self.batches.values()) +
+                      sum(s.size for s in self.segments.values())
+        }
+
+    def _attach(self, name: str) -> shared_memory.SharedMemory:
+        segment = self.segments.get(name)
+        if segment is None:
+            segment = _open_segment(name)
+            self.segments[name] = segment
+        return segment
+
+def _write_stream(sink, table):
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        _untrack(segment)
+        return segment
+
+def _unlink(segment: shared_memory.SharedMemory):
+    # unlink() unregisters the segment from the resource tracker, so register
+    # it again first to keep the tracker's bookkeeping balanced
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.register(segment._name, 'shared_memory')
+    segment.unlink()
+
+def _untrack(segment: shared_memory.SharedMemory):
+    # The resource tracker would otherwise unlink (or warn about) the segment
+    # when this process exits, even though another process may still own it
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        try:
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except Exception:
+            pass
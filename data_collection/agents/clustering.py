@@ -0,0 +1,226 @@
+import itertools
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import DBSCAN, MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
+
+NOISE = -1
+
+def summarize_clusters(features: pd.DataFrame, labels: np.ndarray) -> Dict[str, Any]:
+    """Size, centroid and std of every cluster from a single groupby (noise excluded)"""
+    clustered = labels != NOISE
+    grouped = features[clustered].groupby(labels[clustered])
+    stats = grouped.agg(['mean', 'std'])
+    return {
+        'size': grouped.size(),
+        'mean': stats.xs('mean', axis=1, level=1),
+        'std': stats.xs('std', axis=1, level=1)
+    }
+
+class ClusteringBackend:
+    """Base of the pattern clustering backends
+
+    ``fit_predict`` fits on at most ``sample_size`` rows, a seeded random sample
+    of larger inputs, and then assigns every row to the fitted clusters, so the
+    cost of a cycle is bounded however large the batch is. The centroids of the
+    last cycle are cached and new clusters take the id of the cached centroid
+    they match, so a cluster keeps its id from one cycle to the next.
+    """
+
+    # Backends whose ids are stable by construction skip the centroid matching
+    stable_ids = False
+
+    def __init__(self, sample_size: int = 5000, random_state: int = 0):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(random_state)
+        self.n_features: Optional[int] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.centroid_ids: Optional[np.ndarray] = None
+        self.next_id = 0
+        self.stats = {'fits': 0, 'sampled_fits': 0}
+
+    def reset(self):
+        """Forget the fitted state, e.g. when the feature space changes"""
+        self.centroids = None
+        self.centroid_ids = None
+        self.next_id = 0
+
+    def _fit(self, X: np.ndarray, fraction: float):
+        raise NotImplementedError
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def fit_predict(self, features: pd.DataFrame) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Cluster a batch; returns the label of every row and the cluster summary"""
+        X = features.to_numpy(dtype=np.float64, na_value=0.0)
+        if self.n_features is not None and X.shape[1] != self.n_features:
+            self.reset()
+        self.n_features = X.shape[1]
+
+        sample = X
+        if len(X) > self.sample_size:
+            sample = X[self.rng.choice(len(X), self.sample_size, replace=False)]
+            self.stats['sampled_fits'] += 1
+        self._fit(sample, len(sample) / len(X))
+        self.stats['fits'] += 1
+
+        labels = self._predict(X)
+        summary = summarize_clusters(features, labels)
+        if not self.stable_ids:
+            labels, summary = self._match_ids(labels, summary)
+        self.centroids = summary['mean'].to_numpy()
+        self.centroid_ids = summary['mean'].index.to_numpy()
+        return labels, summary
+
+    def _match_ids(self, labels: np.ndarray, summary: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Relabel clusters with the ids of the nearest cached centroids"""
+        raw_ids = summary['mean'].index.to_numpy()
+        new_ids = np.full(len(raw_ids), NOISE)
+        if self.centroids is not None and len(self.centroids) and len(raw_ids):
+            distances = np.linalg.norm(summary['mean'].to_numpy()[:, None, :] - self.centroids[None, :, :], axis=2)
+            rows, cols = linear_sum_assignment(distances)
+            new_ids[rows] = self.centroid_ids[cols]
+        self.next_id = max(self.next_id, int(new_ids.max()) + 1 if len(new_ids) else 0)
+        unmatched = new_ids == NOISE
+        new_ids[unmatched] = np.arange(self.next_id, self.next_id + unmatched.sum())
+        self.next_id += int(unmatched.sum())
+
+        lookup = np.full(int(raw_ids.max()) + 2 if len(raw_ids) else 1, NOISE)
+        lookup[raw_ids] = new_ids
+        labels = np.where(labels == NOISE, NOISE, lookup[labels])
+        summary = {name: part.set_axis(new_ids, axis=0) for name, part in summary.items()}
+        return labels, summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, backend=type(self).__name__, clusters=0 if self.centroids is None else len(self.centroids))
+
+class DBSCANBackend(ClusteringBackend):
+    """DBSCAN fitted on the sample; rows are labelled by their nearest core sample within ``eps``
+
+    Without sampling this reproduces DBSCAN's labels. When sampling, ``min_samples``
+    is scaled by the sampled fraction so the density threshold stays the same.
+    """
+
+    def __init__(self, eps: float = 0.5, min_samples: int = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.eps = eps
+        self.min_samples = min_samples
+        self.core_labels: Optional[np.ndarray] = None
+        self.index: Optional[NearestNeighbors] = None
+
+    def _fit(self, X: np.ndarray, fraction: float):
+        min_samples = max(2, int(round(self.min_samples * fraction)))
+        model = DBSCAN(eps=self.eps, min_samples=min_samples).fit(X)
+        core = model.core_sample_indices_
+        self.core_labels = model.labels_[core]
+        self.index = NearestNeighbors(n_neighbors=1).fit(X[core]) if len(core) else None
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        if self.index is None:
+            return np.full(len(X), NOISE)
+        distances, nearest = self.index.kneighbors(X)
+        return np.where(distances[:, 0] <= self.eps, self.core_labels[nearest[:, 0]], NOISE)
+
+class GridDensityBackend(ClusteringBackend):
+    """Density clustering on a grid of ``eps``-sized cells
+
+    Rows are bucketed by their first ``max_dims`` coordinates (the leading PCA
+    components); cells holding at least ``min_samples`` rows are dense, and
+    adjacent dense cells form a cluster. Sparse cells next to a dense cell
+    join its cluster, other rows are noise. Fitting is O(n log n) and
+    assigning a row is a hash lookup.
+    """
+
+    def __init__(self, eps: float = 0.5, min_samples: int = 5, max_dims: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.eps = eps
+        self.min_samples = min_samples
+        self.max_dims = max_dims
+        self.cell_labels: Dict[Tuple[int, ...], int] = {}
+
+    def _cells(self, X: np.ndarray) -> np.ndarray:
+        return np.floor(X[:, :self.max_dims] / self.eps).astype(np.int64)
+
+    def _fit(self, X: np.ndarray, fraction: float):
+        min_samples = max(2, int(round(self.min_samples * fraction)))
+        cells, counts = np.unique(self._cells(X), axis=0, return_counts=True)
+        keys = [tuple(cell) for cell in cells]
+        dense = {key: i for i, key in enumerate(k for k, c in zip(keys, counts) if c >= min_samples)}
+        offsets = [o for o in itertools.product((-1, 0, 1), repeat=cells.shape[1]) if any(o)]
+
+        edges = [
+            (i, dense[neighbour])
+            for key, i in dense.items()
+            for neighbour in (tuple(np.add(key, o)) for o in offsets)
+            if neighbour in dense
+        ]
+        rows, cols = zip(*edges) if edges else ((), ())
+        graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(dense), len(dense)))
+        _, components = connected_components(graph, directed=False)
+
+        self.cell_labels = {key: int(components[i]) for key, i in dense.items()}
+        for key in keys:
+            if key in dense:
+                continue
+            for o in offsets:
+                neighbour = tuple(np.add(key, o))
+                if neighbour in dense:
+                    self.cell_labels[key] = int(components[dense[neighbour]])
+                    break
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        cells, inverse = np.unique(self._cells(X), axis=0, return_inverse=True)
+        labels = np.array([self.cell_labels.get(tuple(cell), NOISE) for cell in cells], dtype=np.int64)
+        return labels[inverse.reshape(-1)]
+
+class MiniBatchKMeansBackend(ClusteringBackend):
+    """MiniBatchKMeans updated with ``partial_fit`` every cycle
+
+    The centroids persist between cycles, so each cycle continues from the
+    previous solution and cluster ids stay stable by construction. Every row
+    is assigned to its nearest centroid; there is no noise label.
+    """
+
+    stable_ids = True
+
+    def __init__(self, n_clusters: int = 8, batch_size: int = 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.model: Optional[MiniBatchKMeans] = None
+
+    def reset(self):
+        super().reset()
+        self.model = None
+
+    def _fit(self, X: np.ndarray, fraction: float):
+        if self.model is None:
+            if len(X) < self.n_clusters:
+                return
+            self.model = MiniBatchKMeans(n_clusters=self.n_clusters, batch_size=self.batch_size, n_init=3, random_state=0)
+        self.model.partial_fit(X)
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        if self.model is None:
+            return np.full(len(X), NOISE)
+        return self.model.predict(X)
+
+BACKENDS = {
+    'dbscan': DBSCANBackend,
+    'grid': GridDensityBackend,
+    'kmeans': MiniBatchKMeansBackend
+}
+
+def make_backend(name: str, eps: float = 0.5, min_samples: int = 5, n_clusters: int = 8,
+                 sample_size: int = 5000) -> ClusteringBackend:
+    """Create a clustering backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend: {name}")
+    if name == 'kmeans':
+        return MiniBatchKMeansBackend(n_clusters=n_clusters, sample_size=sample_size)
+    return BACKENDS[name](eps=eps, min_samples=min_samples, sample_size=sample_size)
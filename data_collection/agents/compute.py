@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import functools
+import logging
+import multiprocessing as mp
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+class ComputeOffloader:
+    """Runs blocking CPU-bound calls off the event loop
+
+    ``mode`` selects the executor: ``"thread"`` (numpy/sklearn release the GIL
+    for most of their work), ``"process"`` (true parallelism; functions and
+    arguments must be picklable, so pass module-level functions) or
+    ``"inline"`` (run on the loop, for debugging). Each call can be given a
+    timeout; on timeout or cancellation the pending call is cancelled if it has
+    not started, while an already running thread finishes in the background
+    and its result is discarded.
+
+    Calls given the same ``key`` run one at a time, for functions that update
+    a shared model in place: the key stays held until the call has really
+    finished, so a call that timed out but is still running in a thread keeps
+    the next call on the same model waiting rather than fitting concurrently.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: Optional[int] = None,
+                 default_timeout: Optional[float] = None):
+        if mode not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown compute mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.executor: Optional[Executor] = None
+        self.stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'cancelled': 0, 'busy_seconds': 0.0}
+        # key -> [lock, number of calls holding or waiting for it]
+        self.keys: Dict[Hashable, list] = {}
+        self.logger = logging.getLogger('compute')
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.executor is None and self.mode == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+        elif self.executor is None and self.mode == "process":
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn"))
+        return self.executor
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None,
+                  key: Optional[Hashable] = None, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the executor and await its result
+
+        The timeout includes the time spent waiting for an earlier call with
+        the same ``key`` to finish.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        self.stats['calls'] += 1
+        try:
+            if self.mode == "inline":
+                return func(*args, **kwargs)
+            call = functools.partial(func, *args, **kwargs)
+            return await asyncio.wait_for(self._submit(call, key), timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            self.logger.warning(f"{getattr(func, '__name__', func)} timed out after {timeout}s")
+            raise
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.stats['busy_seconds'] += time.perf_counter() - started
+
+    async def _submit(self, call: Callable, key: Optional[Hashable]) -> Any:
+        if key is None:
+            return await asyncio.wrap_future(self._get_executor().submit(call))
+        entry = self.keys.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release(key, entry, acquired=False)
+            raise
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._release(key, entry)
+            raise
+        # Released when the call finishes, not when its caller stops waiting for it
+        loop = asyncio.get_running_loop()
+
+        def finished(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release, key, entry)
+
+        future.add_done_callback(finished)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, key: Hashable, entry: list, acquired: bool = True):
+        if acquired:
+            entry[0].release()
+        entry[1] -= 1
+        if entry[1] == 0 and self.keys.get(key) is entry:
+            del self.keys[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, mode=self.mode, busy_seconds=round(self.stats['busy_seconds'], 4))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+class LoopLagMonitor:
+    """Measures event loop responsiveness
+
+    A background task sleeps for ``interval`` seconds and records how much
+    later than requested it woke up; a loop blocked by synchronous work shows
+    up as lag of the same duration.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 240):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def get_stats(self) -> Dict[str, float]:
+        if not self.samples:
+            return {'samples': 0, 'last': 0.0, 'mean': 0.0, 'p95': 0.0, 'max': 0.0}
+        values = np.fromiter(self.samples, dtype=float)
+        return {
+            'samples': len(values),
+            'last': round(float(values[-1]), 4),
+            'mean': round(float(values.mean()), 4),
+            'p95': round(float(np.percentile(values, 95)), 4),
+            'max': round(self.max_lag, 4)
+        }
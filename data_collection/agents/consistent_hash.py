@@ -0,0 +1,76 @@
+import bisect
+import hashlib
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+NEIGHBORHOOD_COLUMNS = ('neighborhood', 'analysis_neighborhood')
+
+class HashRing:
+    """Consistent hash ring with virtual nodes
+
+    Each node is placed on the ring ``vnodes`` times, so keys spread evenly and
+    adding or removing a node only moves the keys adjacent to its points
+    (about 1/N of them) instead of reshuffling everything.
+    """
+
+    def __init__(self, nodes: Iterable[Hashable] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.nodes = set()
+        self._points: List[int] = []
+        self._owners: List[Hashable] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Hashable):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: Hashable):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def get(self, key: Any) -> Optional[Hashable]:
+        """Return the node that owns a key"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[index]
+
+    def assignments(self, keys: Iterable[Any]) -> Dict[Any, Hashable]:
+        return {key: self.get(key) for key in keys}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+def partition_key(source: str, neighborhood: Optional[str] = None) -> str:
+    """Partition name for a source, optionally narrowed to one neighborhood
+
+    The result is safe to use in file names.
+    """
+    if neighborhood is None or neighborhood == '':
+        return source
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', str(neighborhood)).strip('_').lower()
+    return f"{source}__{slug}" if slug else source
+
+def partition_records(source: str, records: List[Dict[str, Any]], by: str = 'source') -> Dict[str, List[Dict[str, Any]]]:
+    """Split a source's records into partitions (``by='source'`` or ``'neighborhood'``)"""
+    if by != 'neighborhood':
+        return {source: records}
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        neighborhood = next((record[c] for c in NEIGHBORHOOD_COLUMNS if record.get(c)), None)
+        partitions.setdefault(partition_key(source, neighborhood), []).append(record)
+    return partitions
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
@@ -1,31 +1,51 @@
-from .base_agent import MLEnhancedAgent
+from .ml_enhanced_agent import MLEnhancedAgent
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Optional
 import logging
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import r2_score, mean_squared_error
+from sklearn.metrics import mean_squared_error
 import joblib
 import os
 from ..config import config
+from ..columnar_store import ColumnarStore, columnar_available, field_equals, is_numeric_type
+from .consistent_hash import NEIGHBORHOOD_COLUMNS
+from .robust_stats import RobustBounds, bounds_for, numeric_values, outlier_counts
+from .stats_engine import StatsAccumulator, numeric_matrix
+from .trend_engine import TrendEngine
 import json
+import re
+
+def fit_regression_model(X: pd.DataFrame, y: pd.Series) -> RandomForestRegressor:
+    """Fit the per-source regression model (runs in the compute executor)"""
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    return model
 
 class DataAnalyzerAgent(MLEnhancedAgent):
     def __init__(self, agent_id: str, name: str):
         super().__init__(agent_id, name)
-        self.analyzed_data = {}
-        self.analysis_results = {}
+        self.analyzed_data = self.bounded_dict('analyzed_data')
+        self.pending_sources = []
+        self.analysis_results = self.bounded_dict('analysis_results')
+        # Statistics of every batch analyzed so far, per source
+        self.running_stats = self.bounded_dict('running_stats')
+        self.trend_engine = TrendEngine(
+            time_column=config.trends.time_column or None,
+            unit=config.trends.unit,
+            window=config.trends.window or None,
+            rolling_points=config.trends.rolling_points
+        )
         self.visualizations = {}
         self.regression_models = {}
         self.feature_importance = {}
         self.model_dir = "models"
         self.output_dir = "analysis_results"
+        self.processed_dir = "processed_data"
         os.makedirs(self.model_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
+        self.store = ColumnarStore(self.processed_dir) if columnar_available() else None
         
     async def initialize(self):
         """Initialize the data analyzer agent"""
@@ -52,10 +72,29 @@ class DataAnalyzerAgent(MLEnhancedAgent):
         except Exception as e:
             self.logger.error(f"Error saving models: {str(e)}")
             
+    async def handle_message(self, message: Dict[str, Any]):
+        """Store newly processed data for analysis"""
+        content = message['content']
+        if content.get('type') == 'processed_data':
+            # With neighborhood partitioning every partition is analyzed separately
+            key = content.get('partition', content['source'])
+            self.analyzed_data[key] = {
+                'data': self.read_batch(content['data']),
+                'patterns': content.get('patterns', []),
+                'bounds': content.get('bounds', {})
+            }
+            if key not in self.pending_sources:
+                self.pending_sources.append(key)
+                
     async def process(self):
         """Main processing loop with ML-enhanced analysis"""
         try:
-            for source_name, data in self.analyzed_data.items():
+            # Only sources updated since the last call are re-analyzed
+            updated, self.pending_sources = self.pending_sources, []
+            
+            for source_name in updated:
+                # Evicted (not spilled) partitions are skipped until new data arrives
+                data = self.analyzed_data.get(source_name)
                 if data:
                     start_time = datetime.now()
                     try:
@@ -114,12 +153,24 @@ class DataAnalyzerAgent(MLEnhancedAgent):
             df = pd.DataFrame(data['data'])
             patterns = data.get('patterns', [])
             
+            # One float matrix feeds the statistics kernel and the trend fits
+            numeric_df = numeric_matrix(df)
+            columns = [str(col) for col in numeric_df.columns]
+            values = numeric_values(numeric_df, numeric_df.columns)
+            batch_stats = StatsAccumulator(columns).update(values)
+            
+            previous = self.running_stats.get(source)
+            running = batch_stats if previous is None else previous.merge(batch_stats)
+            self.running_stats[source] = running
+            
+            summary = batch_stats.summary()
             analysis = {
-                'basic_stats': self._calculate_basic_stats(df),
-                'correlations': self._calculate_correlations(df),
-                'trends': self._analyze_trends(df),
+                'basic_stats': self._calculate_basic_stats(df, summary),
+                'correlations': summary['correlations'],
+                'trends': self._analyze_trends(df, columns, values),
+                'cumulative_stats': running.summary(correlations=False),
                 'patterns': self._analyze_patterns(patterns),
-                'anomalies': self._detect_anomalies(df)
+                'anomalies': self._detect_anomalies(df, data.get('bounds'))
             }
             
             return analysis
@@ -128,50 +179,29 @@ class DataAnalyzerAgent(MLEnhancedAgent):
             self.logger.error(f"Error performing advanced analysis: {str(e)}")
             return {}
             
-    def _calculate_basic_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _calculate_basic_stats(self, df: pd.DataFrame, summary: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate basic statistical measures"""
         try:
+            # Numeric columns come from the statistics kernel; only the rest are scanned here
+            other = df.select_dtypes(exclude=[np.number])
+            missing_values = dict(summary['missing_values'], **other.isnull().sum().to_dict())
             stats = {
-                'summary': df.describe().to_dict(),
-                'missing_values': df.isnull().sum().to_dict(),
+                'summary': summary['summary'],
+                'missing_values': missing_values,
                 'unique_values': df.nunique().to_dict(),
-                'skewness': df.skew().to_dict(),
-                'kurtosis': df.kurtosis().to_dict()
+                'skewness': summary['skewness'],
+                'kurtosis': summary['kurtosis']
             }
             return stats
         except Exception as e:
             self.logger.error(f"Error calculating basic stats: {str(e)}")
             return {}
             
-    def _calculate_correlations(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Calculate correlations between numeric variables"""
-        try:
-            numeric_df = df.select_dtypes(include=[np.number])
-            correlations = numeric_df.corr().to_dict()
-            return correlations
-        except Exception as e:
-            self.logger.error(f"Error calculating correlations: {str(e)}")
-            return {}
-            
-    def _analyze_trends(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_trends(self, df: pd.DataFrame, columns: List[str], values: np.ndarray) -> Dict[str, Any]:
         """Analyze trends in time series data"""
         try:
-            trends = {}
-            for col in df.select_dtypes(include=[np.number]).columns:
-                if len(df) > 1:
-                    # Simple linear regression
-                    X = np.arange(len(df)).reshape(-1, 1)
-                    y = df[col].values
-                    model = LinearRegression()
-                    model.fit(X, y)
-                    
-                    trends[col] = {
-                        'slope': float(model.coef_[0]),
-                        'intercept': float(model.intercept_),
-                        'r2_score': float(r2_score(y, model.predict(X))),
-                        'direction': 'increasing' if model.coef_[0] > 0 else 'decreasing'
-                    }
-            return trends
+            # Closed-form least squares of all columns at once, against time when the data has timestamps
+            return self.trend_engine.analyze(df, columns, values)
         except Exception as e:
             self.logger.error(f"Error analyzing trends: {str(e)}")
             return {}
@@ -189,21 +219,27 @@ class DataAnalyzerAgent(MLEnhancedAgent):
             self.logger.error(f"Error analyzing patterns: {str(e)}")
             return {}
             
-    def _detect_anomalies(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Detect anomalies in the data"""
+    def _detect_anomalies(self, df: pd.DataFrame, bounds: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Detect anomalies in the data using the IQR fences of every numeric column"""
         try:
-            anomalies = {}
-            for col in df.select_dtypes(include=[np.number]).columns:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
+            numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+            if not numeric_cols:
+                return {}
                 
+            # Fences computed by the processor are reused; only the rest are computed here
+            cached = RobustBounds.from_dict(bounds) if bounds else None
+            fences = bounds_for(df, numeric_cols, cached)
+            counts = outlier_counts(numeric_values(df, numeric_cols), fences)
+            
+            anomalies = {}
+            for i, col in enumerate(numeric_cols):
+                # Capped columns no longer lie outside their fences; count the processor's indicator
+                indicator = f"{col}_outlier"
+                count = int(df[indicator].sum()) if indicator in df.columns else int(counts[i])
                 anomalies[col] = {
-                    'count': len(df[(df[col] < lower_bound) | (df[col] > upper_bound)]),
-                    'lower_bound': float(lower_bound),
-                    'upper_bound': float(upper_bound)
+                    'count': count,
+                    'lower_bound': float(fences.lower[i]),
+                    'upper_bound': float(fences.upper[i])
                 }
             return anomalies
         except Exception as e:
@@ -229,6 +265,8 @@ class DataAnalyzerAgent(MLEnhancedAgent):
     def _create_time_series_plots(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Create time series plots"""
         try:
+            # plotly is imported on first use; it adds noticeably to agent start-up
+            import plotly.express as px
             plots = {}
             for col in df.select_dtypes(include=[np.number]).columns:
                 if 'timestamp' in df.columns:
@@ -242,6 +280,7 @@ class DataAnalyzerAgent(MLEnhancedAgent):
     def _create_correlation_matrix(self, df: pd.DataFrame) -> str:
         """Create correlation matrix heatmap"""
         try:
+            import plotly.express as px
             numeric_df = df.select_dtypes(include=[np.number])
             fig = px.imshow(numeric_df.corr(), title='Correlation Matrix')
             return fig.to_json()
@@ -252,6 +291,7 @@ class DataAnalyzerAgent(MLEnhancedAgent):
     def _create_distribution_plots(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Create distribution plots"""
         try:
+            import plotly.express as px
             plots = {}
             for col in df.select_dtypes(include=[np.number]).columns:
                 fig = px.histogram(df, x=col, title=f'Distribution of {col}')
@@ -264,14 +304,16 @@ class DataAnalyzerAgent(MLEnhancedAgent):
     def _create_trend_plots(self, df: pd.DataFrame, trends: Dict[str, Any]) -> Dict[str, Any]:
         """Create trend plots with regression lines"""
         try:
+            import plotly.graph_objects as go
             plots = {}
+            # x of every row on the axis the trends were fitted against
+            X, _ = self.trend_engine.axis(df)
             for col, trend in trends.items():
                 if 'timestamp' in df.columns:
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(x=df['timestamp'], y=df[col], mode='lines+markers', name='Data'))
                     
                     # Add trend line
-                    X = np.arange(len(df))
                     y_trend = trend['slope'] * X + trend['intercept']
                     fig.add_trace(go.Scatter(x=df['timestamp'], y=y_trend, mode='lines', name='Trend'))
                     
@@ -285,6 +327,7 @@ class DataAnalyzerAgent(MLEnhancedAgent):
     def _create_pattern_plots(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Create plots for detected patterns"""
         try:
+            import plotly.express as px
             if not patterns:
                 return {}
                 
@@ -315,9 +358,8 @@ class DataAnalyzerAgent(MLEnhancedAgent):
             X = df[features]
             y = df[target]
             
-            # Train model
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X, y)
+            # Train model off the event loop
+            model = await self.compute.run(fit_regression_model, X, y)
             
             # Calculate feature importance
             self.feature_importance[source] = dict(zip(features, model.feature_importances_))
@@ -337,6 +379,10 @@ class DataAnalyzerAgent(MLEnhancedAgent):
             for col, trend in analysis_results['trends'].items():
                 if trend['r2_score'] > 0.7:  # Strong trend
                     insights.append(f"Strong {trend['direction']} trend in {col} (R² = {trend['r2_score']:.2f})")
+                # Rolling trends show when the latest window runs against the overall direction
+                recent_slope, recent_r2 = trend.get('recent_slope'), trend.get('recent_r2_score')
+                if recent_slope is not None and recent_r2 is not None and recent_r2 > 0.7 and (recent_slope > 0) != (trend['slope'] > 0):
+                    insights.append(f"Recent trend in {col} reverses the overall {trend['direction']} trend (R² = {recent_r2:.2f})")
                     
             # Analyze correlations
             correlations = analysis_results['correlations']
@@ -388,7 +434,94 @@ class DataAnalyzerAgent(MLEnhancedAgent):
         except Exception as e:
             self.logger.error(f"Error saving analysis results: {str(e)}")
             
+    def load_processed_data(self, source: str, columns: Optional[List[str]] = None,
+                            start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            neighborhood: Optional[str] = None) -> pd.DataFrame:
+        """Load processed data, reading only the requested columns and date range"""
+        try:
+            if self.store is None:
+                return pd.DataFrame()
+                
+            predicate = None
+            if neighborhood:
+                schema = self.store.schema(source)
+                neighborhood_col = next((c for c in NEIGHBORHOOD_COLUMNS if schema and c in schema.names), None)
+                if neighborhood_col is None:
+                    return pd.DataFrame()
+                predicate = field_equals(neighborhood_col, neighborhood)
+                if columns is not None and neighborhood_col not in columns:
+                    columns = list(columns) + [neighborhood_col]
+                    
+            return self.store.read(source, columns=columns, start=start, end=end, predicate=predicate)
+            
+        except Exception as e:
+            self.logger.error(f"Error loading processed data for {source}: {str(e)}")
+            return pd.DataFrame()
+            
+    def get_insights(self, neighborhood: str, timeframe: str) -> Dict[str, Any]:
+        """Summarize processed data for a neighborhood over a timeframe"""
+        try:
+            if self.store is None:
+                return {}
+                
+            start = self._timeframe_start(timeframe)
+            neighborhood = None if neighborhood in (None, '', 'default', 'all') else neighborhood
+            summary = {}
+            for source in self.store.categories():
+                schema = self.store.schema(source)
+                if schema is None:
+                    continue
+                    
+                # Only the numeric metrics and the date column are read from disk
+                date_col = self.store.date_column(source)
+                numeric_cols = [
+                    field.name for field in schema
+                    if is_numeric_type(field.type) and field.name != date_col
+                ]
+                columns = numeric_cols + ([date_col] if date_col else [])
+                df = self.load_processed_data(
+                    source,
+                    columns=columns,
+                    start=start if date_col else None,
+                    neighborhood=neighborhood
+                )
+                if df.empty:
+                    continue
+                    
+                summary[source] = {
+                    'record_count': len(df),
+                    'period_start': df[date_col].min().isoformat() if date_col else None,
+                    'period_end': df[date_col].max().isoformat() if date_col else None,
+                    'metrics': df[numeric_cols].mean().dropna().to_dict(),
+                    'insights': self.analysis_results.get(source, {}).get('insights', [])
+                }
+                
+            return {
+                'neighborhood': neighborhood or 'all',
+                'timeframe': timeframe,
+                'sources': summary
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error getting insights: {str(e)}")
+            return {}
+            
+    def _timeframe_start(self, timeframe: str) -> Optional[datetime]:
+        """Convert a timeframe such as '30d', '12w', '6m' or '1y' into a start date"""
+        match = re.fullmatch(r'(\d+)([dwmy])', (timeframe or '').strip().lower())
+        if not match:
+            return None
+        amount, unit = int(match.group(1)), match.group(2)
+        offsets = {
+            'd': pd.DateOffset(days=amount),
+            'w': pd.DateOffset(weeks=amount),
+            'm': pd.DateOffset(months=amount),
+            'y': pd.DateOffset(years=amount)
+        }
+        return (pd.Timestamp.now().normalize() - offsets[unit]).to_pydatetime()
+            
     async def cleanup(self):
         """Cleanup resources"""
         await self.save_models()
+        self.compute.shutdown()
         self.logger.info(f"Cleaned up {self.name}") 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .base_agent import MLEnhancedAgent
+from .ml_enhanced_agent import MLEnhancedAgent
 import aiohttp
 import asyncio
 import logging
@@ -7,39 +7,51 @@ import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Optional
 from ..config import config
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import joblib
+from ..soda_ingest import SodaPaginator, checkpoint_file
+from ..dedup_store import DedupStore
+from .consistent_hash import partition_records
+from .ring_buffer import StatsRingBuffer
+from .online_anomaly import OnlineAnomalyDetector
 import os
 
+class CollectionError(Exception):
+    """A source could not be read, or its records could not be handed off"""
+
 class DataCollectorAgent(MLEnhancedAgent):
     def __init__(self, agent_id: str, name: str):
         super().__init__(agent_id, name)
+        self.tick_interval = config.collection.interval
         self.session = None
-        self.collected_data = {}
-        self.collection_stats = pd.DataFrame()
-        self.anomaly_detector = IsolationForest(contamination=0.1, random_state=42)
-        self.scaler = StandardScaler()
+        self.collected_data = self.bounded_dict('collected_data')
+        self.collection_stats = self.track_memory('collection_stats', StatsRingBuffer({
+            'timestamp': 'datetime64[us]',
+            'source': 'category',
+            'success': 'bool',
+            'response_time': 'float64',
+            'quality_score': 'float64'
+        }))
         self.quality_metrics = {}
+        self.dedup: Optional[DedupStore] = None
         self.model_dir = "models"
+        self.checkpoint_dir = "checkpoints"
         os.makedirs(self.model_dir, exist_ok=True)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
         
     async def initialize(self):
         """Initialize the data collector agent"""
         self.session = aiohttp.ClientSession()
+        if config.dedup.enabled:
+            self.dedup = DedupStore(config.dedup.path, config.dedup.capacity, config.dedup.error_rate)
         await self.load_models()
         self.logger.info(f"Initialized {self.name}")
         
     async def load_models(self):
         """Load saved ML models if they exist"""
         try:
-            anomaly_model_path = os.path.join(self.model_dir, "anomaly_detector.joblib")
-            scaler_path = os.path.join(self.model_dir, "scaler.joblib")
-            
-            if os.path.exists(anomaly_model_path):
-                self.anomaly_detector = joblib.load(anomaly_model_path)
-            if os.path.exists(scaler_path):
-                self.scaler = joblib.load(scaler_path)
+            for source_name in config.data_sources.keys():
+                checkpoint_path = self._anomaly_checkpoint_path(source_name)
+                if os.path.exists(checkpoint_path):
+                    self.anomaly_detectors[source_name] = OnlineAnomalyDetector.load(checkpoint_path)
                 
         except Exception as e:
             self.logger.error(f"Error loading models: {str(e)}")
@@ -47,11 +59,15 @@ class DataCollectorAgent(MLEnhancedAgent):
     async def save_models(self):
         """Save trained ML models"""
         try:
-            joblib.dump(self.anomaly_detector, os.path.join(self.model_dir, "anomaly_detector.joblib"))
-            joblib.dump(self.scaler, os.path.join(self.model_dir, "scaler.joblib"))
+            # Checkpoint the online detectors; their state is a few numbers per source
+            for source_name, detector in self.anomaly_detectors.items():
+                detector.save(self._anomaly_checkpoint_path(source_name))
         except Exception as e:
             self.logger.error(f"Error saving models: {str(e)}")
             
+    def _anomaly_checkpoint_path(self, source_name: str) -> str:
+        return os.path.join(self.model_dir, f"{source_name}_online_anomaly.joblib")
+            
     def calculate_data_quality(self, data: List[Dict[str, Any]], source: str) -> Dict[str, float]:
         """Calculate data quality metrics"""
         try:
@@ -142,47 +158,16 @@ class DataCollectorAgent(MLEnhancedAgent):
                 if await self.should_collect_now(source_name, collection_schedule):
                     try:
                         start_time = datetime.now()
-                        data = await self.collect_from_source(source_config)
-                        
-                        if data:
-                            # Calculate data quality metrics
-                            quality_metrics = self.calculate_data_quality(data, source_name)
-                            self.quality_metrics[source_name] = quality_metrics
-                            
-                            # Check for anomalies
-                            if len(data) > 0:
-                                anomalies = await self.detect_anomalies(
-                                    np.array([item.get('value', 0) for item in data])
-                                )
-                                # Filter out anomalous data
-                                data = [d for d, a in zip(data, anomalies) if a == 1]
-                                
-                                # Retrain anomaly detector
-                                await self.retrain_anomaly_detector(data)
-                            
-                            self.collected_data[source_name] = data
-                            
-                            # Record collection statistics
-                            self.collection_stats = pd.concat([
-                                self.collection_stats,
-                                pd.DataFrame([{
-                                    'timestamp': datetime.now(),
-                                    'source': source_name,
-                                    'success': True,
-                                    'response_time': (datetime.now() - start_time).total_seconds(),
-                                    'quality_score': np.mean(list(quality_metrics.values())) if quality_metrics else 0.0
-                                }])
-                            ])
-                            
-                            # Notify processor agent
-                            await self.send_message(
-                                "processor_agent",
-                                {
-                                    "type": "new_data",
-                                    "source": source_name,
-                                    "data": data,
-                                    "quality_metrics": quality_metrics
-                                }
+                        # Each batch is handed off as it arrives
+                        delivered = await self.collect_from_source(source_config)
+                        if delivered:
+                            quality_metrics = self.quality_metrics.get(source_name, {})
+                            self.collection_stats.append(
+                                timestamp=datetime.now(),
+                                source=source_name,
+                                success=True,
+                                response_time=(datetime.now() - start_time).total_seconds(),
+                                quality_score=np.mean(list(quality_metrics.values())) if quality_metrics else 0.0
                             )
                             
                             # Learn from success
@@ -194,16 +179,13 @@ class DataCollectorAgent(MLEnhancedAgent):
                         await self.learn_from_experience(0.0)
                         
                         # Record failed collection
-                        self.collection_stats = pd.concat([
-                            self.collection_stats,
-                            pd.DataFrame([{
-                                'timestamp': datetime.now(),
-                                'source': source_name,
-                                'success': False,
-                                'response_time': (datetime.now() - start_time).total_seconds(),
-                                'quality_score': 0.0
-                            }])
-                        ])
+                        self.collection_stats.append(
+                            timestamp=datetime.now(),
+                            source=source_name,
+                            success=False,
+                            response_time=(datetime.now() - start_time).total_seconds(),
+                            quality_score=0.0
+                        )
             
             # Optimize collection parameters
             await self.optimize_collection_parameters()
@@ -214,36 +196,6 @@ class DataCollectorAgent(MLEnhancedAgent):
         except Exception as e:
             self.logger.error(f"Error in process loop: {str(e)}")
         
-        await asyncio.sleep(config.collection.interval)
-        
-    async def retrain_anomaly_detector(self, data: List[Dict[str, Any]]):
-        """Retrain the anomaly detector with new data"""
-        try:
-            if len(data) < 10:  # Need minimum data points
-                return
-                
-            # Extract numeric features
-            features = []
-            for item in data:
-                feature_vector = []
-                for key, value in item.items():
-                    if isinstance(value, (int, float)):
-                        feature_vector.append(value)
-                if feature_vector:
-                    features.append(feature_vector)
-                    
-            if not features:
-                return
-                
-            # Scale features
-            features_scaled = self.scaler.fit_transform(features)
-            
-            # Train anomaly detector
-            self.anomaly_detector.fit(features_scaled)
-            
-        except Exception as e:
-            self.logger.error(f"Error retraining anomaly detector: {str(e)}")
-            
     async def predict_collection_schedule(self) -> pd.DataFrame:
         """Predict optimal collection times for each source"""
         try:
@@ -251,11 +203,10 @@ class DataCollectorAgent(MLEnhancedAgent):
                 return pd.DataFrame()
                 
             # Group by source and predict success rate
+            stats = self.collection_stats.to_frame()
             schedules = {}
             for source_name, source_config in config.data_sources.items():
-                source_stats = self.collection_stats[
-                    self.collection_stats['source'] == source_name
-                ].copy()
+                source_stats = stats[stats['source'] == source_name].copy()
                 
                 if len(source_stats) > 0:
                     source_stats.set_index('timestamp', inplace=True)
@@ -265,7 +216,8 @@ class DataCollectorAgent(MLEnhancedAgent):
                     
                     forecast = await self.predict_time_series(
                         source_stats['success_weighted'],
-                        forecast_periods=24
+                        forecast_periods=24,
+                        key=source_name
                     )
                     schedules[source_name] = forecast
                     
@@ -284,9 +236,10 @@ class DataCollectorAgent(MLEnhancedAgent):
             current_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
             
             # Get predicted success probability for current hour
-            prediction = forecast[
-                forecast['ds'] == current_hour
-            ]['yhat'].iloc[0]
+            predictions = forecast.loc[forecast['ds'] == current_hour, 'yhat']
+            if predictions.empty:
+                return True  # Collect if the forecast does not cover this hour
+            prediction = predictions.iloc[0]
             
             # Consider data quality in decision
             quality_score = self.quality_metrics.get(source_name, {}).get('validity', 0.5)
@@ -309,11 +262,11 @@ class DataCollectorAgent(MLEnhancedAgent):
             }
             
             # Analyze performance metrics
-            recent_stats = self.collection_stats.tail(100)
-            if len(recent_stats) > 0:
-                success_rate = recent_stats['success'].mean()
-                avg_response_time = recent_stats['response_time'].mean()
-                avg_quality = recent_stats['quality_score'].mean()
+            # Rolling means over the last 100 collections, kept up to date on append
+            if len(self.collection_stats) > 0:
+                success_rate = self.collection_stats.rolling_mean('success')
+                avg_response_time = self.collection_stats.rolling_mean('response_time')
+                avg_quality = self.collection_stats.rolling_mean('quality_score')
                 
                 # Adjust parameters based on performance
                 if success_rate < 0.8:
@@ -333,8 +286,11 @@ class DataCollectorAgent(MLEnhancedAgent):
         except Exception as e:
             self.logger.error(f"Error optimizing parameters: {str(e)}")
             
-    async def collect_from_source(self, source_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Collect data from a specific source with proper authentication"""
+    async def collect_from_source(self, source_config: Dict[str, Any]) -> int:
+        """Collect data from a specific source with proper authentication
+
+        Returns the number of records handed off to the processor.
+        """
         headers = {
             'Accept': 'application/json',
             'Accept-Language': 'en-US,en;q=0.9'
@@ -352,6 +308,95 @@ class DataCollectorAgent(MLEnhancedAgent):
             
         url = source_config['base_url']
         
+        if source_config.get('pagination'):
+            return await self.collect_paginated(source_config, url, headers, params)
+            
+        data = await self.fetch_json(source_config['name'], url, headers, params)
+        return await self.hand_off(source_config['name'], data)
+        
+    async def collect_paginated(self, source_config: Dict[str, Any], url: str,
+                                headers: Dict[str, str], params: Dict[str, Any]) -> int:
+        """Collect rows newer than the source's checkpoint, several pages at a time
+
+        Every page is handed off before the checkpoint moves past it, so a page
+        that fails to fetch or to be delivered is collected again next cycle.
+        """
+        pagination = source_config['pagination']
+        paginator = SodaPaginator(
+            order_field=pagination.get('order_field', 'incident_datetime'),
+            tiebreak_field=pagination.get('tiebreak_field', 'row_id'),
+            page_size=pagination.get('page_size', 1000),
+            max_parallel=pagination.get('max_parallel', 4),
+            mode=pagination.get('mode', 'offset'),
+            checkpoint_path=os.path.join(self.checkpoint_dir, checkpoint_file(url, source_config['name'])),
+            params=params
+        )
+        delivered = 0
+        
+        async def fetch_page(page_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return await self.fetch_json(source_config['name'], url, headers, page_params)
+            
+        async def store_page(page: List[Dict[str, Any]]):
+            nonlocal delivered
+            delivered += await self.hand_off(source_config['name'], page)
+            
+        # Backfills are spread over several cycles by capping pages per run
+        await paginator.ingest_async(fetch_page, store_page, max_pages=pagination.get('max_pages_per_run'))
+        return delivered
+        
+    async def hand_off(self, source_name: str, data: List[Dict[str, Any]]) -> int:
+        """Screen a batch of records and send it to the processor
+
+        Raises CollectionError if the processor did not accept the batch; its
+        records are left unmarked so the next cycle collects them again.
+        """
+        # Records already collected in an earlier cycle are dropped before any processing
+        new_keys = []
+        if data and self.dedup is not None:
+            data, new_keys = self.dedup.filter_new(data, source_name)
+        if not data:
+            return 0
+            
+        # Calculate data quality metrics
+        quality_metrics = self.calculate_data_quality(data, source_name)
+        self.quality_metrics[source_name] = quality_metrics
+        
+        # Scores the new records and updates the source's detector with them
+        anomalies = await self.detect_anomalies(
+            np.array([item.get('value', 0) for item in data]),
+            stream=source_name
+        )
+        # Filter out anomalous data
+        data = [d for d, a in zip(data, anomalies) if a == 1]
+        self.collected_data[source_name] = data
+        
+        # Notify processor agent; replicas are chosen by partition
+        partitions = partition_records(source_name, data, config.sharding.partition_by)
+        delivered = True
+        for partition, records in partitions.items():
+            delivered &= await self.send_message(
+                "processor_agent",
+                {
+                    "type": "new_data",
+                    "source": source_name,
+                    "partition": partition,
+                    "data": self.share_batch(records),
+                    "quality_metrics": quality_metrics
+                }
+            )
+        if not delivered:
+            raise CollectionError(f"Records from {source_name} were not delivered to processor_agent")
+        if self.dedup is not None:
+            self.dedup.mark_seen(new_keys)
+        return len(data)
+        
+    async def fetch_json(self, source_name: str, url: str, headers: Dict[str, str],
+                         params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """GET a JSON payload with rate-limit handling and retries
+
+        Raises CollectionError when the source answers with an error or cannot
+        be reached, so a failure is never mistaken for an empty result.
+        """
         for attempt in range(config.rate_limit.max_retries):
             try:
                 async with self.session.get(url, headers=headers, params=params) as response:
@@ -359,24 +404,26 @@ class DataCollectorAgent(MLEnhancedAgent):
                         return await response.json()
                     elif response.status == 429:  # Rate limit exceeded
                         wait_time = int(response.headers.get('Retry-After', config.rate_limit.delay))
-                        self.logger.warning(f"Rate limit exceeded for {source_config['name']}, waiting {wait_time}s")
+                        self.logger.warning(f"Rate limit exceeded for {source_name}, waiting {wait_time}s")
                         await asyncio.sleep(wait_time)
                     else:
-                        self.logger.error(f"Error collecting from {source_config['name']}: {response.status}")
-                        return []
+                        raise CollectionError(f"{source_name} returned HTTP {response.status}")
                         
             except aiohttp.ClientError as e:
-                self.logger.error(f"Network error collecting from {source_config['name']}: {str(e)}")
+                self.logger.error(f"Network error collecting from {source_name}: {str(e)}")
                 if attempt < config.rate_limit.max_retries - 1:
                     await asyncio.sleep(config.rate_limit.delay * (attempt + 1))
                 else:
-                    return []
+                    raise CollectionError(f"{source_name} could not be reached: {str(e)}") from e
                     
-        return []
+        raise CollectionError(f"{source_name} is still rate limited after {config.rate_limit.max_retries} attempts")
         
     async def cleanup(self):
         """Cleanup resources"""
         if self.session:
             await self.session.close()
+        if self.dedup is not None:
+            self.dedup.close()
         await self.save_models()
+        self.compute.shutdown()
         self.logger.info(f"Cleaned up {self.name}") 
\ No newline at end of file
@@ -1,16 +1,18 @@
-from .base_agent import MLEnhancedAgent
+from .ml_enhanced_agent import MLEnhancedAgent
 import pandas as pd
 import json
 from datetime import datetime
 import os
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import numpy as np
 from ..config import config
+from .ring_buffer import StatsRingBuffer
+from .feature_engine import FeatureEngine, FeatureSpec
+from .robust_stats import RobustBounds, bounds_for, clip_outliers, compute_bounds, impute_median, numeric_values
+from .transform_pipeline import TransformPipeline
+from .clustering import ClusteringBackend, make_backend
 import hashlib
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import DBSCAN
 import joblib
 
 class DataSchema:
@@ -55,16 +57,63 @@ class DataSchema:
         }
     }
 
+def transform_features(features: pd.DataFrame, pipeline: TransformPipeline):
+    """Update the transform pipeline with a batch and project it (runs in the compute executor)
+    
+    Until a batch large enough to fit every component arrives, nothing is projected.
+    """
+    if pipeline.fitted or len(features) >= features.shape[1]:
+        pipeline.partial_fit(features)
+    if not pipeline.fitted:
+        return None, pipeline
+    return pipeline.transform(features), pipeline
+
+def cluster_patterns(features: pd.DataFrame, cluster_model: ClusteringBackend,
+                     feature_importance: Dict[str, float]):
+    """Cluster PCA features and describe each cluster (runs in the compute executor)"""
+    _, summary = cluster_model.fit_predict(features)
+    
+    # Noise points are not part of any cluster summary
+    centroids = summary['mean'].to_dict('index')
+    stds = summary['std'].to_dict('index')
+    patterns = [
+        {
+            'cluster_id': int(cluster_id),
+            'size': int(size),
+            'centroid': centroids[cluster_id],
+            'std': stds[cluster_id],
+            'feature_importance': feature_importance
+        }
+        for cluster_id, size in summary['size'].items()
+    ]
+    return patterns, cluster_model
+
 class DataProcessorAgent(MLEnhancedAgent):
     def __init__(self, agent_id: str, name: str):
         super().__init__(agent_id, name)
-        self.processed_data = {}
-        self.processing_stats = pd.DataFrame()
-        self.scaler = StandardScaler()
-        self.pca = PCA(n_components=0.95)
-        self.cluster_model = DBSCAN(eps=0.5, min_samples=5)
+        self.pending_data = {}
+        self.processed_data = self.bounded_dict('processed_data')
+        self.processing_stats = self.track_memory('processing_stats', StatsRingBuffer({
+            'timestamp': 'datetime64[us]',
+            'source': 'category',
+            'success': 'bool',
+            'processing_time': 'float64',
+            'data_size': 'int64',
+            'pattern_count': 'int32'
+        }))
+        self.partition_models: Dict[str, Dict[str, Any]] = {}
+        self.partition_sources: Dict[str, str] = {}
+        self.active_partition = None
+        self.transform_pipeline = TransformPipeline(variance=0.95)
+        self.cluster_model = self._make_cluster_model()
         self.feature_importance = {}
-        self.model_dir = "models"
+        # Quartiles of the batch being preprocessed, shared with the analyzer
+        self.robust_bounds: Optional[RobustBounds] = None
+        self.feature_engine = FeatureEngine(FeatureSpec(
+            dtype=config.features.dtype,
+            max_pairs=config.features.max_pairs or None
+        ))
+        self.model_dir = os.path.join("models", "processor")
         self.output_dir = "processed_data"
         self.version_dir = os.path.join(self.output_dir, "versions")
         os.makedirs(self.output_dir, exist_ok=True)
@@ -72,42 +121,102 @@ class DataProcessorAgent(MLEnhancedAgent):
         
     async def initialize(self):
         """Initialize the data processor agent"""
-        await self.load_models()
+        # Models are loaded per partition, when this replica first sees it
         self.logger.info(f"Initialized {self.name}")
         
-    async def load_models(self):
-        """Load saved ML models if they exist"""
+    async def load_models(self, partition: str) -> Dict[str, Any]:
+        """Load saved ML models for a partition, or create fresh ones"""
+        models = {
+            'transform_pipeline': TransformPipeline(variance=0.95),
+            'cluster_model': self._make_cluster_model()
+        }
         try:
-            scaler_path = os.path.join(self.model_dir, "processor_scaler.joblib")
-            pca_path = os.path.join(self.model_dir, "processor_pca.joblib")
-            cluster_path = os.path.join(self.model_dir, "processor_cluster.joblib")
-            
-            if os.path.exists(scaler_path):
-                self.scaler = joblib.load(scaler_path)
-            if os.path.exists(pca_path):
-                self.pca = joblib.load(pca_path)
-            if os.path.exists(cluster_path):
-                self.cluster_model = joblib.load(cluster_path)
-                
+            for kind in models:
+                model_path = os.path.join(self.model_dir, partition, f"{kind}.joblib")
+                if os.path.exists(model_path):
+                    model = joblib.load(model_path)
+                    # Models saved by an older version, or for another backend, are replaced
+                    if type(model) is type(models[kind]):
+                        models[kind] = model
         except Exception as e:
-            self.logger.error(f"Error loading models: {str(e)}")
-            
-    async def save_models(self):
-        """Save trained ML models"""
+            self.logger.error(f"Error loading models for {partition}: {str(e)}")
+        return models
+        
+    @staticmethod
+    def _make_cluster_model() -> ClusteringBackend:
+        return make_backend(
+            config.clustering.backend,
+            eps=0.5,
+            min_samples=5,
+            n_clusters=config.clustering.n_clusters,
+            sample_size=config.clustering.sample_size
+        )
+        
+    async def activate_partition(self, partition: str):
+        """Switch the working models to those of a partition"""
+        if partition not in self.partition_models:
+            self.partition_models[partition] = await self.load_models(partition)
+        self.active_partition = partition
+        models = self.partition_models[partition]
+        self.transform_pipeline = models['transform_pipeline']
+        self.cluster_model = models['cluster_model']
+            
+    def _update_active_models(self, **models):
+        # Fitted models come back as new objects when computed in another process
+        for kind, model in models.items():
+            setattr(self, kind, model)
+        if self.active_partition in self.partition_models:
+            self.partition_models[self.active_partition].update(models)
+            
+    async def save_models(self, partitions: Optional[List[str]] = None):
+        """Save trained ML models of the partitions owned by this replica"""
         try:
-            joblib.dump(self.scaler, os.path.join(self.model_dir, "processor_scaler.joblib"))
-            joblib.dump(self.pca, os.path.join(self.model_dir, "processor_pca.joblib"))
-            joblib.dump(self.cluster_model, os.path.join(self.model_dir, "processor_cluster.joblib"))
+            for partition in (self.partition_models if partitions is None else partitions):
+                models = self.partition_models.get(partition)
+                if models is None:
+                    continue
+                partition_dir = os.path.join(self.model_dir, partition)
+                os.makedirs(partition_dir, exist_ok=True)
+                for kind, model in models.items():
+                    joblib.dump(model, os.path.join(partition_dir, f"{kind}.joblib"))
         except Exception as e:
             self.logger.error(f"Error saving models: {str(e)}")
             
+    async def release_partitions(self, partitions: List[str]):
+        """Persist and drop the state of partitions that moved to another replica"""
+        if any(partition in self.pending_data for partition in partitions):
+            # Data that arrived before the hand-off still belongs to this replica
+            await self.process()
+        await self.save_models(partitions)
+        for partition in partitions:
+            self.partition_models.pop(partition, None)
+            self.partition_sources.pop(partition, None)
+        self.logger.info(f"Released partitions: {', '.join(partitions)}")
+            
+    async def handle_message(self, message: Dict[str, Any]):
+        """Queue newly collected data for processing"""
+        content = message['content']
+        if content.get('type') == 'new_data':
+            partition = content.get('partition', content['source'])
+            self.partition_sources[partition] = content['source']
+            self.pending_data.setdefault(partition, []).append(self.read_batch(content['data']))
+            
     async def process(self):
         """Main processing loop with ML-enhanced data processing"""
         try:
-            for source_name, data in self.processed_data.items():
-                if data:
+            # Only data delivered since the last call is pending
+            if not self.pending_data:
+                return
+                    
+            processed = list(self.pending_data)
+            for partition in processed:
+                data = pd.concat(self.pending_data.pop(partition), ignore_index=True)
+                source_name = self.partition_sources.get(partition, partition)
+                if len(data):
                     start_time = datetime.now()
                     try:
+                        await self.activate_partition(partition)
+                        
                         # Preprocess data
                         processed_data = await self.preprocess_data(data, source_name)
                         
@@ -118,24 +227,21 @@ class DataProcessorAgent(MLEnhancedAgent):
                         patterns = await self.detect_patterns(transformed_data)
                         
                         # Update processed data
-                        self.processed_data[source_name] = {
+                        self.processed_data[partition] = {
                             'data': transformed_data,
                             'patterns': patterns,
                             'timestamp': datetime.now()
                         }
                         
                         # Record processing statistics
-                        self.processing_stats = pd.concat([
-                            self.processing_stats,
-                            pd.DataFrame([{
-                                'timestamp': datetime.now(),
-                                'source': source_name,
-                                'success': True,
-                                'processing_time': (datetime.now() - start_time).total_seconds(),
-                                'data_size': len(transformed_data),
-                                'pattern_count': len(patterns)
-                            }])
-                        ])
+                        self.processing_stats.append(
+                            timestamp=datetime.now(),
+                            source=source_name,
+                            success=True,
+                            processing_time=(datetime.now() - start_time).total_seconds(),
+                            data_size=len(transformed_data),
+                            pattern_count=len(patterns)
+                        )
                         
                         # Notify analyzer agent
                         await self.send_message(
@@ -143,8 +249,10 @@ class DataProcessorAgent(MLEnhancedAgent):
                             {
                                 "type": "processed_data",
                                 "source": source_name,
-                                "data": transformed_data,
-                                "patterns": patterns
+                                "partition": partition,
+                                "data": self.share_batch(transformed_data),
+                                "patterns": patterns,
+                                "bounds": self.robust_bounds.to_dict() if self.robust_bounds is not None else {}
                             }
                         )
                         
@@ -157,31 +265,29 @@ class DataProcessorAgent(MLEnhancedAgent):
                         await self.learn_from_experience(0.0)
                         
                         # Record failed processing
-                        self.processing_stats = pd.concat([
-                            self.processing_stats,
-                            pd.DataFrame([{
-                                'timestamp': datetime.now(),
-                                'source': source_name,
-                                'success': False,
-                                'processing_time': (datetime.now() - start_time).total_seconds(),
-                                'data_size': 0,
-                                'pattern_count': 0
-                            }])
-                        ])
+                        self.processing_stats.append(
+                            timestamp=datetime.now(),
+                            source=source_name,
+                            success=False,
+                            processing_time=(datetime.now() - start_time).total_seconds(),
+                            data_size=0,
+                            pattern_count=0
+                        )
             
             # Optimize processing parameters
             await self.optimize_processing_parameters()
             
-            # Save models periodically
-            await self.save_models()
+            # Save models of the partitions touched in this round
+            await self.save_models(processed)
             
         except Exception as e:
             self.logger.error(f"Error in process loop: {str(e)}")
             
-    async def preprocess_data(self, data: List[Dict[str, Any]], source: str) -> pd.DataFrame:
+    async def preprocess_data(self, data: Union[List[Dict[str, Any]], pd.DataFrame], source: str) -> pd.DataFrame:
         """Preprocess data with advanced cleaning and validation"""
         try:
             df = pd.DataFrame(data)
+            self.robust_bounds = None
             
             # Handle missing values
             df = self._handle_missing_values(df)
@@ -205,23 +311,29 @@ class DataProcessorAgent(MLEnhancedAgent):
             return pd.DataFrame()
             
     def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Handle missing values intelligently"""
+        """Impute numeric columns with their medians, flagging columns with many gaps"""
         try:
             # Calculate missing value statistics
-            missing_stats = df.isnull().mean()
-            
-            # For columns with low missing rate (< 5%), use median imputation
-            low_missing_cols = missing_stats[missing_stats < 0.05].index
-            for col in low_missing_cols:
-                df[col] = df[col].fillna(df[col].median())
+            missing = df.isnull()
+            missing_stats = missing.mean()
+            
+            # Quartiles and medians of all numeric columns in one pass; the
+            # outlier step and the analyzer reuse them
+            numeric_cols = self._numeric_columns(df)
+            self.robust_bounds = compute_bounds(df, numeric_cols)
+            
+            # Median imputation, only touching columns that have gaps
+            gaps = [col for col in numeric_cols if missing_stats[col] > 0]
+            if gaps:
+                values = numeric_values(df, gaps)
+                impute_median(values, self.robust_bounds.select(gaps))
+                df[gaps] = values
                 
-            # For columns with high missing rate, create missing indicator
+            # For columns with high missing rate (>= 5%), create missing indicator
             high_missing_cols = missing_stats[missing_stats >= 0.05].index
-            for col in high_missing_cols:
-                df[f"{col}_missing"] = df[col].isnull().astype(int)
-                df[col] = df[col].fillna(df[col].median())
+            indicators = {f"{col}_missing": missing[col].astype(int) for col in high_missing_cols}
                 
-            return df
+            return self._add_columns(df, indicators)
             
         except Exception as e:
             self.logger.error(f"Error handling missing values: {str(e)}")
@@ -251,76 +363,86 @@ class DataProcessorAgent(MLEnhancedAgent):
             return df
             
     def _handle_outliers(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Handle outliers using IQR method"""
+        """Cap outliers to the IQR fences of every numeric column at once"""
         try:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            
-            for col in numeric_cols:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                
-                # Create outlier indicator
-                df[f"{col}_outlier"] = ((df[col] < lower_bound) | (df[col] > upper_bound)).astype(int)
+            numeric_cols = self._numeric_columns(df)
+            if not numeric_cols:
+                return df
                 
-                # Cap outliers
-                df[col] = df[col].clip(lower_bound, upper_bound)
+            # Columns that only became numeric during type validation are computed now
+            self.robust_bounds = bounds_for(df, numeric_cols, self.robust_bounds)
+            values = numeric_values(df, numeric_cols)
+            outliers = clip_outliers(values, self.robust_bounds.select(numeric_cols))
+            
+            capped = outliers.any(axis=0)
+            if capped.any():
+                df[[col for col, c in zip(numeric_cols, capped) if c]] = values[:, capped]
                 
-            return df
+            indicators = {
+                f"{col}_outlier": pd.Series(outliers[:, i].astype(int), index=df.index)
+                for i, col in enumerate(numeric_cols)
+            }
+            return self._add_columns(df, indicators)
             
         except Exception as e:
             self.logger.error(f"Error handling outliers: {str(e)}")
             return df
             
     def _engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Engineer new features"""
+        """Engineer time-based features and numeric interactions of the original columns"""
         try:
-            # Time-based features
-            for col in df.select_dtypes(include=['datetime64']).columns:
-                df[f"{col}_hour"] = df[col].dt.hour
-                df[f"{col}_day"] = df[col].dt.day
-                df[f"{col}_month"] = df[col].dt.month
-                df[f"{col}_dayofweek"] = df[col].dt.dayofweek
-                
-            # Numeric interactions
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            for i, col1 in enumerate(numeric_cols):
-                for col2 in numeric_cols[i+1:]:
-                    df[f"{col1}_{col2}_ratio"] = df[col1] / df[col2].replace(0, np.nan)
-                    df[f"{col1}_{col2}_sum"] = df[col1] + df[col2]
-                    df[f"{col1}_{col2}_product"] = df[col1] * df[col2]
-                    
-            return df
+            return self.feature_engine.transform(df)
             
         except Exception as e:
             self.logger.error(f"Error engineering features: {str(e)}")
             return df
             
+    @staticmethod
+    def _numeric_columns(df: pd.DataFrame) -> List[str]:
+        """Numeric columns excluding derived indicator columns"""
+        return [
+            col for col in df.select_dtypes(include=[np.number]).columns
+            if not str(col).endswith(('_missing', '_outlier'))
+        ]
+        
+    @staticmethod
+    def _add_columns(df: pd.DataFrame, columns: Dict[str, pd.Series]) -> pd.DataFrame:
+        """Attach derived columns with one concat rather than one insert each"""
+        if not columns:
+            return df
+        return pd.concat([df.drop(columns=[c for c in columns if c in df.columns]), pd.DataFrame(columns, index=df.index)], axis=1)
+            
     async def apply_ml_transformations(self, df: pd.DataFrame) -> pd.DataFrame:
         """Apply ML transformations to the data"""
         try:
             if len(df) == 0:
                 return df
                 
-            # Select numeric features
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
+            # Select numeric features; indicator columns come and go between batches
+            numeric_cols = self._numeric_columns(df)
             if len(numeric_cols) == 0:
                 return df
                 
-            # Scale features
-            scaled_features = self.scaler.fit_transform(df[numeric_cols])
-            
-            # Apply PCA
-            pca_features = self.pca.fit_transform(scaled_features)
-            
+            if not self.transform_pipeline.matches(numeric_cols):
+                self.logger.warning(f"Feature schema of {self.active_partition} changed, refitting the transform pipeline")
+                self._update_active_models(transform_pipeline=TransformPipeline(variance=self.transform_pipeline.variance))
+                
+            # Update the fitted scaler and PCA with this batch and project it off the event loop
+            # One update at a time per partition model, even after a timed-out call
+            pca_features, pipeline = await self.compute.run(
+                transform_features, df[numeric_cols], self.transform_pipeline,
+                key=('transform_pipeline', self.active_partition)
+            )
+            self._update_active_models(transform_pipeline=pipeline)
+            if pca_features is None:
+                return df
+                
             # Add PCA components to dataframe
-            for i in range(pca_features.shape[1]):
-                df[f"pca_component_{i+1}"] = pca_features[:, i]
+            components = {f"pca_component_{i+1}": pca_features[:, i] for i in range(pca_features.shape[1])}
+            df = self._add_columns(df, components)
                 
             # Update feature importance
-            self.feature_importance = dict(zip(numeric_cols, self.pca.explained_variance_ratio_))
+            self.feature_importance = pipeline.feature_importance()
             
             return df
             
@@ -339,25 +461,12 @@ class DataProcessorAgent(MLEnhancedAgent):
             if not cluster_features:
                 return []
                 
-            # Perform clustering
-            clusters = self.cluster_model.fit_predict(df[cluster_features])
-            
-            # Analyze clusters
-            patterns = []
-            for cluster_id in set(clusters):
-                if cluster_id == -1:  # Skip noise points
-                    continue
-                    
-                cluster_data = df[clusters == cluster_id]
-                pattern = {
-                    'cluster_id': int(cluster_id),
-                    'size': len(cluster_data),
-                    'centroid': cluster_data[cluster_features].mean().to_dict(),
-                    'std': cluster_data[cluster_features].std().to_dict(),
-                    'feature_importance': self.feature_importance
-                }
-                patterns.append(pattern)
-                
+            # Cluster and summarize the clusters off the event loop
+            patterns, cluster_model = await self.compute.run(
+                cluster_patterns, df[cluster_features], self.cluster_model, self.feature_importance,
+                key=('cluster_model', self.active_partition)
+            )
+            self._update_active_models(cluster_model=cluster_model)
             return patterns
             
         except Exception as e:
@@ -375,11 +484,11 @@ class DataProcessorAgent(MLEnhancedAgent):
             }
             
             # Analyze performance metrics
-            recent_stats = self.processing_stats.tail(100)
-            if len(recent_stats) > 0:
-                success_rate = recent_stats['success'].mean()
-                avg_processing_time = recent_stats['processing_time'].mean()
-                avg_pattern_count = recent_stats['pattern_count'].mean()
+            # Rolling means over the last 100 batches, kept up to date on append
+            if len(self.processing_stats) > 0:
+                success_rate = self.processing_stats.rolling_mean('success')
+                avg_processing_time = self.processing_stats.rolling_mean('processing_time')
+                avg_pattern_count = self.processing_stats.rolling_mean('pattern_count')
                 
                 # Adjust parameters based on performance
                 if success_rate < 0.8:
@@ -394,9 +503,11 @@ class DataProcessorAgent(MLEnhancedAgent):
             
             # Update parameters if optimization successful
             if optimized:
-                self.pca.n_components = optimized['pca_n_components']
-                self.cluster_model.eps = optimized['dbscan_eps']
-                self.cluster_model.min_samples = optimized['dbscan_min_samples']
+                self.transform_pipeline.variance = optimized['pca_n_components']
+                # Only the density backends have eps and min_samples
+                if hasattr(self.cluster_model, 'eps'):
+                    self.cluster_model.eps = optimized['dbscan_eps']
+                    self.cluster_model.min_samples = optimized['dbscan_min_samples']
                 self.logger.info(f"Updated processing parameters: {optimized}")
                 
         except Exception as e:
@@ -405,4 +516,5 @@ class DataProcessorAgent(MLEnhancedAgent):
     async def cleanup(self):
         """Cleanup resources"""
         await self.save_models()
+        self.compute.shutdown()
         self.logger.info(f"Cleaned up {self.name}") 
\ No newline at end of file
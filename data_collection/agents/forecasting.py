@@ -0,0 +1,143 @@
+import importlib.util
+import logging
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+def prophet_available() -> bool:
+    """Whether prophet is installed, without paying for importing it"""
+    try:
+        return importlib.util.find_spec('prophet') is not None
+    except ValueError:
+        # Already imported, without a module spec
+        return True
+
+def warm_start_params(model) -> Dict[str, Any]:
+    """Fitted Prophet parameters in the form accepted by ``fit(init=...)``"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = model.params[name][0][0]
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0]
+    return params
+
+def fit_prophet(history: pd.DataFrame, future: pd.DataFrame,
+                init: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any], bool]:
+    """Fit a new Prophet model and forecast (runs in the compute executor)
+
+    Optimization starts from ``init`` when given, which converges in a fraction
+    of the iterations of a cold start. Returns the forecast, the fitted
+    parameters and whether the warm start was used.
+    """
+    # Imported here: prophet (with its Stan backend) is slow to import
+    from prophet import Prophet
+
+    def build():
+        return Prophet(yearly_seasonality='auto', weekly_seasonality=True, daily_seasonality=True)
+
+    model = build()
+    warm = init is not None
+    try:
+        model.fit(history, init=init) if warm else model.fit(history)
+    except Exception:
+        if not warm:
+            raise
+        # Parameter shapes change when the number of changepoints does
+        model = build()
+        model.fit(history)
+        warm = False
+    return model.predict(future)[FORECAST_COLUMNS], warm_start_params(model), warm
+
+def hourly_profile_forecast(history: pd.Series, future: pd.DatetimeIndex, alpha: float = 0.3) -> pd.DataFrame:
+    """Forecast from an exponentially weighted hour-of-day profile
+
+    Every hour of the day gets the EWMA of the values observed at that hour;
+    hours never observed fall back to the EWMA level of the whole series. The
+    band is ±1.96 times the EW standard deviation of one-step residuals.
+    """
+    level = history.ewm(alpha=alpha).mean()
+    residuals = (history - level.shift(1)).dropna()
+    spread = residuals.ewm(alpha=alpha).std().iloc[-1] if len(residuals) > 1 else 0.0
+    spread = 0.0 if np.isnan(spread) else spread
+    profile = history.groupby(history.index.hour).agg(lambda s: s.ewm(alpha=alpha).mean().iloc[-1])
+    yhat = pd.Series(future.hour).map(profile).fillna(level.iloc[-1]).to_numpy()
+    return pd.DataFrame({
+        'ds': future,
+        'yhat': yhat,
+        'yhat_lower': yhat - 1.96 * spread,
+        'yhat_upper': yhat + 1.96 * spread
+    })
+
+class ForecastService:
+    """Per-series forecasts that are refit only when enough new data has arrived
+
+    Series are aggregated to ``freq`` buckets. A key's forecast is cached and
+    reused until ``refit_points`` new buckets have been observed or the cached
+    forecast no longer covers the current bucket. In ``"prophet"`` mode each
+    refit is a new Prophet model warm-started from the previous parameters and
+    run through ``compute`` (a ComputeOffloader) when one is given;
+    ``"ewma"`` mode, also used when Prophet is not installed, forecasts from
+    an hour-of-day EWMA profile at negligible cost.
+    """
+
+    def __init__(self, compute=None, mode: str = "prophet", refit_points: int = 24,
+                 horizon: int = 24, freq: str = "h", min_points: int = 2):
+        if mode not in ("prophet", "ewma"):
+            raise ValueError(f"Unknown forecast mode: {mode}")
+        self.logger = logging.getLogger('forecasting')
+        if mode == "prophet" and not prophet_available():
+            self.logger.warning("prophet is not installed, forecasting with the EWMA hourly profile")
+            mode = "ewma"
+        self.compute = compute
+        self.mode = mode
+        self.refit_points = refit_points
+        self.horizon = horizon
+        self.freq = freq
+        self.min_points = min_points
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'fits': 0, 'warm_starts': 0, 'cache_hits': 0}
+
+    async def forecast(self, key: str, series: pd.Series, periods: Optional[int] = None) -> pd.DataFrame:
+        """Forecast a timestamp-indexed series from the current bucket through ``periods`` buckets past now
+
+        The forecast starts after the last observed bucket or at the current
+        one, whichever is earlier, so it always contains the current bucket
+        even when that bucket has already been observed.
+        """
+        periods = periods or self.horizon
+        history = series.sort_index().resample(self.freq).mean().dropna()
+        if len(history) < self.min_points:
+            return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+        step = pd.tseries.frequencies.to_offset(self.freq)
+        now = pd.Timestamp.now().floor(self.freq)
+        last = history.index[-1]
+        entry = self.models.get(key)
+        if entry is not None:
+            new_points = int((history.index > entry['last']).sum())
+            cached = entry['forecast']['ds']
+            if new_points < self.refit_points and cached.iloc[0] <= now <= cached.iloc[-1]:
+                self.stats['cache_hits'] += 1
+                return entry['forecast']
+
+        start = min(last + step, now)
+        future = pd.date_range(start=start, end=max(start, now) + (periods - 1) * step, freq=self.freq)
+        params = entry.get('params') if entry is not None else None
+        if self.mode == "prophet":
+            frame = pd.DataFrame({'ds': history.index, 'y': history.values})
+            if self.compute is not None:
+                forecast, params, warm = await self.compute.run(fit_prophet, frame, pd.DataFrame({'ds': future}), params)
+            else:
+                forecast, params, warm = fit_prophet(frame, pd.DataFrame({'ds': future}), params)
+            self.stats['warm_starts'] += int(warm)
+        else:
+            forecast = hourly_profile_forecast(history, future)
+        self.stats['fits'] += 1
+
+        self.models[key] = {'last': last, 'params': params, 'forecast': forecast}
+        return forecast
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, mode=self.mode, models=len(self.models))
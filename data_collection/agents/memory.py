@@ -0,0 +1,277 @@
+import asyncio
+import collections
+import gc
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Optional
+import joblib
+import numpy as np
+import pandas as pd
+
+CGROUP_V2 = "/sys/fs/cgroup"
+CGROUP_V1 = "/sys/fs/cgroup/memory"
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate number of bytes held by an object and everything it references"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes + sys.getsizeof(obj) if obj.base is None else sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+    if isinstance(getattr(obj, 'nbytes', None), int):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), _seen)
+    return size
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path, 'r') as f:
+            value = f.read().strip()
+        return None if value == 'max' else int(value)
+    except (OSError, ValueError):
+        return None
+
+def _inactive_file(path: str, field: str) -> int:
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                name, value = line.split()
+                if name == field:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def cgroup_memory_limit() -> Optional[int]:
+    """Memory limit of the container in bytes, or None when unlimited or unknown"""
+    limit = _read_int(os.path.join(CGROUP_V2, "memory.max"))
+    if limit is None:
+        limit = _read_int(os.path.join(CGROUP_V1, "memory.limit_in_bytes"))
+    # cgroup v1 reports "no limit" as a huge page-aligned number
+    if limit is None or limit >= 2 ** 60:
+        return None
+    return limit
+
+def memory_in_use() -> Optional[int]:
+    """Working set of the container (usage minus reclaimable page cache), else this process's RSS
+
+    This is the number the OOM killer acts on, shared by the manager and all
+    worker processes, so every process sees the same pressure.
+    """
+    usage = _read_int(os.path.join(CGROUP_V2, "memory.current"))
+    if usage is not None:
+        return max(0, usage - _inactive_file(os.path.join(CGROUP_V2, "memory.stat"), "inactive_file"))
+    usage = _read_int(os.path.join(CGROUP_V1, "memory.usage_in_bytes"))
+    if usage is not None:
+        return max(0, usage - _inactive_file(os.path.join(CGROUP_V1, "memory.stat"), "total_inactive_file"))
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+class BoundedDict(MutableMapping):
+    """Dictionary holding at most ``max_items`` entries in memory
+
+    When full, the least recently used entry (``policy="lru"``) or the oldest
+    inserted one (``policy="fifo"``) is evicted: pickled to ``spill_dir`` if
+    one is given, and loaded back transparently on its next access, otherwise
+    dropped. The estimated size of every entry is recorded when it is stored,
+    so ``nbytes`` is cheap to read; call ``refresh`` after mutating values in
+    place.
+    """
+
+    def __init__(self, max_items: Optional[int] = None, policy: str = "lru",
+                 spill_dir: Optional[str] = None):
+        if policy not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_items = max_items
+        self.policy = policy
+        self.spill_root = spill_dir
+        self.spill_dir = None
+        self.nbytes = 0
+        self.stats = {'evicted': 0, 'spilled': 0, 'reloaded': 0}
+        self._data: 'collections.OrderedDict[Any, Any]' = collections.OrderedDict()
+        self._sizes: Dict[Any, int] = {}
+        self._spilled: Dict[Any, str] = {}
+        self.logger = logging.getLogger('memory')
+
+    def __getitem__(self, key):
+        if key in self._data:
+            if self.policy == "lru":
+                self._data.move_to_end(key)
+            return self._data[key]
+        if key in self._spilled:
+            path = self._spilled.pop(key)
+            value = joblib.load(path)
+            os.remove(path)
+            self.stats['reloaded'] += 1
+            self._store(key, value)
+            return value
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._discard_spilled(key)
+        if key in self._data:
+            self.nbytes -= self._sizes[key]
+        self._store(key, value)
+
+    def __delitem__(self, key):
+        if key in self._data:
+            del self._data[key]
+            self.nbytes -= self._sizes.pop(key)
+        elif key in self._spilled:
+            self._discard_spilled(key)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data or key in self._spilled
+
+    def __iter__(self):
+        return iter(list(self._data) + list(self._spilled))
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._spilled)
+
+    def shrink(self, target_bytes: int) -> int:
+        """Evict entries, oldest first, until at most target_bytes are held; returns bytes freed"""
+        freed = 0
+        while self._data and self.nbytes > target_bytes:
+            freed += self._evict_oldest()
+        return freed
+
+    def refresh(self):
+        """Re-estimate the size of every in-memory entry"""
+        self._sizes = {key: estimate_size(value) for key, value in self._data.items()}
+        self.nbytes = sum(self._sizes.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, items=len(self._data), on_disk=len(self._spilled), bytes=self.nbytes)
+
+    def close(self):
+        """Forget spilled entries and delete their files"""
+        self._spilled.clear()
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._sizes[key] = estimate_size(value)
+        self.nbytes += self._sizes[key]
+        while self.max_items is not None and len(self._data) > self.max_items:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> int:
+        key, value = self._data.popitem(last=False)
+        size = self._sizes.pop(key)
+        self.nbytes -= size
+        if self.spill_root is not None:
+            try:
+                if self.spill_dir is None:
+                    os.makedirs(self.spill_root, exist_ok=True)
+                    self.spill_dir = tempfile.mkdtemp(dir=self.spill_root)
+                digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=12).hexdigest()
+                path = os.path.join(self.spill_dir, f"{digest}.joblib")
+                joblib.dump(value, path)
+                self._spilled[key] = path
+                self.stats['spilled'] += 1
+                return size
+            except Exception as e:
+                self.logger.error(f"Error spilling {key!r} to disk, dropping it: {str(e)}")
+        self.stats['evicted'] += 1
+        return size
+
+    def _discard_spilled(self, key):
+        path = self._spilled.pop(key, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+class MemoryGovernor:
+    """Sheds agent data before the process runs into its memory limit
+
+    Every ``interval`` seconds the memory in use is compared with ``budget``
+    bytes (by default the cgroup limit). Above ``high_water`` of the budget,
+    the largest shrinkable structures tracked by the agents are spilled or
+    evicted until the estimated excess over ``low_water`` is released.
+    """
+
+    def __init__(self, budget: Optional[int] = None, interval: float = 10.0,
+                 high_water: float = 0.85, low_water: float = 0.7):
+        self.budget = budget or cgroup_memory_limit()
+        self.interval = interval
+        self.high_water = high_water
+        self.low_water = low_water
+        self.stats = {'checks': 0, 'triggered': 0, 'freed_bytes': 0, 'last_usage': None}
+        self.logger = logging.getLogger('memory')
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, agents: Callable[[], Iterable[Any]]):
+        """Start checking periodically; ``agents`` returns the agents to govern"""
+        if self._task is None and self.budget:
+            self._task = asyncio.get_running_loop().create_task(self._run(agents))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, agents: Callable[[], Iterable[Any]]):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check(agents())
+            except Exception as e:
+                self.logger.error(f"Error enforcing memory budget: {str(e)}")
+
+    def check(self, agents: Iterable[Any]) -> int:
+        """Release memory if usage is above the high-water mark; returns estimated bytes freed"""
+        usage = memory_in_use()
+        self.stats['checks'] += 1
+        self.stats['last_usage'] = usage
+        if not self.budget or usage is None or usage < self.high_water * self.budget:
+            return 0
+
+        excess = usage - self.low_water * self.budget
+        structures = [
+            structure for agent in agents
+            for structure in agent.tracked_memory.values()
+            if hasattr(structure, 'shrink')
+        ]
+        freed = 0
+        for structure in sorted(structures, key=lambda s: s.nbytes, reverse=True):
+            if freed >= excess:
+                break
+            freed += structure.shrink(max(0, int(structure.nbytes - (excess - freed))))
+        gc.collect()
+
+        self.stats['triggered'] += 1
+        self.stats['freed_bytes'] += freed
+        self.logger.warning(
+            f"Memory in use {usage / 2**20:.0f} MiB of {self.budget / 2**20:.0f} MiB budget, "
+            f"released {freed / 2**20:.1f} MiB of agent data"
+        )
+        return freed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, budget=self.budget)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple
+
+class EdgeMetrics:
+    """Delivery statistics for messages flowing from one agent to another"""
+
+    def __init__(self):
+        self.sent = 0
+        self.delivered = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'sent': self.sent,
+            'delivered': self.delivered,
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'blocked_seconds': round(self.blocked_seconds, 4),
+            'avg_latency': round(self.total_latency / self.delivered, 4) if self.delivered else 0.0,
+            'max_latency': round(self.max_latency, 4)
+        }
+
+class MessageBus:
+    """Routes messages between agents through bounded per-agent mailboxes
+
+    Every registered agent owns an ``asyncio.Queue`` of at most ``maxsize``
+    messages. ``send`` waits while the target's mailbox is full, so a producer
+    is slowed down to the pace of its slowest consumer instead of growing an
+    unbounded backlog. Depth, blocking time and queueing latency are tracked
+    per (sender, target) edge.
+
+    Messages for targets that are not registered locally are handed to the
+    optional ``forward(sender_id, target_id, content)`` coroutine, which is how
+    agents hosted in a worker process reach the rest of the system. A forwarded
+    message counts as delivered once ``forward`` returns; its latency is the
+    time the hand-off took.
+    """
+
+    def __init__(self, maxsize: int = 100,
+                 forward: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None):
+        self.maxsize = maxsize
+        self.forward = forward
+        self.mailboxes: Dict[str, asyncio.Queue] = {}
+        self.edges: Dict[Tuple[str, str], EdgeMetrics] = {}
+        self.dropped: Dict[str, int] = {}
+        self.logger = logging.getLogger('message_bus')
+
+    def register(self, agent_id: str) -> asyncio.Queue:
+        """Create the mailbox for an agent"""
+        if agent_id not in self.mailboxes:
+            self.mailboxes[agent_id] = asyncio.Queue(maxsize=self.maxsize)
+        return self.mailboxes[agent_id]
+
+    def unregister(self, agent_id: str):
+        self.mailboxes.pop(agent_id, None)
+
+    async def send(self, sender_id: str, target_id: str, content: Dict[str, Any]) -> bool:
+        """Deliver a message to the target's mailbox, waiting while it is full"""
+        mailbox = self.mailboxes.get(target_id)
+        if mailbox is None and self.forward is not None:
+            edge = self.edges.setdefault((sender_id, target_id), EdgeMetrics())
+            started = time.perf_counter()
+            try:
+                await self.forward(sender_id, target_id, content)
+            except Exception as e:
+                self.logger.error(f"Error forwarding a message from {sender_id} to {target_id}: {str(e)}")
+                self.dropped[target_id] = self.dropped.get(target_id, 0) + 1
+                return False
+            # Handed off to the next hop: the message never waits in a local mailbox
+            elapsed = time.perf_counter() - started
+            edge.blocked_seconds += elapsed
+            edge.sent += 1
+            edge.delivered += 1
+            edge.total_latency += elapsed
+            edge.max_latency = max(edge.max_latency, elapsed)
+            return True
+        if mailbox is None:
+            if target_id not in self.dropped:
+                self.logger.warning(f"No agent registered as {target_id}, dropping messages from {sender_id}")
+            self.dropped[target_id] = self.dropped.get(target_id, 0) + 1
+            return False
+
+        edge = self.edges.setdefault((sender_id, target_id), EdgeMetrics())
+        message = {
+            'timestamp': datetime.now(),
+            'from': sender_id,
+            'to': target_id,
+            'content': content,
+            'enqueued': time.perf_counter()
+        }
+
+        started = time.perf_counter()
+        await mailbox.put(message)
+        edge.blocked_seconds += time.perf_counter() - started
+        edge.sent += 1
+        edge.depth += 1
+        edge.max_depth = max(edge.max_depth, edge.depth)
+        return True
+
+    async def receive(self, agent_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Take the next message for an agent
+
+        ``timeout=None`` waits indefinitely, ``timeout=0`` returns immediately;
+        None is returned when no message arrived in time.
+        """
+        mailbox = self.mailboxes.get(agent_id)
+        if mailbox is None:
+            return None
+        try:
+            if timeout == 0:
+                message = mailbox.get_nowait()
+            elif timeout is None:
+                message = await mailbox.get()
+            else:
+                message = await asyncio.wait_for(mailbox.get(), timeout)
+        except (asyncio.QueueEmpty, asyncio.TimeoutError):
+            return None
+
+        latency = time.perf_counter() - message['enqueued']
+        edge = self.edges.get((message['from'], agent_id))
+        if edge is not None:
+            edge.delivered += 1
+            edge.depth -= 1
+            edge.total_latency += latency
+            edge.max_latency = max(edge.max_latency, latency)
+        return message
+
+    def pending(self, agent_id: str) -> int:
+        mailbox = self.mailboxes.get(agent_id)
+        return mailbox.qsize() if mailbox is not None else 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-edge delivery metrics keyed by 'sender->target'"""
+        return {
+            'edges': {f"{sender}->{target}": edge.to_dict() for (sender, target), edge in self.edges.items()},
+            'mailboxes': {agent_id: mailbox.qsize() for agent_id, mailbox in self.mailboxes.items()},
+            'dropped': dict(self.dropped)
+        }
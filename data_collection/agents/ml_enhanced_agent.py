@@ -1,79 +1,63 @@
 from .base_agent import Agent
+from .compute import ComputeOffloader
+from .memory import BoundedDict
+from .online_anomaly import OnlineAnomalyDetector
+from .forecasting import ForecastService
+from ..config import config
 import numpy as np
-from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-import tensorflow as tf
-from prophet import Prophet
 import pandas as pd
+from typing import Dict
 from datetime import datetime, timedelta
+import collections
+import itertools
 import logging
+import os
 
 class MLEnhancedAgent(Agent):
     def __init__(self, agent_id: str, name: str):
         super().__init__(agent_id, name)
-        self.anomaly_detector = None
-        self.time_series_model = None
+        self.anomaly_detectors: Dict[str, OnlineAnomalyDetector] = {}
         self.scaler = StandardScaler()
-        self.performance_history = []
+        self.performance_history = self.track_memory(
+            'performance_history', collections.deque(maxlen=config.memory.history_size)
+        )
         self.learning_rate = 0.01
+        self.compute = ComputeOffloader(
+            mode=config.compute.mode,
+            max_workers=config.compute.max_workers or None,
+            default_timeout=config.compute.timeout
+        )
+        self.forecaster = ForecastService(
+            compute=self.compute,
+            mode=config.forecast.mode,
+            refit_points=config.forecast.refit_points,
+            horizon=config.forecast.horizon
+        )
         
-    async def initialize_ml_models(self):
-        """Initialize machine learning models"""
+    def bounded_dict(self, name: str) -> BoundedDict:
+        """A tracked dictionary bounded by the configured entry limit and eviction policy"""
+        spill_dir = None
+        if config.memory.eviction == 'spill':
+            spill_dir = os.path.join(config.memory.spill_dir, self.agent_id, name)
+        return self.track_memory(name, BoundedDict(max_items=config.memory.max_entries, spill_dir=spill_dir))
+        
+    async def detect_anomalies(self, data: np.ndarray, stream: str = "default") -> np.ndarray:
+        """Flag anomalies (-1) in new data with the stream's online detector, which learns from it"""
         try:
-            # Initialize anomaly detection model
-            self.anomaly_detector = IsolationForest(
-                contamination=0.1,
-                random_state=42
-            )
-            
-            # Initialize time series model
-            self.time_series_model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=True
-            )
-            
-            self.logger.info(f"Initialized ML models for {self.name}")
-        except Exception as e:
-            self.logger.error(f"Error initializing ML models: {str(e)}")
-    
-    async def detect_anomalies(self, data: np.ndarray) -> np.ndarray:
-        """Detect anomalies in the data using Isolation Forest"""
-        try:
-            if self.anomaly_detector is None:
-                await self.initialize_ml_models()
-                
-            # Scale the data
-            scaled_data = self.scaler.fit_transform(data.reshape(-1, 1))
-            
-            # Predict anomalies
-            predictions = self.anomaly_detector.fit_predict(scaled_data)
-            return predictions
+            if stream not in self.anomaly_detectors:
+                self.anomaly_detectors[stream] = OnlineAnomalyDetector()
+            # Cost is linear in the new records only, so this stays on the event loop
+            return self.anomaly_detectors[stream].fit_predict(data)
         except Exception as e:
             self.logger.error(f"Error detecting anomalies: {str(e)}")
             return np.zeros(len(data))
     
-    async def predict_time_series(self, historical_data: pd.DataFrame, 
-                                forecast_periods: int = 24) -> pd.DataFrame:
-        """Predict future values using Prophet"""
+    async def predict_time_series(self, historical_data: pd.Series, 
+                                forecast_periods: int = 24, key: str = "default") -> pd.DataFrame:
+        """Predict hourly values of a series; each key keeps its own cached, warm-started model"""
         try:
-            if self.time_series_model is None:
-                await self.initialize_ml_models()
-                
-            # Prepare data for Prophet
-            df = pd.DataFrame({
-                'ds': historical_data.index,
-                'y': historical_data.values
-            })
-            
-            # Fit model and make predictions
-            self.time_series_model.fit(df)
-            future = self.time_series_model.make_future_dataframe(
-                periods=forecast_periods,
-                freq='H'
-            )
-            forecast = self.time_series_model.predict(future)
-            return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+            return await self.forecaster.forecast(key, historical_data, forecast_periods)
         except Exception as e:
             self.logger.error(f"Error predicting time series: {str(e)}")
             return pd.DataFrame()
@@ -87,7 +71,7 @@ class MLEnhancedAgent(Agent):
             })
             
             # Analyze recent performance
-            recent_performance = [p['metric'] for p in self.performance_history[-10:]]
+            recent_performance = [p['metric'] for p in itertools.islice(reversed(self.performance_history), 10)]
             avg_performance = np.mean(recent_performance)
             
             # Adjust learning rate based on performance
@@ -0,0 +1,143 @@
+import os
+from typing import Any, Dict, Optional
+import joblib
+import numpy as np
+
+class RunningScaler:
+    """Streaming per-column mean and variance (Welford, merged batch-wise with Chan's formula)
+
+    Non-finite values are skipped, so every column keeps its own count and a
+    missing reading never reaches the running sums. ``horizon`` caps the
+    effective number of observations, which turns the estimates into
+    exponentially forgetting ones so they follow slow drift.
+    """
+
+    def __init__(self, horizon: Optional[int] = 10000):
+        self.horizon = horizon
+        self.count: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.m2: Optional[np.ndarray] = None
+
+    def partial_fit(self, X: np.ndarray) -> 'RunningScaler':
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        finite = np.isfinite(X)
+        n = finite.sum(axis=0).astype(np.float64)
+        if not n.any():
+            return self
+        batch_mean = np.divide(np.where(finite, X, 0.0).sum(axis=0), n, out=np.zeros_like(n), where=n > 0)
+        batch_m2 = (np.where(finite, X - batch_mean, 0.0) ** 2).sum(axis=0)
+        if self.mean is None:
+            self.count, self.mean, self.m2 = n, batch_mean, batch_m2
+        else:
+            total = self.count + n
+            weight = np.divide(n, total, out=np.zeros_like(n), where=total > 0)
+            delta = batch_mean - self.mean
+            self.mean = self.mean + delta * weight
+            self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * weight
+            self.count = total
+        if self.horizon is not None:
+            over = self.count > self.horizon
+            self.m2 = np.where(over, self.m2 * self.horizon / np.maximum(self.count, 1.0), self.m2)
+            self.count = np.minimum(self.count, float(self.horizon))
+        return self
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(np.divide(self.m2, self.count, out=np.zeros_like(self.m2), where=self.count > 0))
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Standardized values; columns without variance map equal values to 0 and others to ±inf
+
+        Columns that have not seen a finite value yet map to 0, non-finite inputs stay NaN.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        scale = np.maximum(self.std, 1e-9 * np.maximum(np.abs(self.mean), 1.0))
+        z = (X - self.mean) / scale
+        z[:, self.count == 0] = 0.0
+        return z
+
+class OnlineAnomalyDetector:
+    """Streaming z-score anomaly detector for a numeric series or feature matrix
+
+    Records are scored against the statistics of everything seen before their
+    batch; a record is anomalous when any column lies more than ``threshold``
+    standard deviations from the running mean. The statistics are then updated
+    with the batch winsorized to that band, so outliers cannot inflate the
+    variance, while a persistent level shift still pulls the mean over. The
+    first ``warmup`` records are all treated as normal. Cost is O(batch size),
+    independent of how much history has been seen.
+    """
+
+    def __init__(self, threshold: float = 3.5, warmup: int = 30, horizon: Optional[int] = 10000):
+        self.threshold = threshold
+        self.warmup = warmup
+        self.scaler = RunningScaler(horizon=horizon)
+        self.seen = 0
+        self.flagged = 0
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Largest absolute z-score of each record over its finite values (0 for columns still warming up)"""
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        if self.scaler.mean is None:
+            return np.zeros(len(X))
+        z = np.abs(self.scaler.transform(X))
+        z[~np.isfinite(X)] = 0.0
+        z[:, self.scaler.count < self.warmup] = 0.0
+        return z.max(axis=1) if z.shape[1] else np.zeros(len(X))
+
+    def update(self, X: np.ndarray):
+        """Fold a batch into the running statistics"""
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        if self.scaler.mean is not None:
+            band = np.where(self.scaler.count >= self.warmup, self.threshold * self.scaler.std, np.inf)
+            X = np.clip(X, self.scaler.mean - band, self.scaler.mean + band)
+        self.scaler.partial_fit(X)
+        self.seen += len(X)
+
+    def fit_predict(self, X: np.ndarray) -> np.ndarray:
+        """Score a batch, learn from it, and return 1 for normal and -1 for anomalous records"""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return np.zeros(0, dtype=int)
+        predictions = np.where(self.score(X) > self.threshold, -1, 1)
+        self.update(X)
+        self.flagged += int((predictions == -1).sum())
+        return predictions
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            'threshold': self.threshold,
+            'warmup': self.warmup,
+            'horizon': self.scaler.horizon,
+            'count': self.scaler.count,
+            'mean': self.scaler.mean,
+            'm2': self.scaler.m2,
+            'seen': self.seen,
+            'flagged': self.flagged
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'OnlineAnomalyDetector':
+        detector = cls(threshold=state['threshold'], warmup=state['warmup'], horizon=state['horizon'])
+        if state['mean'] is not None:
+            mean = np.asarray(state['mean'], dtype=np.float64)
+            m2 = np.asarray(state['m2'], dtype=np.float64)
+            # Older checkpoints share one count across columns, and may carry NaN sums
+            count = np.broadcast_to(np.asarray(state['count'], dtype=np.float64), mean.shape).copy()
+            valid = np.isfinite(mean) & np.isfinite(m2)
+            detector.scaler.count = np.where(valid, count, 0.0)
+            detector.scaler.mean = np.where(valid, mean, 0.0)
+            detector.scaler.m2 = np.where(valid, m2, 0.0)
+        detector.seen = state['seen']
+        detector.flagged = state['flagged']
+        return detector
+
+    def save(self, path: str):
+        """Checkpoint the detector state, replacing the previous checkpoint atomically"""
+        tmp_path = f"{path}.tmp"
+        joblib.dump(self.get_state(), tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'OnlineAnomalyDetector':
+        return cls.from_state(joblib.load(path))
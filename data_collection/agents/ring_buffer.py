@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+class StatsRingBuffer:
+    """Fixed-capacity, NumPy-backed ring buffer of typed per-event statistics
+
+    ``columns`` maps column names to NumPy dtypes, plus ``"category"`` for
+    low-cardinality strings, which are stored as int32 codes. Appends are O(1)
+    and overwrite the oldest row once ``capacity`` rows are held. Running sums
+    over the last ``window`` rows of every numeric and boolean column are kept
+    up to date on append, so rolling means cost O(1) to read; ``to_frame``
+    builds a pandas view of the retained rows only when one is needed.
+    """
+
+    def __init__(self, columns: Dict[str, str], capacity: int = 10000, window: int = 100):
+        if window > capacity:
+            raise ValueError("window cannot exceed capacity")
+        self.capacity = capacity
+        self.window = window
+        self.dtypes = dict(columns)
+        self.data: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, List[str]] = {}
+        self._codes: Dict[str, Dict[str, int]] = {}
+        for name, dtype in self.dtypes.items():
+            if dtype == 'category':
+                self.data[name] = np.zeros(capacity, dtype=np.int32)
+                self.categories[name] = []
+                self._codes[name] = {}
+            else:
+                self.data[name] = np.zeros(capacity, dtype=dtype)
+        self.numeric = [
+            name for name, dtype in self.dtypes.items()
+            if dtype != 'category' and (np.issubdtype(np.dtype(dtype), np.number) or np.dtype(dtype) == np.bool_)
+        ]
+        self.window_sums = {name: 0.0 for name in self.numeric}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, **row: Any):
+        """Append one row; missing columns are stored as zero / empty"""
+        position = self.count % self.capacity
+        # The row leaving the rolling window (still in the buffer since window <= capacity)
+        expired = (self.count - self.window) % self.capacity if self.count >= self.window else None
+        for name in self.numeric:
+            if expired is not None:
+                self.window_sums[name] -= float(self.data[name][expired])
+        for name, dtype in self.dtypes.items():
+            value = row.get(name)
+            if dtype == 'category':
+                value = self._code(name, '' if value is None else str(value))
+            elif value is None:
+                value = 0
+            elif isinstance(value, datetime):
+                value = np.datetime64(value)
+            self.data[name][position] = value
+        for name in self.numeric:
+            self.window_sums[name] += float(self.data[name][position])
+        self.count += 1
+        if self.count % self.capacity == 0:
+            # Re-sum once per lap so floating point drift cannot accumulate
+            for name in self.numeric:
+                self.window_sums[name] = float(self.column(name, self.window).sum(dtype=np.float64))
+
+    def rolling_mean(self, column: str) -> float:
+        """Mean of a column over the last ``window`` rows"""
+        n = min(self.count, self.window)
+        return self.window_sums[column] / n if n else float('nan')
+
+    def rolling_stats(self) -> Dict[str, float]:
+        return {name: self.rolling_mean(name) for name in self.numeric}
+
+    def column(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """Values of one column in insertion order (a copy once the buffer has wrapped)"""
+        size = len(self)
+        last = size if last is None else min(last, size)
+        end = self.count % self.capacity if self.count >= self.capacity else self.count
+        start = end - last
+        values = self.data[name]
+        if start >= 0:
+            return values[start:end]
+        return np.concatenate([values[start:], values[:end]])
+
+    def to_frame(self, last: Optional[int] = None) -> pd.DataFrame:
+        """DataFrame of the most recent rows (all of them by default), oldest first"""
+        frame = {}
+        for name, dtype in self.dtypes.items():
+            values = self.column(name, last)
+            if dtype == 'category':
+                frame[name] = pd.Categorical.from_codes(values, categories=self.categories[name]) \
+                    if self.categories[name] else pd.Categorical([])
+            else:
+                frame[name] = values
+        return pd.DataFrame(frame)
+
+    def tail(self, n: int) -> pd.DataFrame:
+        return self.to_frame(last=n)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.data.values())
+
+    def _code(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return codes[value]
@@ -0,0 +1,115 @@
+import warnings
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+class RobustBounds:
+    """Quartiles, medians and IQR fences of a set of numeric columns
+
+    Computed for all columns with a single ``np.nanquantile(..., axis=0)``
+    call, then shared: the processor imputes and caps with them and sends
+    them along with the processed data so the analyzer does not recompute
+    them.
+    """
+
+    def __init__(self, columns: Sequence[str], quantiles: np.ndarray, factor: float = 1.5):
+        self.columns = list(columns)
+        self.quantiles = np.asarray(quantiles, dtype=np.float64).reshape(len(QUANTILES), len(self.columns))
+        self.factor = factor
+        self._index = {col: i for i, col in enumerate(self.columns)}
+
+    @property
+    def q1(self) -> np.ndarray:
+        return self.quantiles[0]
+
+    @property
+    def median(self) -> np.ndarray:
+        return self.quantiles[1]
+
+    @property
+    def q3(self) -> np.ndarray:
+        return self.quantiles[2]
+
+    @property
+    def lower(self) -> np.ndarray:
+        return self.q1 - self.factor * (self.q3 - self.q1)
+
+    @property
+    def upper(self) -> np.ndarray:
+        return self.q3 + self.factor * (self.q3 - self.q1)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._index
+
+    def select(self, columns: Sequence[str]) -> 'RobustBounds':
+        positions = [self._index[col] for col in columns]
+        return RobustBounds(columns, self.quantiles[:, positions], self.factor)
+
+    def merge(self, other: 'RobustBounds') -> 'RobustBounds':
+        """Bounds of both sets of columns; other wins for columns in both"""
+        kept = [col for col in self.columns if col not in other]
+        quantiles = np.hstack([self.select(kept).quantiles, other.quantiles])
+        return RobustBounds(kept + other.columns, quantiles, self.factor)
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            col: {
+                'q1': float(self.q1[i]),
+                'median': float(self.median[i]),
+                'q3': float(self.q3[i]),
+                'lower_bound': float(self.lower[i]),
+                'upper_bound': float(self.upper[i])
+            }
+            for col, i in self._index.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, float]], factor: float = 1.5) -> 'RobustBounds':
+        columns = list(data)
+        quantiles = np.array([[data[col][name] for col in columns] for name in ('q1', 'median', 'q3')])
+        return cls(columns, quantiles, factor)
+
+def numeric_values(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """Columns as one float64 matrix, missing values as NaN (always a copy)"""
+    return df[list(columns)].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+def compute_bounds(df: pd.DataFrame, columns: Sequence[str], factor: float = 1.5) -> RobustBounds:
+    """Quartiles and medians of every column in one vectorized call"""
+    columns = list(columns)
+    if not columns or len(df) == 0:
+        return RobustBounds(columns, np.full((len(QUANTILES), len(columns)), np.nan), factor)
+    values = numeric_values(df, columns)
+    with warnings.catch_warnings():
+        # All-NaN columns get NaN bounds; don't warn about them
+        warnings.simplefilter('ignore', RuntimeWarning)
+        quantiles = np.nanquantile(values, QUANTILES, axis=0)
+    return RobustBounds(columns, quantiles, factor)
+
+def bounds_for(df: pd.DataFrame, columns: Sequence[str], cached: Optional[RobustBounds] = None) -> RobustBounds:
+    """Bounds of the given columns, reusing cached ones and computing only the rest"""
+    columns = list(columns)
+    if cached is None:
+        return compute_bounds(df, columns)
+    missing = [col for col in columns if col not in cached]
+    if missing:
+        cached = cached.merge(compute_bounds(df, missing, cached.factor))
+    return cached.select(columns)
+
+def impute_median(values: np.ndarray, bounds: RobustBounds) -> np.ndarray:
+    """Replace NaNs in place with their column's median; returns the missing mask"""
+    missing = np.isnan(values)
+    rows, cols = np.nonzero(missing)
+    values[rows, cols] = bounds.median[cols]
+    return missing
+
+def clip_outliers(values: np.ndarray, bounds: RobustBounds) -> np.ndarray:
+    """Cap values in place to the IQR fences; returns the mask of values that were outside"""
+    lower, upper = bounds.lower, bounds.upper
+    outliers = (values < lower) | (values > upper)
+    np.clip(values, lower, upper, out=values)
+    return outliers
+
+def outlier_counts(values: np.ndarray, bounds: RobustBounds) -> np.ndarray:
+    return ((values < bounds.lower) | (values > bounds.upper)).sum(axis=0)
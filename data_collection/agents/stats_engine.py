@@ -0,0 +1,255 @@
+import warnings
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+SKETCH_SIZE = 1024
+DESCRIBE_QUANTILES = (0.25, 0.5, 0.75)
+
+def numeric_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """Numeric columns of a frame, the input of StatsAccumulator"""
+    return df.select_dtypes(include=[np.number])
+
+def _to_values(frame: pd.DataFrame) -> np.ndarray:
+    return frame.to_numpy(dtype=np.float64, na_value=np.nan)
+
+class StatsAccumulator:
+    """Mergeable per-column statistics of a stream of numeric batches
+
+    ``update`` folds a batch into shifted power sums (counts and the first four
+    moments), minima and maxima, a bottom-k random sample per column for
+    quantiles, and pairwise-complete co-moments for the covariance and
+    correlation matrices, all from one float matrix in a handful of vectorized
+    passes and matrix products. Every component is a sum or a mergeable sample,
+    so accumulators of separate batches combine with ``merge`` into the
+    statistics of their union, with columns aligned by name. Results match
+    pandas' ``describe``, ``skew``, ``kurtosis`` and ``corr``; quantiles are
+    exact until a column has more than ``sketch_size`` values.
+    """
+
+    def __init__(self, columns: Sequence[str], sketch_size: int = SKETCH_SIZE, seed: Optional[int] = None):
+        p = len(columns)
+        self.columns = list(columns)
+        self.sketch_size = sketch_size
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        # Sums are of x - shift, which keeps them small and avoids cancellation
+        self.shift = np.zeros(p)
+        self.power = np.zeros((5, p))
+        self.minimum = np.full(p, np.inf)
+        self.maximum = np.full(p, -np.inf)
+        # [i, j] entries are over rows where both column i and column j are present
+        self.pair_count = np.zeros((p, p))
+        self.pair_sum = np.zeros((p, p))
+        self.pair_sq = np.zeros((p, p))
+        self.cross = np.zeros((p, p))
+        self.sketch_values = np.empty((0, p))
+        self.sketch_keys = np.empty((0, p))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs) -> 'StatsAccumulator':
+        frame = numeric_matrix(df)
+        accumulator = cls([str(col) for col in frame.columns], **kwargs)
+        return accumulator.update(_to_values(frame))
+
+    @property
+    def count(self) -> np.ndarray:
+        return self.power[0]
+
+    def update(self, values: np.ndarray) -> 'StatsAccumulator':
+        """Fold a batch (rows by ``columns``, NaN for missing) into the statistics"""
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        if self.rows == 0 and len(values):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        self.rows += len(values)
+
+        centered = np.where(present, values - self.shift, 0.0)
+        squared = centered * centered
+        batch = np.stack([
+            present.sum(axis=0),
+            centered.sum(axis=0),
+            squared.sum(axis=0),
+            (squared * centered).sum(axis=0),
+            (squared * squared).sum(axis=0)
+        ])
+        self.power += batch
+        self.minimum = np.fmin(self.minimum, np.min(values, axis=0, initial=np.inf, where=present))
+        self.maximum = np.fmax(self.maximum, np.max(values, axis=0, initial=-np.inf, where=present))
+
+        if present.all():
+            # Without missing values every pair shares all rows
+            p = values.shape[1]
+            self.pair_count += len(values)
+            self.pair_sum += np.broadcast_to(batch[1][:, None], (p, p))
+            self.pair_sq += np.broadcast_to(batch[2][:, None], (p, p))
+        else:
+            mask = present.astype(np.float64)
+            self.pair_count += mask.T @ mask
+            self.pair_sum += centered.T @ mask
+            self.pair_sq += squared.T @ mask
+        self.cross += centered.T @ centered
+
+        keys = self.rng.random(values.shape)
+        keys[~present] = np.inf
+        self._keep_sample(np.vstack([self.sketch_values, values]), np.vstack([self.sketch_keys, keys]))
+        return self
+
+    def _keep_sample(self, values: np.ndarray, keys: np.ndarray):
+        """Keep the values with the smallest random keys, a uniform sample of each column"""
+        if len(keys) > self.sketch_size:
+            keep = np.argpartition(keys, self.sketch_size - 1, axis=0)[:self.sketch_size]
+            values = np.take_along_axis(values, keep, axis=0)
+            keys = np.take_along_axis(keys, keep, axis=0)
+        self.sketch_values, self.sketch_keys = values, keys
+
+    def _reshift(self, shift: np.ndarray):
+        """Re-express all sums relative to a new shift"""
+        d = self.shift - shift
+        if not d.any():
+            return
+        S = self.power
+        self.power = np.stack([
+            S[0],
+            S[1] + d * S[0],
+            S[2] + 2 * d * S[1] + d ** 2 * S[0],
+            S[3] + 3 * d * S[2] + 3 * d ** 2 * S[1] + d ** 3 * S[0],
+            S[4] + 4 * d * S[3] + 6 * d ** 2 * S[2] + 4 * d ** 3 * S[1] + d ** 4 * S[0]
+        ])
+        di, dj = d[:, None], d[None, :]
+        pair_sum = self.pair_sum
+        self.pair_sq = self.pair_sq + 2 * di * pair_sum + self.pair_count * di ** 2
+        self.cross = self.cross + dj * pair_sum + di * pair_sum.T + self.pair_count * di * dj
+        self.pair_sum = pair_sum + self.pair_count * di
+        self.shift = shift
+
+    def reindex(self, columns: Sequence[str]) -> 'StatsAccumulator':
+        """Copy with the given columns; columns not seen before are empty"""
+        columns = list(columns)
+        result = StatsAccumulator(columns, self.sketch_size)
+        result.rng = self.rng
+        result.rows = self.rows
+        index = {col: i for i, col in enumerate(self.columns)}
+        new = [i for i, col in enumerate(columns) if col in index]
+        old = [index[columns[i]] for i in new]
+        result.shift[new] = self.shift[old]
+        result.power[:, new] = self.power[:, old]
+        result.minimum[new] = self.minimum[old]
+        result.maximum[new] = self.maximum[old]
+        for name in ('pair_count', 'pair_sum', 'pair_sq', 'cross'):
+            getattr(result, name)[np.ix_(new, new)] = getattr(self, name)[np.ix_(old, old)]
+        result.sketch_values = np.full((len(self.sketch_values), len(columns)), np.nan)
+        result.sketch_keys = np.full((len(self.sketch_keys), len(columns)), np.inf)
+        result.sketch_values[:, new] = self.sketch_values[:, old]
+        result.sketch_keys[:, new] = self.sketch_keys[:, old]
+        return result
+
+    def merge(self, other: 'StatsAccumulator') -> 'StatsAccumulator':
+        """Statistics of both accumulators' data, over the union of their columns"""
+        columns = self.columns + [col for col in other.columns if col not in set(self.columns)]
+        merged, other = self.reindex(columns), other.reindex(columns)
+        # Columns without data take the other side's shift, which makes their conversion free
+        shift = np.where(merged.count > 0, merged.shift, other.shift)
+        merged._reshift(shift)
+        other._reshift(shift)
+        merged.rows += other.rows
+        merged.power += other.power
+        merged.minimum = np.fmin(merged.minimum, other.minimum)
+        merged.maximum = np.fmax(merged.maximum, other.maximum)
+        merged.pair_count += other.pair_count
+        merged.pair_sum += other.pair_sum
+        merged.pair_sq += other.pair_sq
+        merged.cross += other.cross
+        merged._keep_sample(np.vstack([merged.sketch_values, other.sketch_values]),
+                            np.vstack([merged.sketch_keys, other.sketch_keys]))
+        return merged
+
+    def moments(self) -> Dict[str, np.ndarray]:
+        """Mean, sample std, and bias-corrected skewness and excess kurtosis as pandas computes them"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = self.count
+            S = self.power / np.where(n > 0, n, np.nan)
+            c = S[1]
+            m2 = np.maximum(S[2] - c ** 2, 0.0)
+            m3 = S[3] - 3 * c * S[2] + 2 * c ** 3
+            m4 = S[4] - 4 * c * S[3] + 6 * c ** 2 * S[2] - 3 * c ** 4
+            std = np.where(n > 1, np.sqrt(m2 * n / (n - 1)), np.nan)
+            # Relative tolerance, so rounding noise of a constant column counts as no variance
+            flat = m2 <= 1e-14 * np.maximum(self.shift ** 2 + c ** 2, 1e-300)
+            skew = np.where(flat, 0.0, m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2))
+            kurt = np.where(flat, 0.0, ((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3)))
+        return {
+            'mean': self.shift + c,
+            'std': std,
+            'skewness': np.where(n > 2, skew, np.nan),
+            'kurtosis': np.where(n > 3, kurt, np.nan)
+        }
+
+    def quantiles(self, q: Sequence[float] = DESCRIBE_QUANTILES) -> np.ndarray:
+        """Quantiles of every column (rows follow q), from the sample"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanquantile(self.sketch_values, q, axis=0) if len(self.sketch_values) else np.full((len(q), len(self.columns)), np.nan)
+
+    def covariance(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = self.pair_count
+            return (self.cross - self.pair_sum * self.pair_sum.T / n) / np.where(n > 1, n - 1, np.nan)
+
+    def correlation(self) -> np.ndarray:
+        """Pearson correlations over pairwise-complete rows, like ``DataFrame.corr``"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = np.where(self.pair_count > 1, self.pair_count, np.nan)
+            comoment = self.cross - self.pair_sum * self.pair_sum.T / n
+            spread = np.maximum(self.pair_sq - self.pair_sum ** 2 / n, 0.0)
+            corr = np.clip(comoment / np.sqrt(spread * spread.T), -1.0, 1.0)
+        corr[np.where(spread * spread.T == 0)] = np.nan
+        diagonal = np.diag_indices_from(corr)
+        corr[diagonal] = np.where(np.isnan(corr[diagonal]), np.nan, 1.0)
+        return corr
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        """Same layout as ``DataFrame.describe().to_dict()``"""
+        moments = self.moments()
+        quantiles = self.quantiles()
+        empty = self.count == 0
+        minimum = np.where(empty, np.nan, self.minimum)
+        maximum = np.where(empty, np.nan, self.maximum)
+        return {
+            col: {
+                'count': float(self.count[i]),
+                'mean': float(moments['mean'][i]) if not empty[i] else np.nan,
+                'std': float(moments['std'][i]),
+                'min': float(minimum[i]),
+                '25%': float(quantiles[0, i]),
+                '50%': float(quantiles[1, i]),
+                '75%': float(quantiles[2, i]),
+                'max': float(maximum[i])
+            }
+            for i, col in enumerate(self.columns)
+        }
+
+    def summary(self, correlations: bool = True) -> Dict[str, Any]:
+        """Summary, missing counts, skewness, kurtosis and optionally correlations keyed by column"""
+        moments = self.moments()
+        result = {
+            'rows': self.rows,
+            'summary': self.describe(),
+            'missing_values': dict(zip(self.columns, (self.rows - self.count).astype(int).tolist())),
+            'skewness': dict(zip(self.columns, moments['skewness'].tolist())),
+            'kurtosis': dict(zip(self.columns, moments['kurtosis'].tolist()))
+        }
+        if correlations:
+            correlation = self.correlation()
+            result['correlations'] = {
+                col: dict(zip(self.columns, correlation[:, j].tolist())) for j, col in enumerate(self.columns)
+            }
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.shift, self.power, self.minimum, self.maximum, self.pair_count, self.pair_sum,
+                  self.pair_sq, self.cross, self.sketch_values, self.sketch_keys]
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from data_collection.agents.agent_process import ProcessAgentGroup
+from data_collection.agents.base_agent import Agent
+from data_collection.agents.message_bus import MessageBus
+
+class PartitionCounter(Agent):
+    """Counts messages per partition, keeping the counts in COUNTER_DIR between owners"""
+
+    async def initialize(self):
+        self.counts = {}
+
+    def _path(self, partition):
+        return os.path.join(os.environ['COUNTER_DIR'], f"{partition}.json")
+
+    async def handle_message(self, message):
+        partition = message['content']['partition']
+        if partition not in self.counts:
+            path = self._path(partition)
+            self.counts[partition] = json.load(open(path)) if os.path.exists(path) else 0
+        await asyncio.sleep(0.005)
+        self.counts[partition] += 1
+        await self.send_message('sink', {'partition': partition, 'count': self.counts[partition]})
+
+    async def process(self):
+        pass
+
+    async def release_partitions(self, partitions):
+        for partition in partitions:
+            if partition in self.counts:
+                with open(self._path(partition), 'w') as f:
+                    json.dump(self.counts.pop(partition), f)
+
+    async def cleanup(self):
+        await self.release_partitions(list(self.counts))
+
+class Crasher(Agent):
+    """Replies to the sink with its pid, or exits on a 'crash' message"""
+
+    async def initialize(self):
+        pass
+
+    async def handle_message(self, message):
+        if message['content']['type'] == 'crash':
+            os._exit(3)
+        await self.send_message('sink', {'pid': os.getpid(), 'n': message['content']['n']})
+
+    async def process(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+async def send_load(bus, count, partitions=12):
+    for i in range(count):
+        await bus.send('producer', 'counter', {'partition': f"p{i % partitions}"})
+    # Wait until the group has routed everything into the replicas' inboxes
+    while bus.pending('counter'):
+        await asyncio.sleep(0.01)
+
+async def drain(bus, expected):
+    received = []
+    while len(received) < expected:
+        message = await asyncio.wait_for(bus.receive('sink'), 60)
+        received.append(message['content'])
+    return received
+
+def test_scaling_under_load_never_loses_partition_state(tmp_path, monkeypatch):
+    monkeypatch.setenv('COUNTER_DIR', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        bus = MessageBus(maxsize=1000)
+        bus.register('counter')
+        bus.register('sink')
+        group = ProcessAgentGroup(PartitionCounter('counter', 'counter'), replicas=1, mailbox_size=1000)
+        runner = asyncio.create_task(group.run(bus))
+        sink = asyncio.create_task(drain(bus, 720))
+        # Each scale happens while the old owners still have a backlog
+        await send_load(bus, 240)
+        await group.scale(3)
+        assert len(group.replicas) == 3
+        await send_load(bus, 240)
+        await group.scale(1)
+        assert len(group.replicas) == 1
+        await send_load(bus, 240)
+        received = await sink
+        group.stop()
+        await runner
+        return group, received
+
+    group, received = asyncio.run(scenario())
+    assert len(group.owners) == 12
+    counts = defaultdict(list)
+    for reply in received:
+        counts[reply['partition']].append(reply['count'])
+    # A new owner that loaded state before the old one saved it would repeat counts
+    for partition, seen in counts.items():
+        assert sorted(seen) == list(range(1, 61)), partition
+        with open(tmp_path / f"{partition}.json") as f:
+            assert json.load(f) == 60
+
+def test_status_of_removed_or_restarted_replicas_is_ignored():
+    async def scenario():
+        group = ProcessAgentGroup(PartitionCounter('counter', 'counter'), replicas=1)
+        group.replicas[0].process = type('Process', (), {'pid': 42, 'is_alive': lambda self: False})()
+        for item in [('status', 3, 7, {'state': 'removed'}), ('status', 0, 41, {'state': 'stale'}),
+                     ('status', 0, 42, {'state': 'current'})]:
+            group.outbox.put(item)
+        pump = asyncio.create_task(group._pump_outbox(MessageBus()))
+        while group.replicas[0].status.get('state') != 'current':
+            assert not pump.done()
+            await asyncio.sleep(0.05)
+        group.stop()
+        group.executor.shutdown(wait=True)
+        return group.replicas[0].status
+
+    assert asyncio.run(scenario()) == {'state': 'current'}
+
+def test_crashed_replica_restarts_and_keeps_its_inbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def wait_until(condition, timeout=30):
+        for _ in range(int(timeout / 0.05)):
+            if condition():
+                return
+            await asyncio.sleep(0.05)
+        raise AssertionError("condition not met")
+
+    async def scenario():
+        bus = MessageBus()
+        bus.register('crasher')
+        bus.register('sink')
+        group = ProcessAgentGroup(Crasher('crasher', 'crasher'), replicas=1, max_restarts=1)
+        runner = asyncio.create_task(group.run(bus))
+        replica = group.replicas[0]
+
+        await bus.send('test', 'crasher', {'type': 'echo', 'n': 1})
+        first = (await asyncio.wait_for(bus.receive('sink'), 30))['content']
+        await bus.send('test', 'crasher', {'type': 'crash'})
+        await wait_until(lambda: not replica.is_alive())
+        # Sent while the replica is down; it waits in the inbox for the restart
+        await bus.send('test', 'crasher', {'type': 'echo', 'n': 2})
+        second = (await asyncio.wait_for(bus.receive('sink'), 30))['content']
+        assert replica.restarts == 1
+
+        await bus.send('test', 'crasher', {'type': 'crash'})
+        await wait_until(lambda: not replica.is_alive())
+        await asyncio.sleep(2.5)
+        status = group.get_status()
+        group.stop()
+        await runner
+        return first, second, status
+
+    first, second, status = asyncio.run(scenario())
+    assert (first['n'], second['n']) == (1, 2)
+    assert first['pid'] != second['pid']
+    # Out of restarts, the replica stays down
+    assert not status['is_active']
+    assert status['replicas'][0]['restarts'] == 1
+    assert status['replicas'][0]['exitcode'] == 3
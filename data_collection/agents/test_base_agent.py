@@ -0,0 +1,57 @@
+import asyncio
+from data_collection.agents.base_agent import Agent
+from data_collection.agents.message_bus import MessageBus
+
+class Recorder(Agent):
+    """Logs every handle_message and process call of the event-driven run loop"""
+
+    def __init__(self, agent_id, tick_interval=None):
+        super().__init__(agent_id, agent_id)
+        self.tick_interval = tick_interval
+        self.calls = []
+
+    async def initialize(self):
+        self.calls.append('initialize')
+
+    async def handle_message(self, message):
+        self.calls.append(message['content']['n'])
+
+    async def process(self):
+        self.calls.append('process')
+
+    async def cleanup(self):
+        self.calls.append('cleanup')
+
+def test_run_loop_wakes_on_messages_and_batches_them():
+    async def scenario():
+        bus = MessageBus()
+        agent = Recorder('recorder')
+        agent.attach_bus(bus)
+        runner = asyncio.create_task(agent.run())
+        await asyncio.sleep(0.05)
+        # Without a tick the agent stays idle until a message arrives
+        assert agent.calls == ['initialize']
+        for n in range(3):
+            await bus.send('test', 'recorder', {'n': n})
+        await asyncio.sleep(0.05)
+        await bus.send('test', 'recorder', {'n': 3})
+        await asyncio.sleep(0.05)
+        agent.stop()
+        await asyncio.wait_for(runner, 1)
+        return agent.calls
+
+    assert asyncio.run(scenario()) == ['initialize', 0, 1, 2, 'process', 3, 'process', 'cleanup']
+
+def test_ticking_agent_processes_without_messages():
+    async def scenario():
+        agent = Recorder('ticker', tick_interval=0.05)
+        agent.attach_bus(MessageBus())
+        runner = asyncio.create_task(agent.run())
+        await asyncio.sleep(0.22)
+        agent.stop()
+        await asyncio.wait_for(runner, 1)
+        return agent.calls
+
+    calls = asyncio.run(scenario())
+    assert calls[0] == 'initialize' and calls[-1] == 'cleanup'
+    assert 3 <= calls.count('process') <= 6
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from data_collection.agents.batch_store import BatchStore, _open_segment
+
+FRAME = pd.DataFrame({
+    'neighborhood': ['Mission', 'Noe Valley', None, 'SoMa'],
+    'price': [1.5, 2.5, None, 4.0],
+    'count': [1, 2, 3, 4]
+})
+
+def test_in_process_batches_round_trip():
+    store = BatchStore()
+    ref = store.put(FRAME.to_dict('records'))
+    assert (ref.num_rows, ref.columns) == (4, ('neighborhood', 'price', 'count'))
+    pd.testing.assert_frame_equal(store.to_pandas(ref), FRAME, check_dtype=False)
+    store.release(ref)
+    assert store.get_stats()['batches'] == 0
+
+def test_released_shared_batch_with_strings_unlinks_segment():
+    store = BatchStore(use_shared_memory=True)
+    ref = store.put(FRAME)
+    df = store.to_pandas(ref)
+    store.release(ref)
+    # Nothing decoded from the segment may keep it mapped
+    assert store.segments == {}
+    with pytest.raises(FileNotFoundError):
+        _open_segment(ref.shm_name)
+    pd.testing.assert_frame_equal(df, FRAME, check_dtype=False)
+    store.close()
+
+def test_close_unlinks_unreleased_segments():
+    store = BatchStore(use_shared_memory=True)
+    refs = [store.put(FRAME) for _ in range(3)]
+    store.to_pandas(refs[0])
+    store.close()
+    for ref in refs:
+        with pytest.raises(FileNotFoundError):
+            _open_segment(ref.shm_name)
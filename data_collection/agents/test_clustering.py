@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+from data_collection.agents.clustering import (
+    NOISE, DBSCANBackend, GridDensityBackend, MiniBatchKMeansBackend, make_backend, summarize_clusters
+)
+
+CENTERS = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+
+def blobs(rows_per_blob: int, seed: int, spread: float = 0.3) -> tuple:
+    rng = np.random.default_rng(seed)
+    points = np.vstack([center + spread * rng.normal(size=(rows_per_blob, 2)) for center in CENTERS])
+    truth = np.repeat(np.arange(len(CENTERS)), rows_per_blob)
+    order = rng.permutation(len(points))
+    return pd.DataFrame(points[order], columns=['pc1', 'pc2']), truth[order]
+
+def test_dbscan_without_sampling_reproduces_sklearn():
+    features, _ = blobs(100, 0)
+    features.loc[len(features)] = [50.0, 50.0]
+    labels, _ = DBSCANBackend(eps=0.5, min_samples=5, sample_size=10000).fit_predict(features)
+    expected = DBSCAN(eps=0.5, min_samples=5).fit_predict(features.to_numpy())
+    np.testing.assert_array_equal(labels == NOISE, expected == NOISE)
+    assert adjusted_rand_score(expected, labels) == 1.0
+
+@pytest.mark.parametrize('name', ['dbscan', 'grid', 'kmeans'])
+def test_backends_recover_blobs_from_a_sample(name):
+    features, truth = blobs(2000, 1)
+    backend = make_backend(name, eps=0.5, min_samples=5, n_clusters=3, sample_size=500)
+    labels, summary = backend.fit_predict(features)
+    assert len(labels) == len(features)
+    assert backend.stats['sampled_fits'] == 1
+    clustered = labels != NOISE
+    assert clustered.mean() > 0.95
+    assert adjusted_rand_score(truth[clustered], labels[clustered]) > 0.99
+    assert summary['size'].sum() == clustered.sum()
+
+@pytest.mark.parametrize('name', ['dbscan', 'grid', 'kmeans'])
+def test_cluster_ids_are_stable_across_cycles(name):
+    backend = make_backend(name, eps=0.5, min_samples=5, n_clusters=3, sample_size=500)
+    first_features, _ = blobs(1000, 2)
+    _, first = backend.fit_predict(first_features)
+    second_features, _ = blobs(1000, 3)
+    _, second = backend.fit_predict(second_features)
+    assert sorted(first['mean'].index) == sorted(second['mean'].index)
+    for cluster_id in first['mean'].index:
+        np.testing.assert_allclose(first['mean'].loc[cluster_id], second['mean'].loc[cluster_id], atol=0.1)
+
+def test_new_feature_space_resets_backend():
+    backend = DBSCANBackend(eps=0.5, min_samples=5)
+    features, _ = blobs(100, 4)
+    backend.fit_predict(features)
+    wider = features.assign(pc3=0.0)
+    labels, summary = backend.fit_predict(wider)
+    assert backend.n_features == 3
+    assert sorted(summary['mean'].index) == [0, 1, 2]
+    assert summary['mean'].shape[1] == 3
+
+def test_summary_matches_groupby():
+    features, truth = blobs(50, 5)
+    labels = truth.copy()
+    labels[:10] = NOISE
+    summary = summarize_clusters(features, labels)
+    kept = features[labels != NOISE].groupby(labels[labels != NOISE])
+    pd.testing.assert_series_equal(summary['size'], kept.size())
+    pd.testing.assert_frame_equal(summary['mean'], kept.mean())
+    pd.testing.assert_frame_equal(summary['std'], kept.std())
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_backend('optics')
+
+def test_kmeans_backend_waits_for_enough_rows():
+    backend = MiniBatchKMeansBackend(n_clusters=8)
+    labels, _ = backend.fit_predict(pd.DataFrame({'pc1': [0.0, 1.0], 'pc2': [0.0, 1.0]}))
+    assert (labels == NOISE).all()
+
+def test_grid_backend_marks_isolated_rows_as_noise():
+    features, _ = blobs(200, 6)
+    features.loc[len(features)] = [50.0, 50.0]
+    labels, _ = GridDensityBackend(eps=0.5, min_samples=5).fit_predict(features)
+    assert labels[-1] == NOISE
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+import pytest
+from data_collection.agents.compute import ComputeOffloader
+
+class Model:
+    """Records how many fits overlap, the way an in-place partial_fit would race"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.fits = []
+
+    def fit(self, n, seconds):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(seconds)
+        with self.lock:
+            self.active -= 1
+            self.fits.append(n)
+        return n
+
+def test_timed_out_call_keeps_its_model_busy():
+    model = Model()
+    compute = ComputeOffloader(mode="thread", max_workers=4)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await compute.run(model.fit, 1, 0.3, timeout=0.05, key='model')
+        # The first fit is still running in its thread; the second waits for it
+        second = await compute.run(model.fit, 2, 0.01, timeout=5, key='model')
+        return second
+
+    assert asyncio.run(scenario()) == 2
+    compute.shutdown()
+    assert model.fits == [1, 2]
+    assert model.max_active == 1
+    assert compute.stats['timeouts'] == 1
+    assert compute.keys == {}
+
+def test_waiting_for_a_busy_model_counts_toward_the_timeout():
+    model = Model()
+    compute = ComputeOffloader(mode="thread", max_workers=4)
+
+    async def scenario():
+        first = asyncio.create_task(compute.run(model.fit, 1, 0.3, key='model'))
+        await asyncio.sleep(0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await compute.run(model.fit, 2, 0.01, timeout=0.05, key='model')
+        return await first
+
+    assert asyncio.run(scenario()) == 1
+    compute.shutdown()
+    # The second call never started
+    assert model.fits == [1]
+    assert compute.keys == {}
+
+def test_calls_with_different_keys_run_concurrently():
+    model = Model()
+    compute = ComputeOffloader(mode="thread", max_workers=4)
+
+    async def scenario():
+        return await asyncio.gather(
+            compute.run(model.fit, 1, 0.2, key='a'),
+            compute.run(model.fit, 2, 0.2, key='b'),
+            compute.run(model.fit, 3, 0.2, key='b')
+        )
+
+    assert asyncio.run(scenario()) == [1, 2, 3]
+    compute.shutdown()
+    assert model.max_active == 2
+    assert model.fits.index(3) > model.fits.index(2)
+
+def test_errors_release_the_model():
+    compute = ComputeOffloader(mode="thread")
+
+    def fail():
+        raise ValueError("bad batch")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await compute.run(fail, key='model')
+        return await compute.run(len, [1, 2], key='model')
+
+    assert asyncio.run(scenario()) == 2
+    compute.shutdown()
+    assert compute.stats['errors'] == 1
+    assert compute.keys == {}
@@ -0,0 +1,54 @@
+from collections import Counter
+from data_collection.agents.consistent_hash import HashRing, partition_key, partition_records
+
+KEYS = [f"crime__neighborhood_{i}" for i in range(5000)]
+
+def test_assignments_are_deterministic_and_balanced():
+    ring = HashRing(range(4), vnodes=64)
+    assert ring.assignments(KEYS) == HashRing([3, 2, 1, 0], vnodes=64).assignments(KEYS)
+    counts = Counter(ring.assignments(KEYS).values())
+    assert set(counts) == {0, 1, 2, 3}
+    assert max(counts.values()) < 2 * min(counts.values())
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(range(4))
+    before = ring.assignments(KEYS)
+    ring.add(4)
+    after = ring.assignments(KEYS)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == 4 for key in moved)
+    # About 1/5 of the keys move to the new node
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(range(4))
+    before = ring.assignments(KEYS)
+    ring.remove(2)
+    after = ring.assignments(KEYS)
+    assert len(ring) == 3
+    for key in KEYS:
+        if before[key] != 2:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != 2
+    ring.add(2)
+    assert ring.assignments(KEYS) == before
+
+def test_empty_ring_owns_nothing():
+    assert HashRing().get('crime') is None
+
+def test_partition_records_by_neighborhood():
+    records = [
+        {'neighborhood': 'Mission Bay', 'value': 1},
+        {'analysis_neighborhood': 'Mission Bay', 'value': 2},
+        {'neighborhood': 'Noe Valley', 'value': 3},
+        {'value': 4}
+    ]
+    partitions = partition_records('crime', records, by='neighborhood')
+    assert {key: [r['value'] for r in rows] for key, rows in partitions.items()} == {
+        'crime__mission_bay': [1, 2],
+        'crime__noe_valley': [3],
+        'crime': [4]
+    }
+    assert partition_records('crime', records) == {'crime': records}
+    assert partition_key('crime', '  ') == 'crime'
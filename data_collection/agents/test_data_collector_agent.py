@@ -0,0 +1,113 @@
+import asyncio
+import json
+import re
+import pytest
+from data_collection.agents.data_collector_agent import CollectionError, DataCollectorAgent
+from data_collection.agents.message_bus import MessageBus
+
+URL = "https://data.sfgov.org/resource/wg3w-h783.json"
+SOURCE = {
+    'name': 'crime',
+    'base_url': URL,
+    'requires_auth': False,
+    'pagination': {'order_field': 'ts', 'tiebreak_field': 'id', 'page_size': 2, 'max_parallel': 2}
+}
+ROWS = [{'ts': '2024-01-01T00:00:00', 'id': f"{i:03d}", 'value': 1.0} for i in range(7)]
+
+class SodaServer:
+    """Serves ROWS in pages the way Socrata answers the paginator's SoQL parameters"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+
+    async def fetch_json(self, source_name, url, headers, params):
+        match = re.search(r"id > '(\d+)'", params.get('$where', ''))
+        start = int(match.group(1)) + 1 if match else 0
+        start += int(params.get('$offset', 0))
+        if self.fail_after is not None and start > self.fail_after:
+            raise CollectionError(f"{source_name} returned HTTP 503")
+        return ROWS[start:start + int(params['$limit'])]
+
+def collector(tmp_path, monkeypatch, server):
+    monkeypatch.chdir(tmp_path)
+    agent = DataCollectorAgent('collector', 'collector')
+    bus = MessageBus(maxsize=1000)
+    bus.register('processor_agent')
+    agent.attach_bus(bus)
+    monkeypatch.setattr(agent, 'fetch_json', server.fetch_json)
+    return agent, bus
+
+def checkpoint(tmp_path):
+    path = tmp_path / 'checkpoints' / 'crime-wg3w-h783.json'
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)['high_water_mark']['id']
+
+def delivered_ids(bus):
+    ids = []
+    while bus.pending('processor_agent'):
+        message = bus.mailboxes['processor_agent'].get_nowait()
+        ids.extend(row['id'] for row in message['content']['data'])
+    return ids
+
+def test_pages_are_handed_off_before_the_checkpoint_passes_them(tmp_path, monkeypatch):
+    agent, bus = collector(tmp_path, monkeypatch, SodaServer())
+    hand_off = agent.hand_off
+    batches = []
+
+    async def spy(source_name, data):
+        # Nothing past the previous page is checkpointed while this one is stored
+        batches.append((checkpoint(tmp_path), [row['id'] for row in data]))
+        return await hand_off(source_name, data)
+
+    monkeypatch.setattr(agent, 'hand_off', spy)
+    assert asyncio.run(agent.collect_from_source(SOURCE)) == 7
+    assert batches == [(None, ['000', '001']), ('001', ['002', '003']), ('003', ['004', '005']), ('005', ['006'])]
+    assert checkpoint(tmp_path) == '006'
+    assert delivered_ids(bus) == [row['id'] for row in ROWS]
+
+def test_fetch_error_stops_at_the_last_stored_page(tmp_path, monkeypatch):
+    server = SodaServer(fail_after=3)
+    agent, bus = collector(tmp_path, monkeypatch, server)
+    with pytest.raises(CollectionError):
+        asyncio.run(agent.collect_from_source(SOURCE))
+    # The page at 004 failed, so the checkpoint stays on the last row handed off
+    assert checkpoint(tmp_path) == '003'
+    assert delivered_ids(bus) == ['000', '001', '002', '003']
+
+    server.fail_after = None
+    assert asyncio.run(agent.collect_from_source(SOURCE)) == 3
+    assert delivered_ids(bus) == ['004', '005', '006']
+
+def test_undelivered_page_is_collected_again(tmp_path, monkeypatch):
+    agent, bus = collector(tmp_path, monkeypatch, SodaServer())
+    bus.unregister('processor_agent')
+    with pytest.raises(CollectionError):
+        asyncio.run(agent.collect_from_source(SOURCE))
+    assert checkpoint(tmp_path) is None
+
+    bus.register('processor_agent')
+    assert asyncio.run(agent.collect_from_source(SOURCE)) == 7
+
+def test_http_errors_are_raised_not_read_as_empty(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    class Response:
+        status = 500
+        headers = {}
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class Session:
+        def get(self, url, headers=None, params=None):
+            return Response()
+
+    agent = DataCollectorAgent('collector', 'collector')
+    agent.session = Session()
+    with pytest.raises(CollectionError, match='HTTP 500'):
+        asyncio.run(agent.fetch_json('crime', URL, {}, {}))
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_collection.agents.feature_engine import FeatureEngine, FeatureSpec
+
+def listings():
+    return pd.DataFrame({
+        'price': [500_000.0, 750_000.0, np.nan, 1_200_000.0],
+        'sqft': [1000, 0, 1500, 2400],
+        'bedrooms': pd.array([2, 3, None, 4], dtype='Int64'),
+        'price_missing': [0, 0, 1, 0],
+        'listed': pd.to_datetime(['2024-01-05 08:00', None, '2024-03-17 23:30', '2024-12-31 00:15']),
+        'address': ['a', 'b', 'c', 'd']
+    }, index=[10, 11, 12, 13])
+
+def test_features_match_column_by_column_pandas():
+    df = listings()
+    result = FeatureEngine().transform(df)
+
+    pd.testing.assert_frame_equal(result[df.columns], df)
+    assert list(result.index) == [10, 11, 12, 13]
+    listed = df['listed'].dt
+    for part in ('hour', 'day', 'month', 'dayofweek'):
+        expected = getattr(listed, part).astype('float64').rename(f"listed_{part}")
+        pd.testing.assert_series_equal(result[f"listed_{part}"], expected)
+
+    numeric = df[['price', 'sqft', 'bedrooms']].astype('float64')
+    for a, b in [('price', 'sqft'), ('price', 'bedrooms'), ('sqft', 'bedrooms')]:
+        # Indicator columns are not combined; division by zero gives NaN
+        ratio = (numeric[a] / numeric[b].replace(0, np.nan)).rename(f"{a}_{b}_ratio")
+        pd.testing.assert_series_equal(result[f"{a}_{b}_ratio"], ratio)
+        pd.testing.assert_series_equal(result[f"{a}_{b}_sum"], (numeric[a] + numeric[b]).rename(f"{a}_{b}_sum"))
+        pd.testing.assert_series_equal(result[f"{a}_{b}_product"], (numeric[a] * numeric[b]).rename(f"{a}_{b}_product"))
+    assert not [col for col in result.columns if 'price_missing_' in col or '_price_missing' in col]
+    assert len(result.columns) == len(df.columns) + 4 + 9
+
+def test_declared_pairs_ops_and_dtype():
+    spec = FeatureSpec(pairs=(('price', 'sqft'), ('sqft', 'missing'), ('bedrooms', 'sqft'), ('price', 'bedrooms')),
+                       ops=('ratio',), datetime_parts=('month',), max_pairs=2, dtype='float32')
+    result = FeatureEngine(spec).transform(listings())
+    added = [col for col in result.columns if col not in listings().columns]
+    # Pairs with an absent column are skipped before max_pairs is applied
+    assert added == ['listed_month', 'price_sqft_ratio', 'bedrooms_sqft_ratio']
+    assert all(result[col].dtype == np.float32 for col in added)
+    assert np.isnan(result['bedrooms_sqft_ratio'].iloc[1])
+
+def test_recomputing_replaces_stale_features():
+    engine = FeatureEngine(FeatureSpec(pairs=(('price', 'sqft'),), ops=('sum',), datetime_parts=()))
+    once = engine.transform(listings())
+    stale = once.assign(price=once['price'] + 1)
+    twice = engine.transform(stale)
+    assert list(twice.columns) == list(once.columns)
+    assert twice['price_sqft_sum'].iloc[0] == once['price_sqft_sum'].iloc[0] + 1
+
+def test_nothing_to_derive_returns_the_frame():
+    df = pd.DataFrame({'address': ['a'], 'price': [1.0]})
+    assert FeatureEngine().transform(df) is df
+    with pytest.raises(ValueError, match='log'):
+        FeatureEngine(FeatureSpec(ops=('sum', 'log')))
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from data_collection.agents.data_collector_agent import DataCollectorAgent
+from data_collection.agents.forecasting import FORECAST_COLUMNS, ForecastService
+
+def hourly_series(hours: int, end: pd.Timestamp) -> pd.Series:
+    """Readings every 5 minutes over the given hours, the last one in end's hour"""
+    index = pd.date_range(end=end, periods=hours * 12, freq='5min')
+    return pd.Series(np.linspace(0.0, 1.0, len(index)), index=index)
+
+def test_forecast_contains_current_bucket_when_already_observed():
+    now = pd.Timestamp.now().floor('h')
+    service = ForecastService(mode="ewma", horizon=24)
+    forecast = asyncio.run(service.forecast('source', hourly_series(48, now + pd.Timedelta(minutes=1))))
+    assert list(forecast.columns) == FORECAST_COLUMNS
+    assert forecast['ds'].iloc[0] == now
+    assert (forecast['ds'] == now).sum() == 1
+    assert forecast['ds'].iloc[-1] == now + pd.Timedelta(hours=23)
+
+def test_forecast_covers_gap_after_stale_history():
+    now = pd.Timestamp.now().floor('h')
+    service = ForecastService(mode="ewma", horizon=24)
+    forecast = asyncio.run(service.forecast('source', hourly_series(48, now - pd.Timedelta(hours=5))))
+    assert forecast['ds'].iloc[0] == now - pd.Timedelta(hours=4)
+    assert (forecast['ds'] == now).sum() == 1
+
+def test_cached_forecast_reused_while_it_covers_now():
+    now = pd.Timestamp.now().floor('h')
+    service = ForecastService(mode="ewma", refit_points=24)
+    series = hourly_series(48, now + pd.Timedelta(minutes=1))
+    first = asyncio.run(service.forecast('source', series))
+    second = asyncio.run(service.forecast('source', series))
+    assert second is first
+    assert service.stats == {'fits': 1, 'warm_starts': 0, 'cache_hits': 1}
+
+def should_collect_now(schedule, quality_metrics=None):
+    agent = SimpleNamespace(quality_metrics=quality_metrics or {}, logger=logging.getLogger('test'))
+    return asyncio.run(DataCollectorAgent.should_collect_now(agent, 'source', schedule))
+
+def test_should_collect_now_uses_current_hour_prediction():
+    now = pd.Timestamp(datetime.now()).floor('h')
+    service = ForecastService(mode="ewma")
+    forecast = asyncio.run(service.forecast('source', hourly_series(48, now + pd.Timedelta(minutes=1))))
+    forecast['yhat'] = 0.0
+    assert not should_collect_now({'source': forecast}, {'source': {'validity': 1.0}})
+    forecast['yhat'] = 1.0
+    assert should_collect_now({'source': forecast}, {'source': {'validity': 1.0}})
+
+def test_should_collect_now_without_current_hour_row():
+    later = pd.Timestamp(datetime.now()).floor('h') + pd.Timedelta(hours=1)
+    forecast = pd.DataFrame({'ds': pd.date_range(later, periods=3, freq='h'), 'yhat': 0.0})
+    assert should_collect_now({'source': forecast}) is True
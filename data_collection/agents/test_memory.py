@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data_collection.agents.memory import BoundedDict
+
+def test_lru_entries_spill_and_reload(tmp_path):
+    data = BoundedDict(max_items=2, policy="lru", spill_dir=str(tmp_path))
+    data['a'] = pd.DataFrame({'x': np.arange(100)})
+    data['b'] = np.arange(10)
+    data['a']  # a is now the most recently used
+    data['c'] = {'k': 1}
+
+    assert len(data) == 3
+    assert 'b' in data
+    assert data.get_stats()['on_disk'] == 1
+    spilled = os.listdir(data.spill_dir)
+    assert len(spilled) == 1
+
+    np.testing.assert_array_equal(data['b'], np.arange(10))
+    assert data.stats == {'evicted': 0, 'spilled': 2, 'reloaded': 1}
+    # Reloading b evicted a, which round-trips intact
+    pd.testing.assert_frame_equal(data['a'], pd.DataFrame({'x': np.arange(100)}))
+    assert sorted(data) == ['a', 'b', 'c']
+
+def test_fifo_evicts_oldest_insert_regardless_of_reads():
+    data = BoundedDict(max_items=2, policy="fifo")
+    data['a'] = 1
+    data['b'] = 2
+    data['a']
+    data['c'] = 3
+    assert 'a' not in data
+    assert dict(data) == {'b': 2, 'c': 3}
+    assert data.stats['evicted'] == 1
+
+def test_overwrite_and_delete_remove_spilled_files(tmp_path):
+    data = BoundedDict(max_items=1, spill_dir=str(tmp_path))
+    data['a'] = np.zeros(10)
+    data['b'] = np.ones(10)
+    assert len(os.listdir(data.spill_dir)) == 1
+    data['a'] = np.full(10, 2.0)
+    assert data['a'][0] == 2.0
+    del data['b']
+    del data['a']
+    assert len(data) == 0
+    assert os.listdir(data.spill_dir) == []
+    with pytest.raises(KeyError):
+        data['a']
+
+def test_shrink_tracks_bytes():
+    data = BoundedDict()
+    for i in range(4):
+        data[i] = np.zeros(1000)
+    total = data.nbytes
+    assert total >= 4 * 8000
+    freed = data.shrink(total // 2)
+    assert data.nbytes <= total // 2
+    assert freed == total - data.nbytes
+    assert list(data) == [2, 3]
+
+def test_close_deletes_spill_dir(tmp_path):
+    data = BoundedDict(max_items=1, spill_dir=str(tmp_path))
+    data['a'] = 1
+    data['b'] = 2
+    spill_dir = data.spill_dir
+    data.close()
+    assert not os.path.exists(spill_dir)
+    assert 'a' not in data
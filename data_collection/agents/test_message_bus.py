@@ -0,0 +1,56 @@
+import asyncio
+from data_collection.agents.message_bus import MessageBus
+
+def test_full_mailbox_blocks_the_sender_until_a_receive():
+    async def scenario():
+        bus = MessageBus(maxsize=2)
+        bus.register('consumer')
+        for i in range(2):
+            assert await bus.send('producer', 'consumer', {'n': i})
+        third = asyncio.create_task(bus.send('producer', 'consumer', {'n': 2}))
+        await asyncio.sleep(0.05)
+        # Backpressure: the third message waits for room
+        assert not third.done()
+        assert bus.pending('consumer') == 2
+
+        first = await bus.receive('consumer')
+        assert await third
+        received = [first] + [await bus.receive('consumer', timeout=0) for _ in range(2)]
+        assert await bus.receive('consumer', timeout=0) is None
+        assert await bus.receive('consumer', timeout=0.01) is None
+        return bus, received
+
+    bus, received = asyncio.run(scenario())
+    assert [message['content']['n'] for message in received] == [0, 1, 2]
+    edge = bus.get_metrics()['edges']['producer->consumer']
+    assert (edge['sent'], edge['delivered'], edge['depth'], edge['max_depth']) == (3, 3, 0, 2)
+    assert edge['blocked_seconds'] >= 0.04
+    assert edge['max_latency'] >= 0.04
+
+def test_unregistered_targets_are_forwarded_or_dropped():
+    forwarded = []
+
+    async def forward(sender_id, target_id, content):
+        if content.get('poison'):
+            raise BrokenPipeError("parent is gone")
+        forwarded.append((sender_id, target_id, content))
+
+    async def scenario():
+        bus = MessageBus(forward=forward)
+        local = MessageBus()
+        return (
+            bus,
+            local,
+            await bus.send('worker', 'processor_agent', {'n': 1}),
+            await bus.send('worker', 'processor_agent', {'poison': True}),
+            await local.send('worker', 'processor_agent', {'n': 1})
+        )
+
+    bus, local, sent, poisoned, dropped = asyncio.run(scenario())
+    assert (sent, poisoned, dropped) == (True, False, False)
+    assert forwarded == [('worker', 'processor_agent', {'n': 1})]
+    metrics = bus.get_metrics()
+    edge = metrics['edges']['worker->processor_agent']
+    assert (edge['sent'], edge['delivered'], edge['depth']) == (1, 1, 0)
+    assert metrics['dropped'] == {'processor_agent': 1}
+    assert local.get_metrics() == {'edges': {}, 'mailboxes': {}, 'dropped': {'processor_agent': 1}}
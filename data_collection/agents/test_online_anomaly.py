@@ -0,0 +1,77 @@
+import joblib
+import numpy as np
+from data_collection.agents.online_anomaly import OnlineAnomalyDetector, RunningScaler
+
+def test_scaler_matches_nan_aware_numpy_over_batches():
+    rng = np.random.default_rng(0)
+    X = rng.normal([5.0, -3.0, 100.0], [1.0, 2.0, 10.0], size=(600, 3))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[7, 1] = np.inf
+    X[:250, 2] = np.nan  # a column that only starts reporting later
+    scaler = RunningScaler(horizon=None)
+    for batch in np.array_split(X, 7):
+        scaler.partial_fit(batch)
+    masked = np.where(np.isfinite(X), X, np.nan)
+    np.testing.assert_allclose(scaler.mean, np.nanmean(masked, axis=0))
+    np.testing.assert_allclose(scaler.std, np.nanstd(masked, axis=0))
+    np.testing.assert_array_equal(scaler.count, np.isfinite(X).sum(axis=0))
+
+def test_horizon_caps_each_column_count():
+    scaler = RunningScaler(horizon=100)
+    X = np.ones((150, 2))
+    X[:, 1] = np.nan
+    X[:40, 1] = 2.0
+    scaler.partial_fit(X)
+    np.testing.assert_array_equal(scaler.count, [100.0, 40.0])
+
+def test_missing_values_do_not_stop_detection():
+    rng = np.random.default_rng(1)
+    detector = OnlineAnomalyDetector(threshold=4.0, warmup=30)
+    assert (detector.fit_predict(rng.normal(size=(200, 2))) == 1).all()
+    gaps = rng.normal(size=(50, 2))
+    gaps[::3, 0] = np.nan
+    assert (detector.fit_predict(gaps) == 1).all()
+    assert np.isfinite(detector.scaler.mean).all() and np.isfinite(detector.scaler.m2).all()
+
+    spikes = rng.normal(size=(20, 2))
+    spikes[5] = [np.nan, 25.0]
+    spikes[9] = [-30.0, 0.0]
+    assert np.flatnonzero(detector.fit_predict(spikes) == -1).tolist() == [5, 9]
+    assert detector.flagged == 2
+
+def test_columns_warm_up_separately():
+    detector = OnlineAnomalyDetector(warmup=30)
+    X = np.zeros((40, 2))
+    X[:, 1] = np.nan
+    detector.update(X)
+    # Column 1 has no history, so a wild value there is not (yet) an anomaly
+    assert detector.fit_predict(np.array([[0.0, 1e6]])).tolist() == [1]
+    assert detector.fit_predict(np.array([[1e6, 0.0]])).tolist() == [-1]
+
+def test_save_and_load_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    detector = OnlineAnomalyDetector(threshold=3.0, warmup=10, horizon=500)
+    detector.fit_predict(rng.normal(size=(300, 3)))
+    path = str(tmp_path / 'detector.joblib')
+    detector.save(path)
+    restored = OnlineAnomalyDetector.load(path)
+
+    assert restored.get_state().keys() == detector.get_state().keys()
+    for key, value in detector.get_state().items():
+        np.testing.assert_array_equal(restored.get_state()[key], value)
+    batch = rng.normal(size=(50, 3)) * 2
+    np.testing.assert_array_equal(restored.fit_predict(batch), detector.fit_predict(batch))
+    assert not (tmp_path / 'detector.joblib.tmp').exists()
+
+def test_loading_a_poisoned_checkpoint_resets_the_bad_columns(tmp_path):
+    path = str(tmp_path / 'old.joblib')
+    # Written before counts were kept per column, after a NaN reached column 1
+    joblib.dump({
+        'threshold': 3.5, 'warmup': 30, 'horizon': 10000, 'count': 500.0,
+        'mean': np.array([1.0, np.nan]), 'm2': np.array([500.0, np.nan]), 'seen': 500, 'flagged': 0
+    }, path)
+    detector = OnlineAnomalyDetector.load(path)
+    np.testing.assert_array_equal(detector.scaler.count, [500.0, 0.0])
+    assert detector.fit_predict(np.array([[100.0, 5.0]])).tolist() == [-1]
+    detector.update(np.full((40, 2), 5.0))
+    assert np.isfinite(detector.scaler.mean).all()
@@ -0,0 +1,63 @@
+import math
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from data_collection.agents.ring_buffer import StatsRingBuffer
+
+COLUMNS = {
+    'timestamp': 'datetime64[us]',
+    'source': 'category',
+    'success': 'bool',
+    'processing_time': 'float64',
+    'data_size': 'int64'
+}
+
+def test_wraparound_keeps_the_newest_rows_in_order():
+    buffer = StatsRingBuffer(COLUMNS, capacity=5, window=3)
+    start = datetime(2024, 1, 1)
+    nbytes = buffer.nbytes
+    for i in range(12):
+        buffer.append(timestamp=start + timedelta(minutes=i), source=f"s{i % 3}", success=i % 2 == 0,
+                      processing_time=i / 10, data_size=i)
+
+    assert len(buffer) == 5
+    assert buffer.nbytes == nbytes
+    assert buffer.column('data_size').tolist() == [7, 8, 9, 10, 11]
+    assert buffer.column('data_size', last=2).tolist() == [10, 11]
+    frame = buffer.to_frame()
+    assert frame['source'].tolist() == ['s1', 's2', 's0', 's1', 's2']
+    assert frame['timestamp'].iloc[0] == start + timedelta(minutes=7)
+    assert buffer.tail(3)['success'].tolist() == [False, True, False]
+    assert buffer.tail(100)['data_size'].tolist() == [7, 8, 9, 10, 11]
+
+@pytest.mark.parametrize('capacity,window', [(7, 3), (8, 8), (64, 10)])
+def test_rolling_sums_match_a_recomputation(capacity, window):
+    rng = np.random.default_rng(capacity)
+    buffer = StatsRingBuffer(COLUMNS, capacity=capacity, window=window)
+    history = {'success': [], 'processing_time': [], 'data_size': []}
+    for _ in range(capacity * 5 + 3):
+        row = {
+            'success': bool(rng.random() < 0.7),
+            'processing_time': float(rng.exponential(5.0)),
+            'data_size': int(rng.integers(0, 10_000))
+        }
+        buffer.append(**row)
+        for name, value in row.items():
+            history[name].append(value)
+        for name, values in history.items():
+            expected = np.mean(values[-window:], dtype=np.float64)
+            assert math.isclose(buffer.rolling_mean(name), expected, rel_tol=1e-9), name
+    assert set(buffer.rolling_stats()) == {'success', 'processing_time', 'data_size'}
+
+def test_partial_window_and_missing_values():
+    buffer = StatsRingBuffer(COLUMNS, capacity=4, window=4)
+    assert math.isnan(buffer.rolling_mean('processing_time'))
+    assert len(buffer.to_frame()) == 0
+    buffer.append(processing_time=2.0)
+    buffer.append(processing_time=4.0, source='crime')
+    # Rows so far, not the full window, are averaged; missing values are zero
+    assert buffer.rolling_mean('processing_time') == 3.0
+    assert buffer.rolling_mean('data_size') == 0.0
+    assert buffer.to_frame()['source'].tolist() == ['', 'crime']
+    with pytest.raises(ValueError):
+        StatsRingBuffer(COLUMNS, capacity=4, window=5)
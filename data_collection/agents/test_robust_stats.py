@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from data_collection.agents.robust_stats import (
+    RobustBounds, bounds_for, clip_outliers, compute_bounds, impute_median, numeric_values, outlier_counts
+)
+
+def sample_frame(rows: int = 500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'a': rng.normal(10, 2, rows),
+        'b': rng.exponential(3, rows),
+        'c': rng.integers(0, 100, rows).astype(float)
+    })
+    df.loc[rng.choice(rows, 40, replace=False), 'a'] = np.nan
+    df.loc[rng.choice(rows, 5, replace=False), 'b'] = 1e6
+    return df
+
+def test_bounds_match_pandas_quantiles():
+    df = sample_frame()
+    bounds = compute_bounds(df, df.columns)
+    expected = df.quantile([0.25, 0.5, 0.75])
+    np.testing.assert_allclose(bounds.quantiles, expected.to_numpy())
+    iqr = expected.loc[0.75] - expected.loc[0.25]
+    np.testing.assert_allclose(bounds.lower, expected.loc[0.25] - 1.5 * iqr)
+    np.testing.assert_allclose(bounds.upper, expected.loc[0.75] + 1.5 * iqr)
+
+def test_all_missing_column_gets_nan_bounds():
+    df = sample_frame().assign(empty=np.nan)
+    bounds = compute_bounds(df, ['a', 'empty'])
+    assert np.isnan(bounds.select(['empty']).quantiles).all()
+    assert not np.isnan(bounds.select(['a']).quantiles).any()
+
+def test_impute_and_clip_match_pandas():
+    df = sample_frame()
+    columns = list(df.columns)
+    bounds = compute_bounds(df, columns)
+    values = numeric_values(df, columns)
+
+    missing = impute_median(values, bounds)
+    np.testing.assert_array_equal(missing, df.isna().to_numpy())
+    filled = df.fillna(df.median())
+    np.testing.assert_allclose(values, filled.to_numpy())
+
+    expected_counts = ((filled < bounds.lower) | (filled > bounds.upper)).sum().to_numpy()
+    np.testing.assert_array_equal(outlier_counts(values, bounds), expected_counts)
+    outliers = clip_outliers(values, bounds)
+    assert outliers.sum(axis=0).tolist() == expected_counts.tolist()
+    np.testing.assert_allclose(values, filled.clip(bounds.lower, bounds.upper, axis=1).to_numpy())
+
+def test_bounds_for_reuses_cached_columns():
+    df = sample_frame()
+    cached = compute_bounds(df, ['a'])
+    cached.quantiles[:, 0] = [1.0, 2.0, 3.0]
+    bounds = bounds_for(df, ['c', 'a'], cached)
+    assert bounds.columns == ['c', 'a']
+    np.testing.assert_allclose(bounds.select(['a']).quantiles[:, 0], [1.0, 2.0, 3.0])
+    np.testing.assert_allclose(bounds.select(['c']).quantiles[:, 0], df['c'].quantile([0.25, 0.5, 0.75]))
+
+def test_dict_round_trip():
+    df = sample_frame()
+    bounds = compute_bounds(df, df.columns)
+    restored = RobustBounds.from_dict(bounds.to_dict())
+    assert restored.columns == bounds.columns
+    np.testing.assert_allclose(restored.quantiles, bounds.quantiles)
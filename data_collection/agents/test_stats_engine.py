@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from data_collection.agents.stats_engine import StatsAccumulator
+
+def batch(rows: int, seed: int, columns=('a', 'b', 'c')) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'a': rng.normal(1e6, 3, rows),
+        'b': rng.exponential(2, rows),
+        'c': rng.integers(0, 50, rows).astype(float),
+        'd': rng.normal(-5, 1, rows),
+        'label': ['x'] * rows
+    })[list(columns) + ['label']]
+    for col in columns:
+        df.loc[rng.choice(rows, rows // 10, replace=False), col] = np.nan
+    return df
+
+def merged(frames, **kwargs) -> StatsAccumulator:
+    accumulator = StatsAccumulator.from_frame(frames[0], **kwargs)
+    for frame in frames[1:]:
+        accumulator = accumulator.merge(StatsAccumulator.from_frame(frame, **kwargs))
+    return accumulator
+
+def assert_matches_pandas(accumulator: StatsAccumulator, df: pd.DataFrame):
+    numeric = df[accumulator.columns]
+    summary = accumulator.summary()
+    expected = numeric.describe()
+    actual = pd.DataFrame(summary['summary']).loc[expected.index]
+    pd.testing.assert_frame_equal(actual, expected, rtol=1e-9)
+    pd.testing.assert_series_equal(pd.Series(summary['skewness']), numeric.skew(), rtol=1e-6)
+    pd.testing.assert_series_equal(pd.Series(summary['kurtosis']), numeric.kurtosis(), rtol=1e-6)
+    pd.testing.assert_frame_equal(pd.DataFrame(summary['correlations']), numeric.corr(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(accumulator.covariance(), numeric.cov().to_numpy(), rtol=1e-9, atol=1e-9)
+    assert summary['missing_values'] == numeric.isna().sum().to_dict()
+    assert summary['rows'] == len(df)
+
+def test_single_batch_matches_pandas():
+    df = batch(500, 0)
+    assert_matches_pandas(StatsAccumulator.from_frame(df), df)
+
+def test_merged_batches_match_pandas_on_the_union():
+    frames = [batch(300, 1), batch(200, 2, ('a', 'b', 'c', 'd')), batch(100, 3, ('d', 'b'))]
+    accumulator = merged(frames)
+    assert accumulator.columns == ['a', 'b', 'c', 'd']
+    assert_matches_pandas(accumulator, pd.concat(frames, ignore_index=True))
+
+def test_update_folds_batches_like_merge():
+    frames = [batch(300, 4), batch(300, 5)]
+    accumulator = StatsAccumulator.from_frame(frames[0])
+    accumulator.update(frames[1][accumulator.columns].to_numpy(dtype=np.float64))
+    assert_matches_pandas(accumulator, pd.concat(frames, ignore_index=True))
+
+def test_constant_and_empty_columns():
+    df = pd.DataFrame({'const': [3.0] * 20, 'empty': [np.nan] * 20, 'x': np.arange(20.0)})
+    summary = StatsAccumulator.from_frame(df).summary()
+    assert summary['skewness']['const'] == df['const'].skew() == 0.0
+    assert summary['kurtosis']['const'] == df['const'].kurtosis() == 0.0
+    assert summary['summary']['empty']['count'] == 0
+    assert np.isnan(summary['summary']['empty']['mean'])
+    assert np.isnan(summary['correlations']['const']['x'])
+
+def test_quantiles_are_sampled_beyond_sketch_size():
+    df = pd.DataFrame({'x': np.random.default_rng(6).normal(size=20000)})
+    accumulator = merged([df.iloc[:10000], df.iloc[10000:]], sketch_size=1024, seed=0)
+    assert len(accumulator.sketch_values) == 1024
+    np.testing.assert_allclose(accumulator.quantiles()[:, 0], df['x'].quantile([0.25, 0.5, 0.75]), atol=0.1)
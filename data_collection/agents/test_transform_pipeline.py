@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+from data_collection.agents.transform_pipeline import SchemaMismatchError, TransformPipeline
+
+def correlated_frame(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(rows, 2))
+    values = np.column_stack([base[:, 0], 2 * base[:, 0] + 0.1 * rng.normal(size=rows), base[:, 1],
+                              base[:, 1] * 5 + 3, rng.normal(size=rows)])
+    return pd.DataFrame(values, columns=['a', 'b', 'c', 'd', 'e'])
+
+def test_single_batch_matches_scaler_and_pca():
+    df = correlated_frame(400, 0)
+    pipeline = TransformPipeline(variance=0.95).partial_fit(df)
+    scaled = StandardScaler().fit_transform(df)
+    pca = PCA().fit(scaled)
+    np.testing.assert_allclose(pipeline.pca.explained_variance_ratio_, pca.explained_variance_ratio_, atol=1e-10)
+    expected_output = int(np.searchsorted(np.cumsum(pca.explained_variance_ratio_), 0.95) + 1)
+    assert pipeline.n_output == expected_output
+    projected = pipeline.transform(df)
+    assert projected.shape == (400, expected_output)
+    # Components are only defined up to sign
+    np.testing.assert_allclose(np.abs(projected), np.abs(pca.transform(scaled)[:, :expected_output]), atol=1e-8)
+
+def test_batches_match_sklearn_incremental_fit():
+    batches = [correlated_frame(200, seed) for seed in range(4)]
+    pipeline = TransformPipeline()
+    scaler, pca = StandardScaler(), IncrementalPCA()
+    for batch in batches:
+        pipeline.partial_fit(batch)
+        scaler.partial_fit(batch.to_numpy())
+        pca.partial_fit(scaler.transform(batch.to_numpy()))
+    combined = pd.concat(batches)
+    np.testing.assert_allclose(pipeline.scaler.mean_, combined.mean().to_numpy())
+    np.testing.assert_allclose(pipeline.scaler.var_, combined.var(ddof=0).to_numpy())
+    np.testing.assert_allclose(pipeline.pca.components_, pca.components_, atol=1e-10)
+    assert pipeline.get_stats()['samples_seen'] == 800
+
+def test_columns_are_aligned_by_name():
+    df = correlated_frame(300, 1)
+    pipeline = TransformPipeline().partial_fit(df)
+    shuffled = df[['e', 'c', 'a', 'd', 'b']]
+    np.testing.assert_allclose(pipeline.transform(shuffled), pipeline.transform(df))
+
+def test_schema_mismatch_is_rejected():
+    df = correlated_frame(300, 2)
+    pipeline = TransformPipeline().partial_fit(df)
+    assert not pipeline.matches(['a', 'b', 'c', 'd', 'x'])
+    with pytest.raises(SchemaMismatchError):
+        pipeline.transform(df.rename(columns={'e': 'x'}))
+    with pytest.raises(SchemaMismatchError):
+        pipeline.partial_fit(df.drop(columns='e'))
+
+def test_first_batch_needs_enough_rows():
+    with pytest.raises(ValueError):
+        TransformPipeline().partial_fit(correlated_frame(3, 3))
+
+def test_missing_values_are_scaled_to_zero():
+    df = correlated_frame(300, 4)
+    pipeline = TransformPipeline().partial_fit(df)
+    with_gap = df.head(1).copy()
+    with_gap['a'] = np.nan
+    filled = df.head(1).copy()
+    filled['a'] = pipeline.scaler.mean_[0]
+    np.testing.assert_allclose(pipeline.transform(with_gap), pipeline.transform(filled), atol=1e-12)
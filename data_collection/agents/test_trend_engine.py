@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_collection.agents.trend_engine import TrendEngine, linear_trends, rolling_trends, window_starts
+
+def noisy_lines(rows: int, cols: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    slopes = rng.normal(size=cols)
+    return np.arange(rows)[:, None] * slopes + 100 + rng.normal(size=(rows, cols))
+
+def polyfit_columns(values: np.ndarray, x: np.ndarray):
+    """Slope, intercept and R² of every column by np.polyfit over its present points"""
+    slopes, intercepts, r2 = [], [], []
+    for column in values.T:
+        present = ~np.isnan(column) & ~np.isnan(x)
+        slope, intercept = np.polyfit(x[present], column[present], 1)
+        slopes.append(slope)
+        intercepts.append(intercept)
+        r2.append(np.corrcoef(x[present], column[present])[0, 1] ** 2)
+    return np.array(slopes), np.array(intercepts), np.array(r2)
+
+def assert_fits(fits, values, x):
+    slope, intercept, r2 = polyfit_columns(values, x)
+    np.testing.assert_allclose(fits['slope'], slope, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(fits['intercept'], intercept, rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(fits['r2'], r2, rtol=1e-8, atol=1e-10)
+
+def test_complete_columns_match_polyfit():
+    values = noisy_lines(200, 6, 0)
+    fits = linear_trends(values)
+    assert_fits(fits, values, np.arange(200.0))
+    assert (fits['points'] == 200).all()
+
+def test_missing_values_and_time_axis_match_polyfit():
+    rng = np.random.default_rng(1)
+    values = noisy_lines(300, 4, 1)
+    values[rng.random(values.shape) < 0.2] = np.nan
+    x = np.sort(rng.uniform(0, 50, 300))
+    x[5] = np.nan
+    fits = linear_trends(values, x)
+    assert_fits(fits, values, x)
+    np.testing.assert_array_equal(fits['points'], (~np.isnan(values) & ~np.isnan(x)[:, None]).sum(axis=0))
+
+def test_too_few_points_give_nan():
+    values = np.array([[1.0, np.nan], [2.0, np.nan], [3.0, 5.0]])
+    fits = linear_trends(values, min_points=3)
+    assert fits['slope'][0] == pytest.approx(1.0)
+    assert np.isnan(fits['slope'][1])
+    assert fits['r2'][0] == pytest.approx(1.0)
+
+@pytest.mark.parametrize('ends', [None, [10, 150, 299]])
+@pytest.mark.parametrize('window', [25, 12.5])
+def test_rolling_windows_match_polyfit(window, ends):
+    rng = np.random.default_rng(2)
+    values = noisy_lines(300, 3, 2)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    x = np.cumsum(rng.uniform(0.01, 0.1, 300))
+    results = rolling_trends(values, x, window, ends, min_points=3)
+    ends = np.arange(300) if ends is None else np.asarray(ends)
+    starts = window_starts(x, ends, window)
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        window_values, window_x = values[start:end + 1], x[start:end + 1]
+        if (~np.isnan(window_values)).sum(axis=0).min() < 3:
+            continue
+        slope, intercept, r2 = polyfit_columns(window_values, window_x)
+        np.testing.assert_allclose(results['slope'][k], slope, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(results['r2'][k], r2, rtol=1e-6, atol=1e-6)
+
+def test_engine_fits_against_time_in_units():
+    times = pd.date_range('2024-01-01', periods=60, freq='12h')
+    rng = np.random.default_rng(3)
+    order = rng.permutation(60)
+    df = pd.DataFrame({'timestamp': times[order], 'value': 2.0 * np.arange(60)[order] + 1.0})
+    trends = TrendEngine(unit='D', window='7D', rolling_points=5).analyze(df, ['value'], df[['value']].to_numpy())
+    trend = trends['value']
+    assert trend['axis'] == 'time'
+    # Two readings a day, each 2.0 higher than the last
+    assert trend['slope'] == pytest.approx(4.0)
+    assert trend['r2_score'] == pytest.approx(1.0)
+    assert trend['recent_slope'] == pytest.approx(4.0)
+    assert len(trend['rolling_slope']) == 5
+
+def test_engine_parses_mixed_precision_iso_strings():
+    times = pd.date_range('2024-01-01', periods=10, freq='D')
+    strings = [t.isoformat() for t in times]
+    strings[3] = (times[3] + pd.Timedelta(microseconds=5)).isoformat()
+    df = pd.DataFrame({'timestamp': strings, 'value': np.arange(10.0)})
+    x, meta = TrendEngine().axis(df)
+    assert meta['axis'] == 'time'
+    assert not np.isnan(x).any()
+    np.testing.assert_allclose(x, np.arange(10.0), atol=1e-9)
+
+def test_engine_without_time_uses_row_order_and_ignores_time_window():
+    df = pd.DataFrame({'value': np.arange(20.0) * 3})
+    trends = TrendEngine(window='7D').analyze(df, ['value'], df[['value']].to_numpy())
+    assert trends['value']['axis'] == 'index'
+    assert trends['value']['slope'] == pytest.approx(3.0)
+    assert 'rolling_slope' not in trends['value']
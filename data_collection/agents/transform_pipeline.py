@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+class SchemaMismatchError(ValueError):
+    """Raised when a batch's columns do not match those the pipeline was fitted on"""
+
+class TransformPipeline:
+    """Standard scaling followed by PCA, fitted incrementally and reused across batches
+
+    ``partial_fit`` folds a batch into the running scaler statistics and the
+    IncrementalPCA decomposition, so the cost of a batch depends on its size and
+    not on how much has been seen before; ``transform`` only applies the fitted
+    models. The input columns are recorded on the first fit and every later
+    batch is aligned to them by name, so the components keep their meaning.
+    The number of output components is chosen once, as the fewest explaining
+    ``variance`` of the variance, and only re-chosen when ``variance`` changes.
+    """
+
+    def __init__(self, variance: float = 0.95):
+        self.variance = variance
+        self.scaler = StandardScaler()
+        self.pca = IncrementalPCA()
+        self.feature_names: Optional[List[str]] = None
+        self.n_output: Optional[int] = None
+        self._output_variance: Optional[float] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.feature_names is not None
+
+    def matches(self, columns: Sequence[str]) -> bool:
+        """Whether batches with these columns can be transformed (in any order)"""
+        return not self.fitted or sorted(map(str, columns)) == sorted(self.feature_names)
+
+    def _align(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Input as a float matrix in the fitted column order"""
+        if isinstance(X, pd.DataFrame):
+            columns = [str(col) for col in X.columns]
+            if columns != self.feature_names:
+                if not self.matches(columns):
+                    missing = sorted(set(self.feature_names) - set(columns))
+                    unexpected = sorted(set(columns) - set(self.feature_names))
+                    raise SchemaMismatchError(f"Columns differ from the fitted schema (missing: {missing}, unexpected: {unexpected})")
+                X = X.set_axis(columns, axis=1)[self.feature_names]
+            return X.to_numpy(dtype=np.float64, na_value=np.nan)
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[1] != len(self.feature_names):
+            raise SchemaMismatchError(f"Expected {len(self.feature_names)} columns, got {X.shape[1]}")
+        return X
+
+    def _scale(self, values: np.ndarray) -> np.ndarray:
+        # Missing values become the column mean, i.e. 0 once standardized
+        return np.nan_to_num(self.scaler.transform(values), nan=0.0, posinf=0.0, neginf=0.0)
+
+    def partial_fit(self, X: Union[pd.DataFrame, np.ndarray]) -> 'TransformPipeline':
+        """Update the scaler and the decomposition with one batch
+
+        The first batch fixes the schema and needs at least as many rows as
+        columns, so that every component can be estimated.
+        """
+        if not self.fitted:
+            width = np.shape(X)[1]
+            if len(X) < width:
+                raise ValueError(f"First batch needs at least {width} rows, got {len(X)}")
+            self.feature_names = [str(col) for col in X.columns] if isinstance(X, pd.DataFrame) else [f"x{i}" for i in range(width)]
+        values = self._align(X)
+        self.scaler.partial_fit(values)
+        self.pca.partial_fit(self._scale(values))
+        if self._output_variance != self.variance:
+            self._choose_output()
+        return self
+
+    def _choose_output(self):
+        cumulative = np.cumsum(self.pca.explained_variance_ratio_)
+        self.n_output = int(min(np.searchsorted(cumulative, self.variance) + 1, len(cumulative)))
+        self._output_variance = self.variance
+
+    def transform(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Project a batch onto the leading fitted components"""
+        if not self.fitted:
+            raise ValueError("TransformPipeline is not fitted")
+        projected = self.pca.transform(self._scale(self._align(X)))
+        return projected[:, :self.n_output]
+
+    def partial_fit_transform(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        return self.partial_fit(X).transform(X)
+
+    def feature_importance(self) -> Dict[str, float]:
+        """Absolute loadings of each input column, weighted by the explained variance of the kept components"""
+        if not self.fitted:
+            return {}
+        ratios = self.pca.explained_variance_ratio_[:self.n_output]
+        weights = np.abs(self.pca.components_[:self.n_output]).T @ ratios
+        return {col: float(weight) for col, weight in zip(self.feature_names, weights)}
+
+    def get_stats(self) -> Dict[str, Union[int, float, None]]:
+        return {
+            'fitted': self.fitted,
+            'features': len(self.feature_names) if self.fitted else 0,
+            'components': self.n_output,
+            'samples_seen': int(self.pca.n_samples_seen_) if self.fitted else 0,
+            'explained_variance': float(self.pca.explained_variance_ratio_[:self.n_output].sum()) if self.fitted else None
+        }
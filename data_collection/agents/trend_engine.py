@@ -0,0 +1,208 @@
+import warnings
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# Columns the rolling sums are computed for at a time, bounding temporary memory
+COLUMN_CHUNK = 64
+
+# pandas 2 infers one format from the first timestamp string unless told to accept any ISO 8601
+# variant; earlier versions parse each value on its own and do not know the 'ISO8601' format
+ISO_PARSE_ARGS = {'format': 'ISO8601'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+def _fit_from_sums(n, sx, sxx, sy, syy, sxy, x_shift, y_shift, min_points: int = 2) -> Dict[str, np.ndarray]:
+    """Slope, intercept and R² from sums of shifted x and y over the points of each fit"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx = sxx - sx ** 2 / n
+        cxy = sxy - sx * sy / n
+        cyy = np.maximum(syy - sy ** 2 / n, 0.0)
+        slope = cxy / cxx
+        intercept = (y_shift + sy / n) - slope * (x_shift + sx / n)
+        # A constant column is fit perfectly
+        r2 = np.where(cyy > 0, cxy ** 2 / (cxx * cyy), 1.0)
+    valid = (n >= max(min_points, 2)) & (cxx > 0)
+    return {
+        'slope': np.where(valid, slope, np.nan),
+        'intercept': np.where(valid, intercept, np.nan),
+        'r2': np.where(valid, np.clip(r2, 0.0, 1.0), np.nan),
+        'points': np.asarray(n).astype(int)
+    }
+
+def _prepare(values: np.ndarray, x: Optional[np.ndarray]):
+    """Shifted x and y, with y zeroed where it or x is missing"""
+    values = np.asarray(values, dtype=np.float64)
+    x = np.arange(len(values), dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    present = ~np.isnan(values) & ~np.isnan(x)[:, None]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        x_shift = float(np.nanmean(x)) if len(x) and not np.isnan(x).all() else 0.0
+        y_shift = np.nan_to_num(np.nanmean(np.where(present, values, np.nan), axis=0))
+    xc = np.nan_to_num(x - x_shift)
+    yc = np.where(present, values - y_shift, 0.0)
+    return xc, yc, present.astype(np.float64), x_shift, y_shift
+
+def linear_trends(values: np.ndarray, x: Optional[np.ndarray] = None, min_points: int = 2) -> Dict[str, np.ndarray]:
+    """Least-squares line of every column against x (the row position by default), in closed form
+
+    Points where the value or x is missing are left out per column. Returns
+    slope, intercept, r2 and the number of points per column; columns with
+    fewer than ``min_points`` points get NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if x is None and not np.isnan(values).any():
+        # Nothing missing: per-column sums over x reduce to scalars
+        n_rows = len(values)
+        xc = np.arange(n_rows, dtype=np.float64) - (n_rows - 1) / 2
+        y_shift = values.mean(axis=0) if n_rows else np.zeros(values.shape[1])
+        yc = values - y_shift
+        n = np.full(values.shape[1], float(n_rows))
+        return _fit_from_sums(
+            n, np.zeros_like(n), np.full_like(n, xc @ xc),
+            yc.sum(axis=0), np.einsum('ij,ij->j', yc, yc), xc @ yc,
+            (n_rows - 1) / 2, y_shift, min_points
+        )
+    xc, yc, mask, x_shift, y_shift = _prepare(values, x)
+    return _fit_from_sums(
+        mask.sum(axis=0), xc @ mask, (xc * xc) @ mask,
+        yc.sum(axis=0), (yc * yc).sum(axis=0), xc @ yc,
+        x_shift, y_shift, min_points
+    )
+
+def window_starts(x: np.ndarray, ends: np.ndarray, window: Union[int, float]) -> np.ndarray:
+    """First row of the window ending at each row in ends
+
+    An int window spans that many rows; a float window spans the x interval
+    (x[end] - window, x[end]], which requires x sorted ascending.
+    """
+    if isinstance(window, (int, np.integer)):
+        return np.maximum(ends - window + 1, 0)
+    return np.searchsorted(x, x[ends] - window, side='right')
+
+def rolling_trends(values: np.ndarray, x: Optional[np.ndarray], window: Union[int, float],
+                   ends: Optional[Sequence[int]] = None, min_points: int = 3) -> Dict[str, np.ndarray]:
+    """Closed-form trends of every column over sliding windows
+
+    Rows must be ordered by x. Window sums come from prefix sums, so all
+    windows cost O(rows x columns) together regardless of the window length;
+    windows that together span fewer rows than that are fitted directly.
+    Results have one row per window end (every row by default).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_cols = values.shape
+    x_axis = np.arange(n_rows, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    ends = np.arange(n_rows) if ends is None else np.asarray(ends, dtype=int)
+    starts = window_starts(x_axis, ends, window)
+    results = {name: np.full((len(ends), n_cols), np.nan) for name in ('slope', 'intercept', 'r2')}
+    results['points'] = np.zeros((len(ends), n_cols), dtype=int)
+
+    if (ends - starts + 1).sum() <= n_rows:
+        # Few or short windows: fitting each directly reads fewer rows than the prefix sums
+        for k, (start, end) in enumerate(zip(starts, ends)):
+            fits = linear_trends(values[start:end + 1], x_axis[start:end + 1], min_points)
+            for name, result in fits.items():
+                results[name][k] = result
+        return results
+
+    def window_sums(a):
+        prefix = np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+        return prefix[ends + 1] - prefix[starts]
+
+    for first in range(0, n_cols, COLUMN_CHUNK):
+        chunk = slice(first, first + COLUMN_CHUNK)
+        xc, yc, mask, x_shift, y_shift = _prepare(values[:, chunk], x_axis)
+        xm = xc[:, None] * mask
+        fits = _fit_from_sums(
+            window_sums(mask), window_sums(xm), window_sums(xc[:, None] * xm),
+            window_sums(yc), window_sums(yc * yc), window_sums(xc[:, None] * yc),
+            x_shift, y_shift, min_points
+        )
+        for name, result in fits.items():
+            results[name][:, chunk] = result
+    return results
+
+class TrendEngine:
+    """Trends of all numeric columns of a frame against time or row order
+
+    With a time column (``time_column``, else ``timestamp`` or the first
+    datetime column) x is the time since the earliest row in ``unit`` and
+    rows are ordered by it, so slopes are per unit of time and unevenly
+    spaced or unordered records are handled; otherwise x is the row position.
+    ``window``, rows as an int or a time span such as ``'7D'``, adds rolling
+    trends summarized at ``rolling_points`` evenly spaced window ends.
+    """
+
+    def __init__(self, time_column: Optional[str] = None, unit: str = 'D',
+                 window: Optional[Union[int, str]] = None, rolling_points: int = 50, min_points: int = 3):
+        self.time_column = time_column
+        self.unit = unit
+        self.window = window
+        self.rolling_points = rolling_points
+        self.min_points = min_points
+
+    def _time_column(self, df: pd.DataFrame) -> Optional[str]:
+        if self.time_column:
+            return self.time_column if self.time_column in df.columns else None
+        if 'timestamp' in df.columns:
+            return 'timestamp'
+        datetime_cols = df.select_dtypes(include=['datetime64', 'datetimetz']).columns
+        return datetime_cols[0] if len(datetime_cols) else None
+
+    def axis(self, df: pd.DataFrame) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """x of every row and a description of the axis"""
+        col = self._time_column(df)
+        if col is not None:
+            times = df[col]
+            if not pd.api.types.is_datetime64_any_dtype(times):
+                times = pd.to_datetime(times, errors='coerce', **ISO_PARSE_ARGS)
+            if times.notna().sum() > 1:
+                if times.dt.tz is not None:
+                    times = times.dt.tz_convert(None)
+                origin = times.min()
+                x = ((times - origin) / pd.Timedelta(1, unit=self.unit)).to_numpy(dtype=np.float64, na_value=np.nan)
+                return x, {'axis': 'time', 'column': col, 'unit': self.unit, 'origin': origin.isoformat()}
+        return np.arange(len(df), dtype=np.float64), {'axis': 'index', 'unit': 'row'}
+
+    def _window(self, meta: Dict[str, Any]) -> Optional[Union[int, float]]:
+        if self.window is None:
+            return None
+        if isinstance(self.window, int) or str(self.window).isdigit():
+            return int(self.window)
+        if meta['axis'] != 'time':
+            # A time span cannot be applied to row positions
+            return None
+        return pd.Timedelta(self.window) / pd.Timedelta(1, unit=self.unit)
+
+    def analyze(self, df: pd.DataFrame, columns: List[str], values: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        """Trend of each column of values (rows of df), with rolling summaries when a window is set"""
+        x, meta = self.axis(df)
+        order = np.argsort(x, kind='stable')
+        if meta['axis'] == 'time' and (order != np.arange(len(x))).any():
+            x, values = x[order], values[order]
+        fits = linear_trends(values, x, min_points=2)
+
+        rolling = None
+        window = self._window(meta)
+        if window is not None and len(x) > 1:
+            # Rows with unknown time sort last; windows end at known times only
+            known = int((~np.isnan(x)).sum())
+            ends = np.unique(np.linspace(0, known - 1, min(self.rolling_points, known)).astype(int))
+            rolling = rolling_trends(values, x, window, ends, self.min_points)
+
+        trends = {}
+        for i, col in enumerate(columns):
+            if np.isnan(fits['slope'][i]):
+                continue
+            trend = {
+                'slope': float(fits['slope'][i]),
+                'intercept': float(fits['intercept'][i]),
+                'r2_score': float(fits['r2'][i]),
+                'direction': 'increasing' if fits['slope'][i] > 0 else 'decreasing',
+                **meta
+            }
+            if rolling is not None:
+                slopes = rolling['slope'][:, i]
+                trend['rolling_slope'] = [None if np.isnan(s) else float(s) for s in slopes]
+                trend['recent_slope'] = None if np.isnan(slopes[-1]) else float(slopes[-1])
+                trend['recent_r2_score'] = None if np.isnan(rolling['r2'][-1, i]) else float(rolling['r2'][-1, i])
+            trends[col] = trend
+        return trends
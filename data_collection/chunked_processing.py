@@ -0,0 +1,164 @@
+import heapq
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from ndjson_store import encode_record, iter_batches, record_digest
+
+SORT_KEY_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+MISSING_SORT_KEY = '~'  # sorts after every ISO timestamp
+# Most run files open at once during a merge; more runs are merged in several passes
+MERGE_FAN_IN = 64
+
+
+class ChunkedSortProcessor:
+    """Out-of-core deduplicate-and-sort for record streams larger than memory
+
+    Records are consumed in chunks of ``chunk_size``. Each chunk is deduplicated
+    against the 8-byte content digests of that chunk, sorted by its date column
+    and digest and spilled to disk as a sorted run. The runs are then combined
+    with a streaming k-way merge, in which copies of a record from different runs
+    arrive next to each other and all but the first are dropped, and written out
+    as date-partitioned batches. At most ``fan_in`` runs are open at a time: with
+    more runs, groups of them are first merged into longer intermediate runs.
+    Peak memory is bounded by the chunk size rather than the input size. A persistent ``key_store`` with an ``add(digest) -> bool``
+    method, such as ``DigestIndex``, replaces the per-chunk sets when records must
+    also be deduplicated against earlier runs; it holds every digest it has seen.
+    """
+
+    def __init__(self, chunk_size=50000, date_columns=('date',), work_dir=None, key_store=None,
+                 fan_in=MERGE_FAN_IN):
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        self.chunk_size = chunk_size
+        self.fan_in = fan_in
+        self.date_columns = date_columns
+        self.work_dir = work_dir
+        self.key_store = key_store
+        self.stats = {}
+
+    def process(self, records, write_batches):
+        """Stream records through dedup, run generation and merge
+
+        ``write_batches(frames, date_column)`` receives an iterator of sorted
+        DataFrames of at most ``chunk_size`` rows.
+        """
+        run_dir = tempfile.mkdtemp(prefix='sorted_runs_', dir=self.work_dir)
+        try:
+            runs, date_column = self._write_runs(records, run_dir)
+            if not runs:
+                return []
+            runs = self._reduce_runs(runs, run_dir)
+            batches = self._merge_runs(runs, date_column)
+            return write_batches(batches, date_column)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _write_runs(self, records, run_dir):
+        runs = []
+        date_column = None
+        self.stats = {'records': 0, 'duplicates': 0, 'runs': 0}
+
+        for chunk in iter_batches(records, self.chunk_size):
+            self.stats['records'] += len(chunk)
+            seen = set() if self.key_store is None else None
+            unique = []
+            digests = []
+            for record in chunk:
+                digest = record_digest(record)
+                if seen is not None:
+                    is_new = digest not in seen
+                    seen.add(digest)
+                else:
+                    is_new = self.key_store.add(digest)
+                if is_new:
+                    unique.append(record)
+                    digests.append(digest.hex())
+            self.stats['duplicates'] += len(chunk) - len(unique)
+            if not unique:
+                continue
+
+            if date_column is None:
+                date_column = next((c for c in self.date_columns if any(c in r for r in unique)), None)
+            keys = self._sort_keys(unique, date_column)
+
+            path = os.path.join(run_dir, f"run-{len(runs):05d}.ndjson")
+            with open(path, 'w') as f:
+                for i in sorted(range(len(unique)), key=lambda i: (keys[i], digests[i])):
+                    f.write(f"{keys[i]}\t{digests[i]}\t{encode_record(unique[i])}\n")
+            runs.append(path)
+
+        self.stats['runs'] = len(runs)
+        if hasattr(self.key_store, 'flush'):
+            self.key_store.flush()
+        logging.info(
+            f"Wrote {len(runs)} sorted runs from {self.stats['records']} records "
+            f"({self.stats['duplicates']} duplicates within chunks dropped)"
+        )
+        return runs, date_column
+
+    def _sort_keys(self, records, date_column):
+        if date_column is None:
+            return [MISSING_SORT_KEY] * len(records)
+        dates = pd.to_datetime(pd.Series([r.get(date_column) for r in records]), errors='coerce')
+        return dates.dt.strftime(SORT_KEY_FORMAT).fillna(MISSING_SORT_KEY).tolist()
+
+    def _reduce_runs(self, runs, run_dir):
+        """Merge groups of runs into longer runs until at most fan_in remain"""
+        passes = 0
+        while len(runs) > self.fan_in:
+            passes += 1
+            merged_runs = []
+            for start in range(0, len(runs), self.fan_in):
+                group = runs[start:start + self.fan_in]
+                if len(group) == 1:
+                    merged_runs.extend(group)
+                    continue
+                path = os.path.join(run_dir, f"pass-{passes}-{len(merged_runs):05d}.ndjson")
+                files = [open(run, 'r') for run in group]
+                try:
+                    with open(path, 'w') as out:
+                        for entry in self._drop_repeats(heapq.merge(*(self._read_run(f) for f in files))):
+                            out.write('\t'.join(entry) + '\n')
+                finally:
+                    for f in files:
+                        f.close()
+                for run in group:
+                    os.remove(run)
+                merged_runs.append(path)
+            runs = merged_runs
+        if passes:
+            logging.info(f"Merged sorted runs down to {len(runs)} in {passes} passes")
+        return runs
+
+    def _merge_runs(self, runs, date_column):
+        files = [open(path, 'r') for path in runs]
+        try:
+            merged = self._drop_repeats(heapq.merge(*(self._read_run(f) for f in files)))
+            for batch in iter_batches(merged, self.chunk_size):
+                df = pd.DataFrame([json.loads(payload) for _, _, payload in batch])
+                if date_column in df.columns:
+                    df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
+                yield df
+        finally:
+            for f in files:
+                f.close()
+
+    def _drop_repeats(self, entries):
+        previous = None
+        for entry in entries:
+            if entry[:2] == previous:
+                # The same record from another run
+                self.stats['duplicates'] += 1
+                continue
+            previous = entry[:2]
+            yield entry
+
+    def _read_run(self, f):
+        for line in f:
+            key, digest, payload = line.rstrip('\n').split('\t', 2)
+            yield key, digest, payload
@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather'}
+NO_DATE_PARTITION = 'undated'
+# Stores written before monthly partitioning have one date=YYYY-MM-DD directory per day
+PARTITION_LEVELS = ('month', 'date')
+# A partition holding more small files than this is compacted into one file on write
+COMPACT_FILES = 8
+COMPACT_FILE_BYTES = 64 * 1024 * 1024
+
+
+def columnar_available():
+    """Return True if a columnar storage backend can be used"""
+    return pa is not None
+
+
+class ColumnarStore:
+    """Columnar storage for processed data, partitioned by category and month
+
+    Files are laid out as ``<root>/category=<name>/month=<YYYY-MM>/part-*.parquet``
+    (or ``.feather`` when pyarrow was built without parquet support). Reads prune
+    month partitions by directory name before touching any file and push column
+    selection and row predicates down to pyarrow. Each write adds a file per
+    partition it touches; once a partition holds more than ``compact_files``
+    files under ``COMPACT_FILE_BYTES``, those are merged into one, so appending
+    every cycle does not leave thousands of tiny files.
+    """
+
+    def __init__(self, root, fmt=None, compact_files=COMPACT_FILES):
+        if pa is None:
+            raise ImportError("pyarrow is required for columnar storage")
+        if fmt is None:
+            fmt = 'parquet' if pq is not None else 'feather'
+        if fmt not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unknown storage format: {fmt}")
+        if fmt == 'parquet' and pq is None:
+            raise ImportError("pyarrow was built without parquet support")
+        self.root = root
+        self.fmt = fmt
+        self.compact_files = compact_files
+        os.makedirs(self.root, exist_ok=True)
+
+    def category_path(self, category):
+        return os.path.join(self.root, f"category={category}")
+
+    def categories(self):
+        """List the categories present in the store"""
+        return sorted(
+            name.split('=', 1)[1] for name in os.listdir(self.root)
+            if name.startswith('category=') and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def write(self, category, df, date_column=None, mode='overwrite'):
+        """Write a DataFrame as month-partitioned files for a category
+
+        ``overwrite`` replaces the category atomically; ``append`` adds new part files.
+        """
+        return self.write_batches(category, [df], date_column=date_column, mode=mode)
+
+    def write_batches(self, category, frames, date_column=None, mode='overwrite'):
+        """Write an iterable of DataFrames for a category one batch at a time"""
+        if mode not in ('overwrite', 'append'):
+            raise ValueError(f"Unknown write mode: {mode}")
+
+        target = self.category_path(category)
+        staging = target + '.staging' if mode == 'overwrite' else target
+        if mode == 'overwrite' and os.path.exists(staging):
+            shutil.rmtree(staging)
+
+        written = []
+        rows = 0
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        for batch, df in enumerate(frames):
+            if df.empty:
+                continue
+            rows += len(df)
+            for partition, part_df in self._partition(df, date_column):
+                part_dir = os.path.join(staging, f"month={partition}")
+                os.makedirs(part_dir, exist_ok=True)
+                path = os.path.join(part_dir, f"part-{stamp}-{batch:05d}{FORMAT_EXTENSIONS[self.fmt]}")
+                self._write_table(self._to_table(part_df), path)
+                written.append(path)
+                written = self._compact(part_dir, written)
+
+        if not written:
+            if mode == 'overwrite' and os.path.exists(staging):
+                shutil.rmtree(staging)
+            return []
+
+        self._write_meta(staging, {'date_column': date_column, 'format': self.fmt})
+
+        if mode == 'overwrite':
+            previous = target + '.previous'
+            if os.path.exists(previous):
+                shutil.rmtree(previous)
+            if os.path.exists(target):
+                os.rename(target, previous)
+            os.rename(staging, target)
+            if os.path.exists(previous):
+                shutil.rmtree(previous)
+            written = [p.replace(staging, target, 1) for p in written]
+
+        logging.info(f"Wrote {rows} {category} rows to {len(written)} {self.fmt} files")
+        return written
+
+    def read(self, category, columns=None, start=None, end=None, predicate=None):
+        """Read a category, loading only the requested columns and date range
+
+        ``start``/``end`` prune date partitions and, when the category was written
+        with a date column, also filter rows. ``predicate`` is an optional
+        ``pyarrow.dataset`` expression evaluated during the scan.
+        """
+        files = self.partition_files(category, start, end)
+        if not files:
+            return pd.DataFrame()
+
+        meta = self._read_meta(category)
+        date_column = meta.get('date_column')
+        dataset = self._dataset(files)
+
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+
+        expression = predicate
+        if date_column and date_column in dataset.schema.names:
+            field_type = dataset.schema.field(date_column).type
+            if start is not None:
+                clause = ds.field(date_column) >= pa.scalar(pd.Timestamp(start).to_pydatetime(), type=field_type)
+                expression = clause if expression is None else expression & clause
+            if end is not None:
+                if _is_date_only(end):
+                    # A bare date covers the whole day
+                    bound = pd.Timestamp(end) + pd.Timedelta(days=1)
+                    clause = ds.field(date_column) < pa.scalar(bound.to_pydatetime(), type=field_type)
+                else:
+                    clause = ds.field(date_column) <= pa.scalar(pd.Timestamp(end).to_pydatetime(), type=field_type)
+                expression = clause if expression is None else expression & clause
+
+        table = dataset.to_table(columns=columns, filter=expression)
+        return table.to_pandas()
+
+    def schema(self, category):
+        """Return the unified schema of a category without reading any rows"""
+        files = self.partition_files(category)
+        if not files:
+            return None
+        return self._dataset(files).schema
+
+    def date_column(self, category):
+        """Return the column a category was date-partitioned on, if any"""
+        return self._read_meta(category).get('date_column')
+
+    def partition_files(self, category, start=None, end=None):
+        """List data files of a category whose month (or legacy day) partition overlaps [start, end]"""
+        base = self.category_path(category)
+        if not os.path.isdir(base):
+            return []
+        start_key = _partition_key(start) if start is not None else None
+        end_key = _partition_key(end) if end is not None else None
+
+        files = []
+        for part in sorted(os.listdir(base)):
+            level, _, key = part.partition('=')
+            if level not in PARTITION_LEVELS:
+                continue
+            if key != NO_DATE_PARTITION:
+                # Month keys compare against the month of the bounds
+                if start_key and key < start_key[:len(key)]:
+                    continue
+                if end_key and key > end_key[:len(key)]:
+                    continue
+            files.extend(self._data_files(os.path.join(base, part)))
+        return files
+
+    def _data_files(self, part_dir):
+        return [
+            os.path.join(part_dir, f) for f in sorted(os.listdir(part_dir))
+            if f.endswith(FORMAT_EXTENSIONS[self.fmt])
+        ]
+
+    def _compact(self, part_dir, written):
+        """Merge the small files of a partition into one once there are too many of them
+
+        Returns ``written`` with the merged files replaced by the compacted one.
+        """
+        small = [f for f in self._data_files(part_dir) if os.path.getsize(f) < COMPACT_FILE_BYTES]
+        if len(small) <= self.compact_files:
+            return written
+        path = os.path.join(part_dir, f"part-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}-compacted"
+                                      f"{FORMAT_EXTENSIONS[self.fmt]}")
+        try:
+            # Written under a name readers skip, then renamed into place
+            self._write_table(self._dataset(small).to_table(), path + '.tmp')
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            logging.warning(f"Could not compact {part_dir}: {str(e)}")
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            return written
+        for f in small:
+            os.remove(f)
+        merged = set(small)
+        return [p for p in written if p not in merged] + [path]
+
+    def _dataset(self, files):
+        fmt = 'parquet' if self.fmt == 'parquet' else 'ipc'
+        schemas = [ds.dataset(f, format=fmt).schema for f in files]
+        try:
+            schema = pa.unify_schemas(schemas)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            schema = None
+        return ds.dataset(files, format=fmt, schema=schema)
+
+    def _partition(self, df, date_column):
+        if not date_column or date_column not in df.columns:
+            yield NO_DATE_PARTITION, df
+            return
+        dates = pd.to_datetime(df[date_column], errors='coerce')
+        keys = dates.dt.strftime('%Y-%m').fillna(NO_DATE_PARTITION)
+        for key, part_df in df.groupby(keys, sort=True):
+            yield key, part_df
+
+    def _to_table(self, df):
+        return to_arrow_table(df)
+
+    def _write_table(self, table, path):
+        if self.fmt == 'parquet':
+            pq.write_table(table, path, compression='zstd')
+        else:
+            feather.write_feather(table, path, compression='zstd')
+
+    def _write_meta(self, base, meta):
+        os.makedirs(base, exist_ok=True)
+        with open(os.path.join(base, '_meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def _read_meta(self, category):
+        path = os.path.join(self.category_path(category), '_meta.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+
+def to_arrow_table(df):
+    """Convert a DataFrame to an Arrow table, storing mixed-type columns as JSON text"""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Mixed-type object columns (nested dicts, lists) are stored as JSON text
+        df = df.copy()
+        for col in df.select_dtypes(include=['object']).columns:
+            df[col] = df[col].map(
+                lambda v: v if v is None or isinstance(v, str) else json.dumps(v, default=str)
+            )
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def is_numeric_type(arrow_type):
+    """Return True for integer and floating point arrow types"""
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+
+
+def field_equals(column, value):
+    """Build a pushdown predicate matching rows where column equals value"""
+    return ds.field(column) == value
+
+
+def _is_date_only(value):
+    if isinstance(value, str):
+        return len(value) == 10
+    return isinstance(value, date) and not isinstance(value, datetime)
+
+
+def _partition_key(value):
+    if isinstance(value, str) and len(value) == 10:
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
@@ -1,12 +1,9 @@
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
-# Load environment variables
-load_dotenv()
-
 @dataclass
 class APIConfig:
     """API configuration settings"""
@@ -68,6 +65,163 @@ class CollectionConfig:
             max_records_per_request=int(os.getenv('MAX_RECORDS_PER_REQUEST', '50'))
         )
 
+@dataclass
+class DedupConfig:
+    """Cross-cycle deduplication of collected records"""
+    enabled: bool
+    path: str
+    capacity: int
+    error_rate: float
+    
+    @classmethod
+    def from_env(cls) -> 'DedupConfig':
+        """Create dedup config from environment variables"""
+        return cls(
+            enabled=os.getenv('DEDUP_ENABLED', 'true').lower() == 'true',
+            path=os.getenv('DEDUP_DB_PATH', os.path.join('checkpoints', 'dedup.sqlite3')),
+            # Keys the Bloom filter is sized for before it is rebuilt larger
+            capacity=int(os.getenv('DEDUP_BLOOM_CAPACITY', '1000000')),
+            error_rate=float(os.getenv('DEDUP_BLOOM_ERROR_RATE', '0.01'))
+        )
+
+@dataclass
+class MessagingConfig:
+    """Agent message bus configuration"""
+    mailbox_size: int
+    shared_memory: bool
+    
+    @classmethod
+    def from_env(cls) -> 'MessagingConfig':
+        """Create messaging config from environment variables"""
+        return cls(
+            mailbox_size=int(os.getenv('AGENT_MAILBOX_SIZE', '100')),
+            shared_memory=os.getenv('AGENT_SHARED_MEMORY', 'false').lower() == 'true'
+        )
+
+@dataclass
+class ShardingConfig:
+    """Partitioning of work across processor replicas"""
+    partition_by: str
+    virtual_nodes: int
+    
+    @classmethod
+    def from_env(cls) -> 'ShardingConfig':
+        """Create sharding config from environment variables"""
+        return cls(
+            partition_by=os.getenv('PARTITION_BY', 'source'),
+            virtual_nodes=int(os.getenv('HASH_RING_VNODES', '64'))
+        )
+
+@dataclass
+class ComputeConfig:
+    """Executor used for CPU-bound model work in agents"""
+    mode: str
+    max_workers: int
+    timeout: float
+    
+    @classmethod
+    def from_env(cls) -> 'ComputeConfig':
+        """Create compute config from environment variables"""
+        return cls(
+            mode=os.getenv('COMPUTE_MODE', 'thread'),
+            max_workers=int(os.getenv('COMPUTE_WORKERS', '0')),
+            timeout=float(os.getenv('COMPUTE_TIMEOUT', '300'))
+        )
+
+@dataclass
+class FeatureConfig:
+    """Feature engineering in the processor agent"""
+    dtype: str
+    max_pairs: int
+    
+    @classmethod
+    def from_env(cls) -> 'FeatureConfig':
+        """Create feature config from environment variables"""
+        return cls(
+            # float32 halves the memory of engineered features
+            dtype=os.getenv('FEATURE_DTYPE', 'float64'),
+            # 0 combines every pair of numeric columns
+            max_pairs=int(os.getenv('FEATURE_MAX_PAIRS', '0'))
+        )
+
+@dataclass
+class ClusteringConfig:
+    """Pattern clustering in the processor agent"""
+    backend: str
+    sample_size: int
+    n_clusters: int
+    
+    @classmethod
+    def from_env(cls) -> 'ClusteringConfig':
+        """Create clustering config from environment variables"""
+        return cls(
+            # 'dbscan', 'grid' (grid-indexed density) or 'kmeans' (MiniBatchKMeans)
+            backend=os.getenv('CLUSTER_BACKEND', 'dbscan'),
+            # Larger inputs are clustered on a sample and the rest assigned
+            sample_size=int(os.getenv('CLUSTER_SAMPLE_SIZE', '5000')),
+            n_clusters=int(os.getenv('CLUSTER_COUNT', '8'))
+        )
+
+@dataclass
+class TrendConfig:
+    """Trend analysis in the analyzer agent"""
+    time_column: str
+    unit: str
+    window: str
+    rolling_points: int
+    
+    @classmethod
+    def from_env(cls) -> 'TrendConfig':
+        """Create trend config from environment variables"""
+        return cls(
+            # Empty picks 'timestamp' or the first datetime column; without one trends are per row
+            time_column=os.getenv('TREND_TIME_COLUMN', ''),
+            unit=os.getenv('TREND_TIME_UNIT', 'D'),
+            # Rolling trend window: a time span such as '7D', a number of rows, or empty to disable
+            window=os.getenv('TREND_WINDOW', '7D'),
+            rolling_points=int(os.getenv('TREND_ROLLING_POINTS', '50'))
+        )
+
+@dataclass
+class ForecastConfig:
+    """Time series forecasting used for collection scheduling"""
+    mode: str
+    refit_points: int
+    horizon: int
+    
+    @classmethod
+    def from_env(cls) -> 'ForecastConfig':
+        """Create forecast config from environment variables"""
+        return cls(
+            # 'prophet', or 'ewma' for the low-cost hourly profile
+            mode=os.getenv('FORECAST_MODE', 'prophet'),
+            refit_points=int(os.getenv('FORECAST_REFIT_POINTS', '24')),
+            horizon=int(os.getenv('FORECAST_HORIZON', '24'))
+        )
+
+@dataclass
+class MemoryConfig:
+    """Bounds on data held by agents and the memory budget they must stay under"""
+    budget_mb: int
+    history_size: int
+    max_entries: int
+    eviction: str
+    spill_dir: str
+    check_interval: float
+    
+    @classmethod
+    def from_env(cls) -> 'MemoryConfig':
+        """Create memory config from environment variables"""
+        return cls(
+            # 0 takes the budget from the container's cgroup memory limit
+            budget_mb=int(os.getenv('MEMORY_BUDGET_MB', '0')),
+            history_size=int(os.getenv('PERFORMANCE_HISTORY_SIZE', '1000')),
+            max_entries=int(os.getenv('AGENT_MAX_ENTRIES', '256')),
+            eviction=os.getenv('MEMORY_EVICTION', 'spill'),
+            spill_dir=os.getenv('MEMORY_SPILL_DIR', 'spill'),
+            check_interval=float(os.getenv('MEMORY_CHECK_INTERVAL', '10'))
+        )
+
 @dataclass
 class LoggingConfig:
     """Logging configuration"""
@@ -95,15 +249,85 @@ class LoggingConfig:
         )
 
 class Config:
-    """Main configuration class"""
-    def __init__(self):
-        self.api = APIConfig.from_env()
-        self.rate_limit = RateLimitConfig.from_env()
-        self.collection = CollectionConfig.from_env()
-        self.logging = LoggingConfig.from_env()
+    """Main configuration class
+    
+    Creating it does no I/O. Each section is parsed from the environment the
+    first time it is used and then cached as a plain attribute, so validation
+    (such as the required API keys) only runs for sections that are actually
+    used. The ``.env`` file is read and logging is configured on the first
+    section access. ``reload()`` re-reads ``.env`` and discards the parsed
+    sections; values already copied out of a section keep their old value.
+    """
+    sections = {
+        'api': APIConfig,
+        'rate_limit': RateLimitConfig,
+        'collection': CollectionConfig,
+        'dedup': DedupConfig,
+        'messaging': MessagingConfig,
+        'sharding': ShardingConfig,
+        'compute': ComputeConfig,
+        'features': FeatureConfig,
+        'clustering': ClusteringConfig,
+        'trends': TrendConfig,
+        'forecast': ForecastConfig,
+        'memory': MemoryConfig,
+        'logging': LoggingConfig
+    }
+    
+    def __init__(self, env_file: Optional[str] = None):
+        self.env_file = env_file
+        self._dotenv: Dict[str, Optional[str]] = {}
+        self._env_state = None
+        self._ready = False
+        
+    def __getattr__(self, name: str):
+        # Only called for attributes not set yet, i.e. sections not parsed since the last reload
+        if name not in type(self).sections:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+        if not self._ready:
+            self._ready = True
+            self._load_env()
+            self.logging.setup_logging()
+            if name in self.__dict__:
+                return self.__dict__[name]
+        section = type(self).sections[name].from_env()
+        setattr(self, name, section)
+        return section
+        
+    def reload(self):
+        """Re-read .env and re-parse every section on its next use"""
+        self._load_env()
+        for name in type(self).sections:
+            self.__dict__.pop(name, None)
+            
+    def reload_if_changed(self) -> bool:
+        """Reload if .env or the process environment changed since the last load"""
+        if not self._ready or self._env_state == self._snapshot():
+            return False
+        self.reload()
+        return True
+        
+    def _load_env(self):
+        # Like load_dotenv(), variables set in the real environment take
+        # precedence; variables that came from .env follow edits to the file
+        path = self.env_file or find_dotenv()
+        values = dotenv_values(path) if path and os.path.exists(path) else {}
+        for key, value in self._dotenv.items():
+            # Removed from .env since the last load, and not overridden in the real environment
+            if key not in values and value is not None and os.environ.get(key) == value:
+                del os.environ[key]
+        for key, value in values.items():
+            if value is None:
+                continue
+            if key not in os.environ or os.environ[key] == self._dotenv.get(key):
+                os.environ[key] = value
+        self._dotenv = values
+        self._env_state = self._snapshot()
         
-        # Setup logging
-        self.logging.setup_logging()
+    def _snapshot(self):
+        path = self.env_file or find_dotenv()
+        mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+        return mtime, hash(frozenset(os.environ.items()))
         
     @property
     def data_sources(self) -> Dict[str, Dict[str, Any]]:
@@ -129,9 +353,14 @@ class Config:
                 "type": "api",
                 "base_url": "https://data.sfgov.org/resource/cuks-n6tp.json",
                 "requires_auth": False,
-                "params": {
-                    "$limit": "50000",
-                    "$order": "incident_datetime DESC"
+                "params": {},
+                "pagination": {
+                    "mode": "offset",
+                    "order_field": "incident_datetime",
+                    "tiebreak_field": "row_id",
+                    "page_size": 5000,
+                    "max_parallel": 4,
+                    "max_pages_per_run": 10
                 }
             },
             "amenities": {
@@ -152,5 +381,5 @@ class Config:
             }
         }
 
-# Create global config instance
+# Global config instance; sections are loaded on first use
 config = Config() 
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The collection and processing scripts import their siblings by module name,
+# as they do when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -4,7 +4,14 @@ import pandas as pd
 import logging
 from datetime import datetime
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+from functools import partial
+from ndjson_store import iter_records, iter_batches, iter_file_records, iter_segment_entries, is_segment, list_segments, record_digest
+from columnar_store import ColumnarStore, columnar_available
+from processing_manifest import ProcessingManifest, DigestIndex
+from processing_pipeline import CategoryJob, ProcessingPipeline
+from chunked_processing import ChunkedSortProcessor
 
 logging.basicConfig(
     filename='data_processing.log',
@@ -12,26 +19,46 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Column used to date-partition each category in the columnar store
+DATE_COLUMNS = {
+    'real_estate': 'timestamp',
+    'demographics': None,
+    'crime': 'date',
+    'amenities': None,
+    'reviews': 'date'
+}
+
 class NeighborhoodDataProcessor:
-    def __init__(self):
+    def __init__(self, chunk_size=10000, workers=None, crime_chunk_size=None):
         self.collected_data_path = "collected_data"
         self.processed_data_path = "processed_data"
+        self.chunk_size = chunk_size
+        self.workers = workers
+        # When set, crime data is processed out of core in chunks of this many records
+        self.crime_chunk_size = crime_chunk_size
+        self.stage_timings = {}
         os.makedirs(self.processed_data_path, exist_ok=True)
+        self.store = ColumnarStore(self.processed_data_path) if columnar_available() else None
+        self.state_path = os.path.join(self.processed_data_path, "_state")
+        self.manifest = ProcessingManifest(os.path.join(self.state_path, "manifest.json"))
 
     def load_category_files(self, category):
-        files = [f for f in os.listdir(self.collected_data_path) if f.startswith(category)]
-        data = []
-        for file in files:
-            try:
-                with open(os.path.join(self.collected_data_path, file), 'r') as f:
-                    data.extend(json.load(f))
-            except Exception as e:
-                logging.error(f"Error loading {file}: {str(e)}")
-        return data
+        # Records are streamed lazily and repeated snapshots of recent records are
+        # skipped within a bounded window, so memory stays flat however much history piles up
+        return iter_records(self.collected_data_path, category, distinct=True)
+
+    def to_dataframe(self, data):
+        if isinstance(data, pd.DataFrame):
+            return data
+        # Build the frame chunk by chunk so the raw record dicts never pile up
+        frames = [pd.DataFrame(chunk) for chunk in iter_batches(data, self.chunk_size)]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
 
     def process_real_estate_data(self, data):
         try:
-            df = pd.DataFrame(data)
+            df = self.to_dataframe(data)
             # Process and clean real estate data
             df = df.drop_duplicates()
             df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -43,7 +70,7 @@ class NeighborhoodDataProcessor:
 
     def process_demographic_data(self, data):
         try:
-            df = pd.DataFrame(data)
+            df = self.to_dataframe(data)
             # Process and clean demographic data
             df = df.drop_duplicates()
             df = df.fillna(method='ffill')
@@ -54,7 +81,7 @@ class NeighborhoodDataProcessor:
 
     def process_crime_data(self, data):
         try:
-            df = pd.DataFrame(data)
+            df = self.to_dataframe(data)
             # Process and clean crime data
             df = df.drop_duplicates()
             df['date'] = pd.to_datetime(df['date'])
@@ -64,23 +91,60 @@ class NeighborhoodDataProcessor:
             logging.error(f"Error processing crime data: {str(e)}")
             return pd.DataFrame()
 
+    def process_crime_data_chunked(self, records=None, mode='overwrite'):
+        try:
+            sorter = ChunkedSortProcessor(
+                chunk_size=self.crime_chunk_size,
+                date_columns=('date', 'incident_datetime'),
+                work_dir=self.processed_data_path
+            )
+            # No in-memory dedup here: the sorter dedups each chunk and drops repeats across chunks while merging
+            if records is None:
+                records = iter_records(self.collected_data_path, 'crime')
+            written = sorter.process(
+                records,
+                lambda frames, date_column: self.store.write_batches('crime', frames, date_column=date_column, mode=mode)
+            )
+            logging.info(f"Processed crime data out of core: {sorter.stats}")
+            return written
+        except Exception as e:
+            logging.error(f"Error processing crime data in chunks: {str(e)}")
+            return []
+
     def process_amenities_data(self, data):
         try:
-            df = pd.DataFrame(data)
+            df = self.to_dataframe(data)
             # Process and clean amenities data
             df = df.drop_duplicates()
-            df = df.groupby(['neighborhood', 'category']).agg({
-                'count': 'sum',
-                'rating': 'mean'
-            }).reset_index()
-            return df
+            return self.finalize_amenities_aggregate(self.aggregate_amenities_data(df))
         except Exception as e:
             logging.error(f"Error processing amenities data: {str(e)}")
             return pd.DataFrame()
 
+    def aggregate_amenities_data(self, df):
+        # Mergeable partial aggregate: sums and counts instead of means
+        return df.groupby(['neighborhood', 'category']).agg(
+            count=('count', 'sum'),
+            rating_sum=('rating', 'sum'),
+            rating_n=('rating', 'count')
+        ).reset_index()
+
+    def merge_amenities_aggregates(self, *partials):
+        partials = [p for p in partials if p is not None and not p.empty]
+        if not partials:
+            return pd.DataFrame()
+        return pd.concat(partials, ignore_index=True).groupby(
+            ['neighborhood', 'category'], as_index=False
+        )[['count', 'rating_sum', 'rating_n']].sum()
+
+    def finalize_amenities_aggregate(self, partial):
+        df = partial[['neighborhood', 'category', 'count']].copy()
+        df['rating'] = partial['rating_sum'] / partial['rating_n'].replace(0, np.nan)
+        return df
+
     def process_reviews_data(self, data):
         try:
-            df = pd.DataFrame(data)
+            df = self.to_dataframe(data)
             # Process and clean reviews data
             df = df.drop_duplicates()
             df['date'] = pd.to_datetime(df['date'])
@@ -92,60 +156,262 @@ class NeighborhoodDataProcessor:
 
     def merge_data(self, dataframes):
         try:
-            # Merge all processed dataframes
+            if self.store is None:
+                return self.merge_data_json(dataframes)
+
+            # Write each category as date-partitioned columnar files
             merged_data = {}
             for category, df in dataframes.items():
                 if not df.empty:
-                    merged_data[category] = df.to_dict('records')
-            
-            # Save merged data
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = os.path.join(self.processed_data_path, f"merged_data_{timestamp}.json")
-            with open(output_file, 'w') as f:
-                json.dump(merged_data, f, indent=2)
-            logging.info(f"Saved merged data to {output_file}")
-            
+                    self.store.write(category, df, date_column=DATE_COLUMNS.get(category))
+                    merged_data[category] = df
+            logging.info(f"Saved {len(merged_data)} categories to {self.processed_data_path}")
+
             return merged_data
         except Exception as e:
             logging.error(f"Error merging data: {str(e)}")
             return {}
 
-    def run_processing(self):
+    def merge_data_json(self, dataframes):
+        # Fallback used when pyarrow is not installed
+        merged_data = {}
+        for category, df in dataframes.items():
+            if not df.empty:
+                merged_data[category] = df.to_dict('records')
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.processed_data_path, f"merged_data_{timestamp}.json")
+        with open(output_file, 'w') as f:
+            json.dump(merged_data, f, default=str)
+        logging.info(f"Saved merged data to {output_file}")
+
+        return merged_data
+
+    def get_categories(self):
+        return {
+            'real_estate': (self.load_category_files, self.process_real_estate_data),
+            'demographics': (self.load_category_files, self.process_demographic_data),
+            'crime': (self.load_category_files, self.process_crime_data),
+            'amenities': (self.load_category_files, self.process_amenities_data),
+            'reviews': (self.load_category_files, self.process_reviews_data)
+        }
+
+    def make_pipeline(self):
+        # Worker processes build their own processor rather than receiving a pickled copy of this one
+        return ProcessingPipeline(
+            partial(type(self), chunk_size=self.chunk_size),
+            workers=self.workers,
+            work_dir=self.processed_data_path
+        )
+
+    def run_processing(self, incremental=False):
+        if incremental:
+            if self.store is not None:
+                return self.run_incremental_processing()
+            logging.warning("Incremental processing needs pyarrow, running a full pass")
+
         try:
-            # Load and process each category
-            categories = {
-                'real_estate': (self.load_category_files, self.process_real_estate_data),
-                'demographics': (self.load_category_files, self.process_demographic_data),
-                'crime': (self.load_category_files, self.process_crime_data),
-                'amenities': (self.load_category_files, self.process_amenities_data),
-                'reviews': (self.load_category_files, self.process_reviews_data)
+            # Load, parse and process each category as parallel stages
+            pipeline = self.make_pipeline()
+            chunked_crime = self.crime_chunk_size and self.store is not None
+            jobs = {
+                category: CategoryJob(processor.__name__, [(path, 0) for path in list_segments(self.collected_data_path, category)])
+                for category, (_, processor) in self.get_categories().items()
+                if not (chunked_crime and category == 'crime')
+            }
+            processed_data = {
+                category: result.data if result.data is not None else pd.DataFrame()
+                for category, result in pipeline.run(jobs).items()
             }
 
-            processed_data = {}
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_category = {}
-                for category, (loader, processor) in categories.items():
-                    data = loader(category)
-                    future = executor.submit(processor, data)
-                    future_to_category[future] = category
-
-                for future in future_to_category:
-                    category = future_to_category[future]
-                    try:
-                        df = future.result()
-                        processed_data[category] = df
-                    except Exception as e:
-                        logging.error(f"Error processing {category}: {str(e)}")
+            if chunked_crime:
+                started = time.perf_counter()
+                self.process_crime_data_chunked()
+                pipeline.timings.record('crime_chunked', time.perf_counter() - started)
 
             # Merge all processed data
+            started = time.perf_counter()
             merged_data = self.merge_data(processed_data)
+            pipeline.timings.record('write', time.perf_counter() - started, items=len(merged_data))
+
+            self.stage_timings = pipeline.timings.summary()
+            logging.info(f"Processing stage timings: {self.stage_timings}")
             return merged_data
 
         except Exception as e:
             logging.error(f"Error in processing pipeline: {str(e)}")
             return {}
 
+    def run_incremental_processing(self):
+        try:
+            # New records of every category go through the same pipeline; the
+            # manifest and digest indexes are only touched on this thread
+            pipeline = self.make_pipeline()
+            processed_data = {}
+            jobs = {}
+            pending = {}
+            for category, (_, processor) in self.get_categories().items():
+                scanned = self.scan_category(category)
+                if scanned is None:
+                    continue
+                changes, digests, rebuild = scanned
+                if category == 'crime' and self.crime_chunk_size:
+                    started = time.perf_counter()
+                    df = self.process_crime_incremental_chunked(changes, digests, rebuild)
+                    pipeline.timings.record('crime_chunked', time.perf_counter() - started)
+                    if df is not None:
+                        processed_data[category] = df
+                    continue
+                if category == 'amenities':
+                    # Merged into the saved aggregate instead of recomputed
+                    method, args = self.process_amenities_incremental.__name__, (rebuild,)
+                else:
+                    method, args = processor.__name__, ()
+                sources = [(change.path, change.offset) for change in changes]
+                jobs[category] = CategoryJob(method, sources, args, keep=digests.add)
+                pending[category] = (changes, digests, rebuild)
+
+            started = time.perf_counter()
+            for category, result in pipeline.run(jobs).items():
+                df = self.commit_category_incremental(category, result, *pending[category])
+                if df is not None:
+                    processed_data[category] = df
+            pipeline.timings.record('write', time.perf_counter() - started, items=len(jobs))
+
+            self.manifest.save()
+            self.stage_timings = pipeline.timings.summary()
+            logging.info(f"Processing stage timings: {self.stage_timings}")
+            return processed_data
+
+        except Exception as e:
+            logging.error(f"Error in incremental processing pipeline: {str(e)}")
+            return {}
+
+    def scan_category(self, category):
+        """Files of a category to (re)process, its digest index and whether it is rebuilt from scratch"""
+        changes, removed = self.manifest.scan(self.collected_data_path, category)
+        for name in removed:
+            # Retention cleanup; what was processed from the file stays processed
+            self.manifest.forget(category, name)
+
+        digests = DigestIndex(os.path.join(self.state_path, f"{category}.digests"))
+        if any(change.action == 'replaced' for change in changes):
+            # A file was rewritten in place, so its earlier contribution cannot be
+            # subtracted; rebuild the category from scratch
+            logging.info(f"Collected {category} files were rewritten, rebuilding category")
+            self.manifest.reset(category)
+            digests.reset()
+            self.reset_aggregate_state(category)
+            changes, _ = self.manifest.scan(self.collected_data_path, category)
+
+        if not changes:
+            return None
+        rebuild = not any(self.manifest.entries.get(category, {}).values())
+        return changes, digests, rebuild
+
+    def commit_category_incremental(self, category, result, changes, digests, rebuild):
+        """Write a category's processed new records and advance its watermark"""
+        df = result.data
+        if df is None or (result.records and df.empty):
+            # The processor failed on the new records; leave the watermark alone
+            digests.discard_pending()
+            logging.error(f"No output for {result.records} new {category} records, will retry")
+            return None
+
+        if not df.empty:
+            if category == 'amenities':
+                self.store.write(category, df, date_column=DATE_COLUMNS.get(category))
+            else:
+                self.store.write(category, df, date_column=DATE_COLUMNS.get(category),
+                                 mode='overwrite' if rebuild else 'append')
+        digests.flush()
+        for change in changes:
+            # Files that could not be read completely are retried; their records seen so far stay deduplicated
+            if change.path not in result.failed:
+                self.manifest.commit(category, change, result.offsets.get(change.path, change.state['size']))
+
+        logging.info(f"Processed {result.records} new {category} records from {len(changes)} files")
+        return df
+
+    def process_crime_incremental_chunked(self, changes, digests, rebuild):
+        offsets = {}
+        counter = {'records': 0}
+        records = self.iter_new_records(changes, offsets, digests, counter)
+        # Sorted and written out of core; the new records are already deduplicated by the digest index
+        written = self.process_crime_data_chunked(records, mode='overwrite' if rebuild else 'append')
+        if counter['records'] and not written:
+            digests.discard_pending()
+            logging.error(f"No output for {counter['records']} new crime records, will retry")
+            return None
+        digests.flush()
+        for change in changes:
+            self.manifest.commit('crime', change, offsets.get(change.path, change.state['size']))
+        logging.info(f"Processed {counter['records']} new crime records from {len(changes)} files")
+        return pd.DataFrame()
+
+    def iter_new_records(self, changes, offsets, digests, counter):
+        for change in changes:
+            try:
+                if is_segment(change.path):
+                    offsets[change.path] = change.offset
+                    entries = iter_segment_entries(change.path, change.offset)
+                else:
+                    entries = ((record, None) for record in iter_file_records(change.path))
+                for record, end_offset in entries:
+                    if end_offset is not None:
+                        offsets[change.path] = end_offset
+                    if digests.add(record_digest(record)):
+                        counter['records'] += 1
+                        yield record
+            except Exception as e:
+                logging.error(f"Error loading {change.name}: {str(e)}")
+
+    def process_amenities_incremental(self, records, rebuild):
+        try:
+            df = self.to_dataframe(records).drop_duplicates()
+            state = None if rebuild else self.load_aggregate_state('amenities')
+            partial = self.aggregate_amenities_data(df) if not df.empty else None
+            merged = self.merge_amenities_aggregates(state, partial)
+            if merged.empty:
+                return pd.DataFrame()
+            self.save_aggregate_state('amenities', merged)
+            return self.finalize_amenities_aggregate(merged)
+        except Exception as e:
+            logging.error(f"Error processing amenities data: {str(e)}")
+            return pd.DataFrame()
+
+    def aggregate_state_file(self, category):
+        return os.path.join(self.state_path, f"{category}_aggregate.json")
+
+    def load_aggregate_state(self, category):
+        path = self.aggregate_state_file(category)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return pd.DataFrame(json.load(f))
+
+    def save_aggregate_state(self, category, df):
+        os.makedirs(self.state_path, exist_ok=True)
+        tmp_path = self.aggregate_state_file(category) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(df.to_dict('records'), f, default=str)
+        os.replace(tmp_path, self.aggregate_state_file(category))
+
+    def reset_aggregate_state(self, category):
+        path = self.aggregate_state_file(category)
+        if os.path.exists(path):
+            os.remove(path)
+
 if __name__ == "__main__":
-    processor = NeighborhoodDataProcessor()
+    parser = argparse.ArgumentParser(description="Process collected neighborhood data")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process files that changed since the last run")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for parsing and processing (default: CPU count)")
+    parser.add_argument('--crime-chunk-size', type=int, default=None,
+                        help="process crime data out of core in chunks of this many records")
+    args = parser.parse_args()
+
+    processor = NeighborhoodDataProcessor(workers=args.workers, crime_chunk_size=args.crime_chunk_size)
     logging.info("Starting data processing...")
-    processor.run_processing() 
\ No newline at end of file
+    processor.run_processing(incremental=args.incremental) 
\ No newline at end of file
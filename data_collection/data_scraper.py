@@ -11,6 +11,9 @@ import numpy as np
 from random_user_agent.user_agent import UserAgent
 from random_user_agent.params import SoftwareName, OperatingSystem
 from tqdm import tqdm
+from ndjson_store import NDJSONSegmentWriter
+from dedup_store import DedupStore
+from soda_ingest import SodaPaginator, checkpoint_file
 
 # Set up logging
 logging.basicConfig(
@@ -20,9 +23,21 @@ logging.basicConfig(
 )
 
 class NeighborhoodDataCollector:
-    def __init__(self):
+    def __init__(self, compress=False, max_segment_bytes=64 * 1024 * 1024,
+                 max_segment_age=3600, fsync_policy='rotate', dedup=True):
         self.base_path = "collected_data"
         os.makedirs(self.base_path, exist_ok=True)
+        self.segment_options = {
+            'compress': compress,
+            'max_segment_bytes': max_segment_bytes,
+            'max_segment_age': max_segment_age,
+            'fsync_policy': fsync_policy
+        }
+        self.sinks = {}
+        self.checkpoint_path = "checkpoints"
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+        # Records already saved in an earlier cycle (or run) are not saved again
+        self.dedup = DedupStore(os.path.join(self.checkpoint_path, "dedup.sqlite3")) if dedup else None
         software_names = [SoftwareName.CHROME.value]
         operating_systems = [OperatingSystem.WINDOWS.value, OperatingSystem.LINUX.value]
         self.ua = UserAgent(software_names=software_names, operating_systems=operating_systems)
@@ -35,12 +50,25 @@ class NeighborhoodDataCollector:
             'Accept-Language': 'en-US,en;q=0.9'
         }
 
+    def get_sink(self, category):
+        if category not in self.sinks:
+            self.sinks[category] = NDJSONSegmentWriter(self.base_path, category, **self.segment_options)
+        return self.sinks[category]
+
     def save_data(self, data, category):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.base_path}/{category}_{timestamp}.json"
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        logging.info(f"Saved {len(data)} records to {filename}")
+        sink = self.get_sink(category)
+        if self.dedup is None:
+            count = sink.append(data)
+            logging.info(f"Saved {count} records to {sink.path}")
+            return
+        count = self.dedup.store_new(data, category, sink.append)
+        logging.info(f"Saved {count} new records to {sink.path}, skipped {len(data) - count} already collected")
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+        if self.dedup is not None:
+            self.dedup.close()
 
     def collect_real_estate_data(self):
         try:
@@ -104,30 +132,45 @@ class NeighborhoodDataCollector:
     def collect_crime_data(self):
         try:
             data = []
-            # SF OpenData Crime Reports
+            # SF OpenData Crime Reports, paged and resumed from the last checkpoint
             sfdata_url = "https://data.sfgov.org/resource/wg3w-h783.json"
             # CrimeMapping
             crimemap_url = "https://www.crimemapping.com/map/ca/sanfrancisco"
-            
-            urls = [sfdata_url, crimemap_url]
-            
-            for url in urls:
-                try:
-                    response = self.session.get(url, headers=self.get_headers())
-                    if response.status_code == 200:
-                        if 'sfgov.org' in url:
-                            data.extend(response.json())
-                        else:
-                            soup = BeautifulSoup(response.text, 'lxml')
-                            data.extend(self.extract_crime_data(soup))
-                        time.sleep(2)
-                except Exception as e:
-                    logging.error(f"Error collecting from {url}: {str(e)}")
+
+            try:
+                count = self.ingest_soda_dataset(sfdata_url, 'crime')
+                logging.info(f"Ingested {count} new incidents from {sfdata_url}")
+            except Exception as e:
+                logging.error(f"Error collecting from {sfdata_url}: {str(e)}")
+
+            try:
+                response = self.session.get(crimemap_url, headers=self.get_headers())
+                if response.status_code == 200:
+                    soup = BeautifulSoup(response.text, 'lxml')
+                    data.extend(self.extract_crime_data(soup))
+                    time.sleep(2)
+            except Exception as e:
+                logging.error(f"Error collecting from {crimemap_url}: {str(e)}")
             return data
         except Exception as e:
             logging.error(f"Error in crime data collection: {str(e)}")
             return []
 
+    def ingest_soda_dataset(self, url, category, page_size=1000, max_parallel=4):
+        # Pages go straight to the category's NDJSON sink instead of being collected in memory
+        paginator = SodaPaginator(
+            page_size=page_size,
+            max_parallel=max_parallel,
+            checkpoint_path=os.path.join(self.checkpoint_path, checkpoint_file(url, category))
+        )
+
+        def fetch_page(params):
+            response = self.session.get(url, headers=self.get_headers(), params=params, timeout=60)
+            response.raise_for_status()
+            return response.json()
+
+        return paginator.ingest(fetch_page, lambda page: self.save_data(page, category))
+
     def collect_amenities_data(self):
         try:
             data = []
@@ -403,4 +446,7 @@ class NeighborhoodDataCollector:
 if __name__ == "__main__":
     collector = NeighborhoodDataCollector()
     logging.info("Starting continuous data collection...")
-    collector.run_continuous_collection() 
\ No newline at end of file
+    try:
+        collector.run_continuous_collection()
+    finally:
+        collector.close() 
\ No newline at end of file
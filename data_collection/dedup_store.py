@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Fields stamped with the fetch time; they differ between cycles for the same record
+VOLATILE_FIELDS = ('timestamp',)
+KEY_SIZE = 16
+# Stays below SQLite's limit on bound parameters per statement
+QUERY_CHUNK = 500
+
+
+def record_key(record, category, ignore=VOLATILE_FIELDS):
+    """Return the content hash identifying a record of a category across collection cycles"""
+    stable = {k: v for k, v in record.items() if k not in ignore}
+    payload = category + '\n' + json.dumps(stable, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=KEY_SIZE).digest()
+
+
+class BloomFilter:
+    """Bit array answering "definitely new" or "maybe seen" for record keys
+
+    Keys are already uniform hashes, so the k probe positions are derived from
+    their two 64-bit halves by double hashing; batches are probed with NumPy.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, keys):
+        halves = np.frombuffer(b''.join(keys), dtype='<u8').reshape(len(keys), -1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps around, which is fine for hashing
+        return (halves[:, :1] + steps * (halves[:, 1:2] | np.uint64(1))) % np.uint64(self.size)
+
+    def add_many(self, keys):
+        if not keys:
+            return
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+        self.count += len(keys)
+
+    def contains_many(self, keys):
+        """Boolean array, False for keys that were certainly never added"""
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        probes = self.bits[positions >> np.uint64(3)] & (1 << (positions & np.uint64(7))).astype(np.uint8)
+        return probes.all(axis=1)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class DedupStore:
+    """Persistent index of the records already collected, across cycles and restarts
+
+    Maps the content hash of every record (see ``record_key``) to when it was
+    first seen, in an SQLite table. An in-memory Bloom filter in front answers
+    most lookups for new records without touching the database; only keys it
+    reports as possibly seen are checked in SQLite. The filter is rebuilt from
+    the table on open, and with twice the capacity when it fills up.
+    """
+
+    def __init__(self, path, capacity=1_000_000, error_rate=0.01, ignore_fields=VOLATILE_FIELDS):
+        self.path = path
+        self.error_rate = error_rate
+        self.ignore_fields = tuple(ignore_fields)
+        self.stats = {'checked': 0, 'duplicates': 0, 'bloom_negatives': 0, 'db_lookups': 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY, first_seen REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._rebuild_filter(capacity)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def _rebuild_filter(self, capacity):
+        count = len(self)
+        self.bloom = BloomFilter(max(capacity, 2 * count), self.error_rate)
+        cursor = self._db.execute("SELECT key FROM seen")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            self.bloom.add_many([row[0] for row in rows])
+        logging.info(f"Loaded {count} record keys into the dedup filter ({self.bloom.nbytes} bytes)")
+
+    def filter_new(self, records, category):
+        """Return the records not seen before, and their keys
+
+        Duplicates within the batch are dropped as well. Nothing is recorded:
+        pass the keys to ``mark_seen`` once the records have been stored, so a
+        failed write does not lose them.
+        """
+        unique = {}
+        for record in records:
+            unique.setdefault(record_key(record, category, self.ignore_fields), record)
+        keys = list(unique)
+
+        with self._lock:
+            maybe = self.bloom.contains_many(keys)
+            candidates = [key for key, hit in zip(keys, maybe) if hit]
+            seen = self._lookup(candidates)
+            self.stats['checked'] += len(records)
+            self.stats['bloom_negatives'] += len(keys) - len(candidates)
+            self.stats['db_lookups'] += len(candidates)
+            new_keys = [key for key in keys if key not in seen]
+            self.stats['duplicates'] += len(records) - len(new_keys)
+        return [unique[key] for key in new_keys], new_keys
+
+    def _lookup(self, keys):
+        seen = set()
+        for start in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[start:start + QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._db.execute(f"SELECT key FROM seen WHERE key IN ({placeholders})", chunk)
+            seen.update(row[0] for row in rows)
+        return seen
+
+    def mark_seen(self, keys):
+        """Record keys as seen now; keys seen earlier keep their first-seen time"""
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR IGNORE INTO seen (key, first_seen) VALUES (?, ?)", ((key, now) for key in keys))
+            self.bloom.add_many(keys)
+            if self.bloom.count > self.bloom.capacity:
+                self._rebuild_filter(2 * self.bloom.capacity)
+
+    def store_new(self, records, category, sink):
+        """Pass only unseen records to sink, then mark them seen; returns how many were new"""
+        new_records, keys = self.filter_new(records, category)
+        if new_records:
+            sink(new_records)
+            self.mark_seen(keys)
+        return len(new_records)
+
+    def first_seen(self, record, category):
+        """Unix time a record was first seen, or None"""
+        key = record_key(record, category, self.ignore_fields)
+        with self._lock:
+            row = self._db.execute("SELECT first_seen FROM seen WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_stats(self):
+        return dict(self.stats, keys=self.bloom.count, filter_bytes=self.bloom.nbytes)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,305 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+FSYNC_POLICIES = ('always', 'rotate', 'never')
+SEGMENT_SUFFIXES = ('.ndjson', '.ndjson.gz')
+LEGACY_SUFFIX = '.json'
+# Distinct digests remembered by iter_records(distinct=True), about 100 bytes each
+DISTINCT_WINDOW = 500000
+
+
+def encode_record(record):
+    """Serialize a record to its canonical NDJSON line"""
+    return json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def record_digest(record):
+    """Return a compact digest identifying a record by content"""
+    return hashlib.blake2b(encode_record(record).encode('utf-8'), digest_size=8).digest()
+
+
+class NDJSONSegmentWriter:
+    """Append-only NDJSON sink for one category with segment rotation"""
+
+    def __init__(self, base_path, category, compress=False,
+                 max_segment_bytes=64 * 1024 * 1024, max_segment_age=3600,
+                 fsync_policy='rotate'):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.base_path = base_path
+        self.category = category
+        self.compress = compress
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync_policy = fsync_policy
+        self.path = None
+        self._raw = None
+        self._stream = None
+        self._opened_at = None
+        self._segment_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def append(self, records):
+        """Append records to the active segment, rotating when it is full or stale"""
+        count = 0
+        with self._lock:
+            for record in records:
+                if self._stream is None or self._should_rotate():
+                    self._rotate()
+                line = (encode_record(record) + '\n').encode('utf-8')
+                self._stream.write(line)
+                self._segment_bytes += len(line)
+                count += 1
+            if self._stream is not None:
+                self._flush(sync=self.fsync_policy == 'always')
+        return count
+
+    def rotate(self):
+        """Seal the active segment; the next append starts a new one"""
+        with self._lock:
+            self._close_segment()
+
+    def close(self):
+        """Flush and seal the active segment"""
+        self.rotate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _should_rotate(self):
+        if self._segment_bytes >= self.max_segment_bytes:
+            return True
+        return time.monotonic() - self._opened_at >= self.max_segment_age
+
+    def _rotate(self):
+        self._close_segment()
+        self._open_segment()
+
+    def _open_segment(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = '.ndjson.gz' if self.compress else '.ndjson'
+        path = os.path.join(self.base_path, f"{self.category}_{timestamp}{suffix}")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.base_path, f"{self.category}_{timestamp}_{n}{suffix}")
+            n += 1
+        self._raw = open(path, 'ab')
+        self._stream = gzip.GzipFile(fileobj=self._raw, mode='ab') if self.compress else self._raw
+        self.path = path
+        self._opened_at = time.monotonic()
+        self._segment_bytes = 0
+        logging.info(f"Opened segment {path}")
+
+    def _flush(self, sync=False):
+        if self._stream is not self._raw:
+            self._stream.flush()
+        self._sync(sync)
+
+    def _sync(self, sync):
+        self._raw.flush()
+        if sync:
+            os.fsync(self._raw.fileno())
+
+    def _close_segment(self):
+        if self._stream is None:
+            return
+        try:
+            if self._stream is not self._raw:
+                self._stream.close()
+            self._sync(sync=self.fsync_policy != 'never')
+        finally:
+            self._raw.close()
+            logging.info(f"Sealed segment {self.path} ({self._segment_bytes} bytes)")
+            self._raw = None
+            self._stream = None
+
+
+def list_segments(base_path, category):
+    """List NDJSON segments and legacy JSON dumps for a category in write order"""
+    if not os.path.isdir(base_path):
+        return []
+    files = [
+        f for f in os.listdir(base_path)
+        if f.startswith(f"{category}_") and f.endswith(SEGMENT_SUFFIXES + (LEGACY_SUFFIX,))
+    ]
+    return [os.path.join(base_path, f) for f in sorted(files)]
+
+
+def is_segment(path):
+    """Return True for append-only NDJSON segments (as opposed to legacy dumps)"""
+    return path.endswith(SEGMENT_SUFFIXES)
+
+
+def iter_file_records(path):
+    """Lazily yield records from one NDJSON segment or legacy JSON array file"""
+    if not is_segment(path):
+        with open(path, 'r') as f:
+            yield from _iter_json_array(f)
+        return
+
+    for record, _ in iter_segment_entries(path):
+        yield record
+
+
+def iter_segment_entries(path, offset=0):
+    """Yield (record, end_offset) pairs from an NDJSON segment, starting at offset
+
+    Offsets count uncompressed bytes and always fall on a line boundary, so a
+    reader can resume a growing segment where it previously stopped.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        position = offset
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Trailing partial line of a segment that is still being written
+                    break
+                position += len(line)
+                line = line.strip()
+                if line:
+                    yield json.loads(line), position
+        except EOFError:
+            # Active compressed segment without its end-of-stream marker yet
+            pass
+
+
+def iter_segment_blocks(path, offset=0, block_size=4 * 1024 * 1024):
+    """Yield (block, end_offset) pairs of about block_size bytes of whole NDJSON lines, starting at offset
+
+    Offsets count uncompressed bytes like those of ``iter_segment_entries``; a
+    trailing partial line is left for the next reader.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        position = offset
+        pending = b''
+        while True:
+            try:
+                chunk = f.read(block_size)
+            except EOFError:
+                # Active compressed segment without its end-of-stream marker yet
+                break
+            if not chunk:
+                break
+            data = pending + chunk
+            end = data.rfind(b'\n') + 1
+            pending = data[end:]
+            if end:
+                position += end
+                yield data[:end], position
+
+
+class RecentDigests:
+    """Bounded set of the most recently added record digests"""
+
+    def __init__(self, maxlen=DISTINCT_WINDOW):
+        self.maxlen = maxlen
+        self.digests = OrderedDict()
+
+    def add(self, digest):
+        """Add a digest, returning False if it is among the most recent ones"""
+        if digest in self.digests:
+            self.digests.move_to_end(digest)
+            return False
+        self.digests[digest] = None
+        if len(self.digests) > self.maxlen:
+            self.digests.popitem(last=False)
+        return True
+
+
+def iter_records(base_path, category, distinct=False, key_store=None):
+    """Lazily yield every stored record for a category, optionally skipping duplicates
+
+    ``distinct`` skips repeats of the last ``DISTINCT_WINDOW`` distinct records,
+    which covers repeated snapshots of the same records in recent segments while
+    keeping memory bounded. A ``key_store`` with an ``add(digest) -> bool``
+    method, such as ``DigestIndex``, deduplicates against everything it holds
+    instead.
+    """
+    if key_store is None and distinct:
+        key_store = RecentDigests(DISTINCT_WINDOW)
+    for path in list_segments(base_path, category):
+        try:
+            for record in iter_file_records(path):
+                if key_store is not None and not key_store.add(record_digest(record)):
+                    continue
+                yield record
+        except Exception as e:
+            logging.error(f"Error loading {os.path.basename(path)}: {str(e)}")
+
+
+def iter_batches(records, batch_size):
+    """Group an iterable of records into lists of at most batch_size"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_json_array(f, chunk_size=64 * 1024):
+    """Incrementally decode the elements of a top-level JSON array"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            fill()
+            continue
+
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end >= len(buf) and not eof:
+            # A scalar may have been cut at the chunk boundary
+            fill()
+            continue
+        pos = end
+        yield value
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from ndjson_store import is_segment, list_segments
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DIGEST_SIZE = 8
+
+
+@dataclass
+class FileChange:
+    """A collected file that has not been (fully) processed yet"""
+    path: str
+    action: str  # 'new', 'append' or 'replaced'
+    offset: int
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+class ProcessingManifest:
+    """File-level watermark of which collected files have been processed
+
+    Each entry records a file's size, mtime, content hash and how many
+    (uncompressed) bytes of it have been consumed. Unchanged files are detected
+    from size and mtime alone, so only new or modified files are ever hashed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading manifest {self.path}: {str(e)}")
+                self.entries = {}
+
+    def save(self):
+        """Persist the manifest atomically"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def has_category(self, category: str) -> bool:
+        return bool(self.entries.get(category))
+
+    def reset(self, category: str):
+        self.entries.pop(category, None)
+
+    def scan(self, base_path: str, category: str) -> Tuple[List[FileChange], List[str]]:
+        """Compare collected files with the manifest
+
+        Returns the files that need processing and the names of files that have
+        disappeared since the last run. Files are matched by name, so files that
+        arrive late with an older timestamp are still picked up.
+        """
+        entries = self.entries.setdefault(category, {})
+        changes = []
+        present = set()
+
+        for path in list_segments(base_path, category):
+            name = os.path.basename(path)
+            present.add(name)
+            stat = os.stat(path)
+            old = entries.get(name)
+
+            if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                continue
+
+            state = {'size': stat.st_size, 'mtime': stat.st_mtime}
+            if old is None:
+                state['sha256'], _ = _hash_file(path)
+                changes.append(FileChange(path, 'new', 0, state))
+            elif is_segment(path) and stat.st_size > old['size']:
+                # Segments are append-only: if the bytes we already consumed are
+                # unchanged, resume from the previous offset
+                state['sha256'], prefix = _hash_file(path, prefix_size=old['size'])
+                action = 'append' if prefix == old['sha256'] else 'replaced'
+                changes.append(FileChange(path, action, old.get('offset', 0) if action == 'append' else 0, state))
+            else:
+                state['sha256'], _ = _hash_file(path)
+                if state['sha256'] == old['sha256']:
+                    # Only touched; keep the watermark and refresh the mtime
+                    old['mtime'] = stat.st_mtime
+                    continue
+                changes.append(FileChange(path, 'replaced', 0, state))
+
+        removed = [name for name in entries if name not in present]
+        return changes, removed
+
+    def commit(self, category: str, change: FileChange, offset: int):
+        """Record a file as processed up to offset"""
+        self.entries.setdefault(category, {})[change.name] = dict(change.state, offset=offset)
+
+    def forget(self, category: str, name: str):
+        self.entries.get(category, {}).pop(name, None)
+
+
+class DigestIndex:
+    """Persistent set of record digests already emitted for one category"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.digests = set()
+        self.pending = []
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) % DIGEST_SIZE:
+                # A flush cut short by a crash; drop the partial digest so appends stay aligned
+                with open(path, 'r+b') as f:
+                    f.truncate(len(data) - len(data) % DIGEST_SIZE)
+            self.digests = {
+                data[i:i + DIGEST_SIZE] for i in range(0, len(data) - DIGEST_SIZE + 1, DIGEST_SIZE)
+            }
+
+    def add(self, digest: bytes) -> bool:
+        """Add a digest, returning False if it was already present"""
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        self.pending.append(digest)
+        return True
+
+    def flush(self):
+        if not self.pending:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(self.pending))
+        self.pending = []
+
+    def discard_pending(self):
+        for digest in self.pending:
+            self.digests.discard(digest)
+        self.pending = []
+
+    def reset(self):
+        self.digests = set()
+        self.pending = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _hash_file(path: str, prefix_size: int = None) -> Tuple[str, str]:
+    """Return the SHA-256 of a file and, optionally, of its first prefix_size bytes"""
+    digest = hashlib.sha256()
+    prefix = None
+    position = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            if prefix_size is not None and prefix is None and position + len(chunk) >= prefix_size:
+                cut = prefix_size - position
+                digest.update(chunk[:cut])
+                prefix = digest.hexdigest()
+                digest.update(chunk[cut:])
+            else:
+                digest.update(chunk)
+            position += len(chunk)
+    if prefix_size is not None and prefix is None and position >= prefix_size:
+        prefix = digest.hexdigest()
+    return digest.hexdigest(), prefix
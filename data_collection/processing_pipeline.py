@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ndjson_store import is_segment, iter_file_records, iter_segment_blocks, record_digest
+from processing_manifest import DIGEST_SIZE
+
+SLOT_POLL_INTERVAL = 0.1
+
+# The processor of a worker process, built once by init_worker
+_processor = None
+
+
+def init_worker(processor_factory):
+    global _processor
+    _processor = processor_factory()
+
+
+def parse_block(source, spill_path):
+    """Decode one loaded block into a DataFrame spilled to spill_path (runs in a worker process)
+
+    source is a block of NDJSON lines, or the path of a legacy JSON dump that
+    is streamed from disk. Returns the rows' 8-byte content digests,
+    concatenated, the row count and the busy time.
+    """
+    started = time.perf_counter()
+    if isinstance(source, bytes):
+        records = [json.loads(line) for line in source.splitlines() if line.strip()]
+    else:
+        records = list(iter_file_records(source))
+    pd.DataFrame(records).to_pickle(spill_path)
+    digests = b''.join(record_digest(record) for record in records)
+    return digests, len(records), time.perf_counter() - started
+
+
+def run_category_processor(method, args, parts, output_path):
+    """Run a category processor on the kept rows of its spilled blocks (runs in a worker process)"""
+    started = time.perf_counter()
+    frames = []
+    for spill_path, keep in parts:
+        df = pd.read_pickle(spill_path)
+        frames.append(df if keep is None else df[keep])
+    df = pd.concat(frames, ignore_index=True)
+    del frames
+    result = getattr(_processor, method)(df, *args)
+    result.to_pickle(output_path)
+    return len(result), time.perf_counter() - started
+
+
+@dataclass
+class CategoryJob:
+    """The files of one category to read and the processor method to run on their rows"""
+    method: str
+    sources: List[Tuple[str, int]]  # (path, offset to start reading at)
+    args: tuple = ()
+    # Digest filter, e.g. DigestIndex.add; by default repeats within the run are dropped
+    keep: Optional[Callable[[bytes], bool]] = None
+
+
+@dataclass
+class CategoryResult:
+    data: Optional[pd.DataFrame]  # None when the processor failed
+    records: int = 0  # rows kept and handed to the processor
+    offsets: Dict[str, int] = field(default_factory=dict)  # end of the consumed prefix of each segment
+    failed: Set[str] = field(default_factory=set)  # files that could not be read completely
+
+
+class StageTimings:
+    """Busy time, item count and wall-clock span recorded per pipeline stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, busy, items=1):
+        now = time.perf_counter()
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'busy': 0.0, 'items': 0, 'first': now - busy, 'last': now})
+            entry['busy'] += busy
+            entry['items'] += items
+            entry['first'] = min(entry['first'], now - busy)
+            entry['last'] = max(entry['last'], now)
+
+    def summary(self):
+        return {
+            stage: {
+                'items': entry['items'],
+                'busy_seconds': round(entry['busy'], 4),
+                'wall_seconds': round(entry['last'] - entry['first'], 4)
+            }
+            for stage, entry in self.stages.items()
+        }
+
+
+class CategoryProgress:
+    """Coordinator-side bookkeeping of one category moving through the stages"""
+
+    def __init__(self, job):
+        self.job = job
+        self.files_left = len(job.sources)
+        self.blocks = 0
+        self.parsed = 0
+        self.parts = []
+        self.ends = {}
+        self.next_block = {}
+        self.offsets = {path: offset for path, offset in job.sources if is_segment(path)}
+        self.failed = set()
+        self.output_path = None
+        self.submitted = False
+        self._seen = set()
+
+    def keep(self, digest):
+        if self.job.keep is not None:
+            return self.job.keep(digest)
+        if digest in self._seen:
+            return False
+        self._seen.add(digest)
+        return True
+
+    def advance(self, path, block, end):
+        # A segment is only consumed up to the first block that has not parsed
+        ends = self.ends.setdefault(path, {})
+        ends[block] = end
+        following = self.next_block.get(path, 0)
+        while following in ends:
+            self.offsets[path] = ends.pop(following)
+            following += 1
+        self.next_block[path] = following
+
+    @property
+    def complete(self):
+        return self.files_left == 0 and self.parsed == self.blocks
+
+
+class ProcessingPipeline:
+    """Three-stage load -> parse -> process pipeline over collected files
+
+    Loading runs on ``io_threads`` threads, which read each file from its start
+    offset in blocks of about ``block_size`` bytes of whole NDJSON lines
+    (legacy JSON dumps are passed on by path and streamed by the parser).
+    Parsing and per-category processing are CPU bound and run on a process
+    pool. Parse workers decode a block, spill the frame to a work directory
+    and return only its path with one digest per row; at most ``queue_size``
+    blocks are loaded or being parsed at a time. Once every block of a
+    category is parsed, the coordinator decides which rows to keep from the
+    digests, in file order, and a process worker reads the spills and runs the
+    category's processor method. The processor lives in the workers: each
+    builds its own from ``processor_factory`` when it starts.
+    """
+
+    def __init__(self, processor_factory, workers=None, io_threads=2, queue_size=8,
+                 block_size=4 * 1024 * 1024, work_dir=None):
+        self.processor_factory = processor_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.io_threads = io_threads
+        self.queue_size = queue_size
+        self.block_size = block_size
+        self.work_dir = work_dir
+        self.timings = StageTimings()
+
+    def run(self, jobs: Dict[str, CategoryJob]) -> Dict[str, CategoryResult]:
+        """Run every category's job through the stages and return its processed rows"""
+        started = time.perf_counter()
+        work_dir = tempfile.mkdtemp(prefix='pipeline_', dir=self.work_dir)
+        events = queue.Queue()
+        slots = threading.Semaphore(self.queue_size)
+        stop = threading.Event()
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                   initargs=(self.processor_factory,))
+        io = ThreadPoolExecutor(max_workers=self.io_threads)
+        progress = {category: CategoryProgress(job) for category, job in jobs.items()}
+        results = {}
+
+        try:
+            for category, job in jobs.items():
+                for index, (path, offset) in enumerate(job.sources):
+                    io.submit(self._load, pool, events, slots, stop, work_dir, category, index, path, offset)
+            for category in jobs:
+                self._maybe_process(pool, events, work_dir, category, progress[category], results)
+
+            while len(results) < len(jobs):
+                event = events.get()
+                kind, category = event[0], event[1]
+                state = progress[category]
+                if kind == 'parsed':
+                    slots.release()
+                    self._parsed(state, *event[2:])
+                elif kind == 'loaded':
+                    _, _, path, blocks, failed = event
+                    state.files_left -= 1
+                    state.blocks += blocks
+                    if failed:
+                        state.failed.add(path)
+                else:
+                    results[category] = self._processed(category, state, event[2])
+                self._maybe_process(pool, events, work_dir, category, state, results)
+        finally:
+            stop.set()
+            io.shutdown(wait=True)
+            pool.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self.timings.record('pipeline', time.perf_counter() - started, items=len(jobs))
+        return results
+
+    def _load(self, pool, events, slots, stop, work_dir, category, index, path, offset):
+        blocks = 0
+        failed = False
+        try:
+            source = iter_segment_blocks(path, offset, self.block_size) if is_segment(path) else iter([(path, None)])
+            while True:
+                # Wait for room in the bounded queue before reading the next block
+                while not slots.acquire(timeout=SLOT_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                started = time.perf_counter()
+                try:
+                    item = next(source, None)
+                    if item is None:
+                        slots.release()
+                        break
+                    block, end = item
+                    spill_path = os.path.join(work_dir, f"{category}-{index}-{blocks}.pkl")
+                    future = pool.submit(parse_block, block, spill_path)
+                except Exception:
+                    slots.release()
+                    raise
+                self.timings.record('load', time.perf_counter() - started)
+                future.add_done_callback(
+                    lambda future, block=blocks, end=end, spill_path=spill_path:
+                    events.put(('parsed', category, index, block, path, end, spill_path, future))
+                )
+                blocks += 1
+        except Exception as e:
+            logging.error(f"Error loading {os.path.basename(path)}: {str(e)}")
+            failed = True
+        events.put(('loaded', category, path, blocks, failed))
+
+    def _parsed(self, state, index, block, path, end, spill_path, future):
+        state.parsed += 1
+        try:
+            digests, rows, busy = future.result()
+        except Exception as e:
+            logging.error(f"Error parsing {os.path.basename(path)}: {str(e)}")
+            state.failed.add(path)
+            return
+        self.timings.record('parse', busy)
+        state.parts.append(((index, block), spill_path, digests, rows))
+        if end is not None:
+            state.advance(path, block, end)
+
+    def _maybe_process(self, pool, events, work_dir, category, state, results):
+        if state.submitted or not state.complete:
+            return
+        state.submitted = True
+        # Keep decisions are made in file order, so which copy of a repeated record survives is stable
+        parts = []
+        records = 0
+        for _, spill_path, digests, rows in sorted(state.parts, key=lambda part: part[0]):
+            keep = np.fromiter(
+                (state.keep(digests[i:i + DIGEST_SIZE]) for i in range(0, len(digests), DIGEST_SIZE)),
+                dtype=bool, count=rows
+            )
+            kept = int(keep.sum())
+            if kept:
+                parts.append((spill_path, None if kept == rows else keep))
+                records += kept
+        state.parts = []
+        state.records = records
+        if not parts:
+            results[category] = CategoryResult(pd.DataFrame(), 0, state.offsets, state.failed)
+            return
+        state.output_path = os.path.join(work_dir, f"{category}.out.pkl")
+        future = pool.submit(run_category_processor, state.job.method, state.job.args, parts, state.output_path)
+        future.add_done_callback(lambda future: events.put(('processed', category, future)))
+
+    def _processed(self, category, state, future):
+        try:
+            _, busy = future.result()
+            self.timings.record('process', busy)
+            data = pd.read_pickle(state.output_path)
+        except Exception as e:
+            logging.error(f"Error processing {category}: {str(e)}")
+            data = None
+        return CategoryResult(data, state.records, state.offsets, state.failed)
@@ -1,64 +1,46 @@
 import asyncio
 import logging
-from agents.agent_manager import AgentManager
-from agents.data_collector_agent import DataCollectorAgent
-from agents.data_processor_agent import DataProcessorAgent
+import os
+import sys
 
-# Define data sources for collector agents
-data_sources = [
-    {
-        "name": "real_estate",
-        "url": "https://www.zillow.com/san-francisco-ca/",
-        "type": "html",
-        "parser": {
-            "selector": ".property-card",
-            "fields": {
-                "price": ".price",
-                "beds": ".beds",
-                "baths": ".baths",
-                "sqft": ".sqft"
-            }
-        }
-    },
-    {
-        "name": "demographics",
-        "url": "https://api.census.gov/data/2020/acs/acs5",
-        "type": "json"
-    },
-    {
-        "name": "crime",
-        "url": "https://data.sfgov.org/resource/cuks-n6tp.json",
-        "type": "json"
-    },
-    {
-        "name": "amenities",
-        "url": "https://api.yelp.com/v3/businesses/search",
-        "type": "json"
-    },
-    {
-        "name": "reviews",
-        "url": "https://api.yelp.com/v3/businesses/",
-        "type": "json"
-    }
-]
+if not __package__:
+    # Run as a script rather than with ``python -m data_collection.run_agent_system``;
+    # the agents package uses relative imports, so import it from the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collection.agents.agent_manager import AgentManager
+from data_collection.agents.data_collector_agent import DataCollectorAgent
+from data_collection.agents.data_processor_agent import DataProcessorAgent
+from data_collection.agents.data_analyzer_agent import DataAnalyzerAgent
 
 async def main():
     # Create agent manager
     manager = AgentManager()
     
-    # Create and register agents
+    # Create and register agents; the ids are the message routing targets
+    # (collector -> processor_agent -> analyzer_agent)
     collector_agent = DataCollectorAgent(
-        agent_id="collector_1",
-        name="Data Collector",
-        data_sources=data_sources
+        agent_id="collector_agent",
+        name="Data Collector"
     )
     processor_agent = DataProcessorAgent(
-        agent_id="processor_1",
+        agent_id="processor_agent",
         name="Data Processor"
     )
+    analyzer_agent = DataAnalyzerAgent(
+        agent_id="analyzer_agent",
+        name="Data Analyzer"
+    )
     
+    # The collector is I/O bound and stays on the event loop; the CPU-heavy
+    # processor and analyzer run in worker processes
     manager.register_agent(collector_agent)
-    manager.register_agent(processor_agent)
+    manager.register_agent(
+        processor_agent,
+        placement="process",
+        replicas=int(os.getenv('PROCESSOR_REPLICAS', '1'))
+    )
+    manager.register_agent(analyzer_agent, placement="process")
     
     # Start the agent system
     await manager.run()
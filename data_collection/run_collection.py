@@ -45,8 +45,12 @@ def run_collection_pipeline():
             if (current_time - last_processing_time).total_seconds() >= processing_interval:
                 logging.info("Starting data processing cycle")
                 try:
+                    processor_command = ["python", "data_processor.py", "--incremental"]
+                    if os.getenv('CRIME_CHUNK_SIZE'):
+                        # Crime data is sorted out of core in chunks of this many records
+                        processor_command += ["--crime-chunk-size", os.getenv('CRIME_CHUNK_SIZE')]
                     processor_process = subprocess.Popen(
-                        ["python", "data_processor.py"],
+                        processor_command,
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE
                     )
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Paging parameters owned by the paginator; any caller-supplied values are dropped
+PAGING_PARAMS = ('$limit', '$offset', '$order')
+
+
+def checkpoint_file(url, category):
+    """Checkpoint file name of a dataset: the category plus the dataset id, or a hash of the URL"""
+    match = re.search(r'/resource/([^/.]+)', url)
+    dataset = match.group(1) if match else hashlib.blake2b(url.encode('utf-8'), digest_size=6).hexdigest()
+    return f"{category}-{dataset}.json"
+
+
+class SodaCheckpoint:
+    """High-water mark of the last ingested row for a Socrata dataset"""
+
+    def __init__(self, path):
+        self.path = path
+        self.high_water_mark = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.high_water_mark = json.load(f).get('high_water_mark')
+            except Exception as e:
+                logging.error(f"Error loading checkpoint {path}: {str(e)}")
+
+    def save(self, high_water_mark):
+        self.high_water_mark = high_water_mark
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'high_water_mark': high_water_mark, 'updated': datetime.now().isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+
+class SodaPaginator:
+    """Paginated, resumable reader for Socrata (SODA) endpoints
+
+    Rows are requested in ascending ``(order_field, tiebreak_field)`` order and only
+    rows after the checkpointed high-water mark are fetched, so every run pulls
+    just the incidents published since the previous one.
+
+    ``offset`` mode pages with ``$offset`` and fetches ``max_parallel`` pages at a
+    time. ``keyset`` mode pages sequentially with a ``$where`` on the last row seen,
+    which stays consistent if rows are inserted while paging. Pages are handed to
+    ``sink`` in order as they arrive and the checkpoint is advanced past each page
+    once ``sink`` has returned, so an interrupted run resumes where it stopped. A
+    page whose fetch raised stops the run after the pages before it are stored;
+    the error is re-raised and the checkpoint stays before the failed page. With
+    ``autocommit=False`` the checkpoint is only saved by ``commit``, for callers
+    whose sink does not store the rows itself.
+    """
+
+    def __init__(self, order_field='incident_datetime', tiebreak_field='row_id', page_size=1000,
+                 max_parallel=4, mode='offset', checkpoint_path=None, params=None, autocommit=True):
+        if mode not in ('offset', 'keyset'):
+            raise ValueError(f"Unknown pagination mode: {mode}")
+        self.order_field = order_field
+        self.tiebreak_field = tiebreak_field
+        self.page_size = page_size
+        self.max_parallel = max_parallel if mode == 'offset' else 1
+        self.mode = mode
+        self.checkpoint = SodaCheckpoint(checkpoint_path)
+        self.params = {k: v for k, v in (params or {}).items() if k not in PAGING_PARAMS}
+        self.autocommit = autocommit
+        self.pending = None
+
+    def page_params(self, after=None, offset=0):
+        """Build SoQL parameters for one page starting after the given row"""
+        params = dict(self.params)
+        params['$order'] = f"{self.order_field} ASC, {self.tiebreak_field} ASC"
+        params['$limit'] = str(self.page_size)
+        if offset:
+            params['$offset'] = str(offset)
+
+        clause = self._after_clause(after)
+        if clause:
+            existing = params.get('$where')
+            params['$where'] = f"({existing}) AND ({clause})" if existing else clause
+        return params
+
+    def ingest(self, fetch_page, sink, max_pages=None):
+        """Fetch pages with a blocking fetch_page(params) -> list and feed them to sink"""
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            def fetch_batch(param_list):
+                futures = [executor.submit(fetch_page, params) for params in param_list]
+                return [future.exception() or future.result() for future in futures]
+            return self._run(fetch_batch, sink, max_pages)
+
+    async def ingest_async(self, fetch_page, sink, max_pages=None):
+        """Fetch pages with a coroutine fetch_page(params) -> list and feed them to sink
+
+        ``sink`` may be a coroutine function; each page is stored before the next
+        one is handed over.
+        """
+        total = 0
+        after = self.checkpoint.high_water_mark
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            param_list = self._batch_params(after, max_pages, pages)
+            results = await asyncio.gather(*(fetch_page(params) for params in param_list), return_exceptions=True)
+            for page in self._pages(results):
+                stored = sink(page)
+                if inspect.isawaitable(stored):
+                    await stored
+                total += len(page)
+                after = self._advance(page)
+            self._log(total, after)
+            pages += len(param_list)
+            if self._done(results):
+                break
+        return total
+
+    def _run(self, fetch_batch, sink, max_pages):
+        total = 0
+        after = self.checkpoint.high_water_mark
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            param_list = self._batch_params(after, max_pages, pages)
+            results = fetch_batch(param_list)
+            total, after, done = self._consume(results, sink, total, after)
+            pages += len(param_list)
+            if done:
+                break
+        return total
+
+    def _batch_params(self, after, max_pages, pages):
+        count = self.max_parallel
+        if max_pages is not None:
+            count = min(count, max_pages - pages)
+        # Offsets are relative to the high-water mark, which advances every batch
+        return [self.page_params(after, offset=i * self.page_size) for i in range(count)]
+
+    def _consume(self, results, sink, total, after):
+        for page in self._pages(results):
+            sink(page)
+            total += len(page)
+            after = self._advance(page)
+        self._log(total, after)
+        return total, after, self._done(results)
+
+    def _pages(self, results):
+        """Yield the non-empty pages of a batch in order, up to the end of the result set"""
+        for page in results:
+            if isinstance(page, BaseException):
+                raise page
+            if page:
+                yield page
+            if len(page or []) < self.page_size:
+                # A short page is the end of the result set; later pages are empty
+                return
+
+    def _done(self, results):
+        return any(not isinstance(page, BaseException) and len(page or []) < self.page_size for page in results)
+
+    def _advance(self, page):
+        """Move the high-water mark past a page that has been stored"""
+        last = page[-1]
+        after = {
+            self.order_field: last.get(self.order_field),
+            self.tiebreak_field: last.get(self.tiebreak_field)
+        }
+        if self.autocommit:
+            self.checkpoint.save(after)
+        else:
+            self.pending = after
+        return after
+
+    def _log(self, total, after):
+        logging.info(f"Ingested {total} rows, high-water mark {after}")
+
+    def commit(self):
+        """Save the high-water mark of the rows handed to sink since the last commit"""
+        if self.pending is not None:
+            self.checkpoint.save(self.pending)
+            self.pending = None
+
+    def _after_clause(self, after):
+        if not after or after.get(self.order_field) is None:
+            return None
+        order_value = _quote(after[self.order_field])
+        tiebreak_value = after.get(self.tiebreak_field)
+        if tiebreak_value is None:
+            return f"{self.order_field} > {order_value}"
+        return (
+            f"{self.order_field} > {order_value} OR "
+            f"({self.order_field} = {order_value} AND {self.tiebreak_field} > {_quote(tiebreak_value)})"
+        )
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
@@ -0,0 +1,70 @@
+import builtins
+import random
+import pandas as pd
+import pytest
+import chunked_processing
+from chunked_processing import ChunkedSortProcessor
+
+def shuffled_incidents(count, copies, seed=7):
+    """count distinct incidents, the first `copies` of them repeated, in random order"""
+    incidents = [
+        {'id': i, 'date': (pd.Timestamp('2024-01-01') + pd.Timedelta(hours=(i * 37) % 500)).isoformat()}
+        for i in range(count)
+    ]
+    records = incidents + [dict(record) for record in incidents[:copies]]
+    random.Random(seed).shuffle(records)
+    return records
+
+class OpenRunCounter:
+    """Tracks how many run files are open at once"""
+
+    def __init__(self):
+        self.open = 0
+        self.peak = 0
+
+    def __call__(self, path, mode='r', *args, **kwargs):
+        f = builtins.open(path, mode, *args, **kwargs)
+        if mode == 'r':
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+            close = f.close
+
+            def counted_close():
+                if not f.closed:
+                    self.open -= 1
+                close()
+            f.close = counted_close
+        return f
+
+def test_merge_keeps_order_and_drops_repeats_across_runs(tmp_path, monkeypatch):
+    counter = OpenRunCounter()
+    monkeypatch.setattr(chunked_processing, 'open', counter, raising=False)
+    processor = ChunkedSortProcessor(chunk_size=10, work_dir=str(tmp_path), fan_in=3)
+    written = []
+
+    def write_batches(frames, date_column):
+        written.extend(frames)
+        return date_column
+
+    assert processor.process(shuffled_incidents(200, 60), write_batches) == 'date'
+    # 26 runs merged three at a time: 9, then 3, then the final merge
+    assert processor.stats['runs'] == 26
+    assert counter.peak <= 3
+    assert counter.open == 0
+    assert list(tmp_path.iterdir()) == []
+
+    assert all(len(frame) <= 10 for frame in written)
+    result = pd.concat(written, ignore_index=True)
+    assert sorted(result['id']) == list(range(200))
+    assert result['date'].is_monotonic_increasing
+    assert processor.stats['duplicates'] == 60
+
+def test_single_pass_matches_multi_pass(tmp_path):
+    records = shuffled_incidents(120, 30, seed=3)
+    outputs = []
+    for fan_in in (2, 1000):
+        processor = ChunkedSortProcessor(chunk_size=7, work_dir=str(tmp_path), fan_in=fan_in)
+        outputs.append(processor.process(records, lambda frames, _: pd.concat(frames, ignore_index=True)))
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+    with pytest.raises(ValueError):
+        ChunkedSortProcessor(fan_in=1)
@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from data_collection.columnar_store import ColumnarStore, field_equals
+
+def incidents(days, start='2024-01-01', per_day=3):
+    timestamps = pd.date_range(start, periods=days, freq='D').repeat(per_day)
+    return pd.DataFrame({
+        'incident_datetime': timestamps + pd.to_timedelta(list(range(per_day)) * days, unit='h'),
+        'incident_category': ['Theft', 'Assault', 'Burglary'] * days,
+        'count': range(days * per_day)
+    })
+
+def test_partitions_by_month_and_prunes_reads(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    df = incidents(90)
+    store.write('crime', df, date_column='incident_datetime')
+
+    assert sorted(os.listdir(store.category_path('crime'))) == [
+        '_meta.json', 'month=2024-01', 'month=2024-02', 'month=2024-03'
+    ]
+    assert len(store.partition_files('crime')) == 3
+    # Only February's files are opened; rows are filtered to the day
+    assert [os.path.basename(os.path.dirname(f)) for f in store.partition_files('crime', '2024-02-10', '2024-02-12')] == [
+        'month=2024-02'
+    ]
+    window = store.read('crime', columns=['incident_datetime', 'count', 'missing'],
+                        start='2024-02-10', end='2024-02-12')
+    assert list(window.columns) == ['incident_datetime', 'count']
+    expected = df[(df['incident_datetime'] >= '2024-02-10') & (df['incident_datetime'] < '2024-02-13')]
+    assert window['count'].tolist() == expected['count'].tolist()
+
+    thefts = store.read('crime', predicate=field_equals('incident_category', 'Theft'), end='2024-01-31')
+    assert len(thefts) == 31
+    assert set(thefts['incident_category']) == {'Theft'}
+
+    full = store.read('crime').sort_values('count', ignore_index=True)
+    pd.testing.assert_frame_equal(full[df.columns], df, check_dtype=False, check_index_type=False)
+
+def test_appending_every_cycle_compacts_small_files(tmp_path):
+    store = ColumnarStore(str(tmp_path), compact_files=4)
+    frames = [incidents(2, start=f"2024-03-{day:02d}") for day in range(1, 29, 2)]
+    for df in frames:
+        store.write('crime', df, date_column='incident_datetime', mode='append')
+
+    part_dir = os.path.join(store.category_path('crime'), 'month=2024-03')
+    assert len(os.listdir(part_dir)) <= 5
+    assert not [f for f in os.listdir(part_dir) if f.endswith('.tmp')]
+    data = store.read('crime')
+    assert sorted(data['incident_datetime']) == sorted(pd.concat(frames)['incident_datetime'])
+
+def test_legacy_daily_partitions_are_still_read(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    df = incidents(4, start='2024-01-30')
+    for day, part in df.groupby(df['incident_datetime'].dt.strftime('%Y-%m-%d')):
+        part_dir = os.path.join(store.category_path('crime'), f"date={day}")
+        os.makedirs(part_dir)
+        store._write_table(store._to_table(part), os.path.join(part_dir, 'part-0.parquet'))
+    store._write_meta(store.category_path('crime'), {'date_column': 'incident_datetime'})
+    store.write('crime', incidents(1, start='2024-02-15'), date_column='incident_datetime', mode='append')
+
+    assert len(store.partition_files('crime', '2024-01-30', '2024-01-31')) == 2
+    assert len(store.partition_files('crime', start='2024-02-01')) == 3
+    assert len(store.read('crime', start='2024-02-01')) == 9
@@ -0,0 +1,63 @@
+import os
+import pytest
+from data_collection.config import Config
+
+KEYS = ('RATE_LIMIT_DELAY', 'MAX_RETRIES', 'LOG_FILE_PATH', 'YELP_API_KEY')
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    # Config writes .env values into os.environ; monkeypatch restores them afterwards
+    for key in KEYS:
+        monkeypatch.setenv(key, '')
+        monkeypatch.delenv(key)
+    monkeypatch.setenv('LOG_FILE_PATH', str(tmp_path / 'logs' / 'test.log'))
+    return tmp_path / '.env'
+
+def edit(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+def test_nothing_is_read_until_a_section_is_used(env_file):
+    edit(env_file, 'RATE_LIMIT_DELAY=5\n', 1_000_000)
+    config = Config(env_file=str(env_file))
+    assert not config.reload_if_changed()
+    assert 'RATE_LIMIT_DELAY' not in os.environ
+
+    assert config.rate_limit.delay == 5
+    assert config.rate_limit is config.rate_limit
+    # Sections that are never used are never validated
+    assert 'api' not in config.__dict__
+    with pytest.raises(ValueError):
+        config.api
+    with pytest.raises(AttributeError):
+        config.unknown
+
+def test_edits_to_env_file_are_picked_up(env_file):
+    edit(env_file, 'RATE_LIMIT_DELAY=5\nMAX_RETRIES=2\n', 1_000_000)
+    config = Config(env_file=str(env_file))
+    section = config.rate_limit
+    assert not config.reload_if_changed()
+    assert config.rate_limit is section
+
+    edit(env_file, 'RATE_LIMIT_DELAY=7\n', 1_000_010)
+    assert config.reload_if_changed()
+    assert not config.reload_if_changed()
+    # Held references keep the old values; the removed key falls back to its default
+    assert section.delay == 5
+    assert (config.rate_limit.delay, config.rate_limit.max_retries) == (7, 3)
+    assert 'MAX_RETRIES' not in os.environ
+
+def test_real_environment_wins_over_env_file(env_file, monkeypatch):
+    edit(env_file, 'RATE_LIMIT_DELAY=5\nMAX_RETRIES=2\n', 1_000_000)
+    monkeypatch.setenv('MAX_RETRIES', '9')
+    config = Config(env_file=str(env_file))
+    assert config.rate_limit.max_retries == 9
+
+    edit(env_file, 'RATE_LIMIT_DELAY=5\n', 1_000_010)
+    assert config.reload_if_changed()
+    assert config.rate_limit.max_retries == 9
+
+    # A change to the process environment alone also triggers a reload
+    monkeypatch.setenv('MAX_RETRIES', '4')
+    assert config.reload_if_changed()
+    assert config.rate_limit.max_retries == 4
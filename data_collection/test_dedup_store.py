@@ -0,0 +1,71 @@
+import os
+import pytest
+from data_collection.dedup_store import BloomFilter, DedupStore, record_key
+
+def records(start, stop, timestamp='2024-01-01T00:00:00'):
+    return [{'id': i, 'value': i * 2, 'timestamp': timestamp} for i in range(start, stop)]
+
+def test_record_key_ignores_fetch_time_only():
+    record = {'id': 1, 'value': 2, 'timestamp': 'a'}
+    assert record_key(record, 'crime') == record_key(dict(record, timestamp='b'), 'crime')
+    assert record_key(record, 'crime') != record_key(dict(record, value=3), 'crime')
+    assert record_key(record, 'crime') != record_key(record, 'amenities')
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [record_key({'id': i}, 'crime') for i in range(5000)]
+    bloom = BloomFilter(5000, error_rate=0.01)
+    bloom.add_many(keys)
+    assert bloom.contains_many(keys).all()
+    others = [record_key({'id': i}, 'other') for i in range(5000)]
+    assert bloom.contains_many(others).mean() < 0.03
+
+def test_filter_new_marks_nothing_until_mark_seen(tmp_path):
+    store = DedupStore(str(tmp_path / 'dedup.sqlite3'))
+    batch = records(0, 10) + records(5, 10, timestamp='later')
+    new, keys = store.filter_new(batch, 'crime')
+    assert [r['id'] for r in new] == list(range(10))
+    assert len(store) == 0
+    # Not marked yet, so the same records are still new
+    assert len(store.filter_new(batch, 'crime')[0]) == 10
+
+    store.mark_seen(keys)
+    new, _ = store.filter_new(records(5, 15, timestamp='next cycle'), 'crime')
+    assert [r['id'] for r in new] == list(range(10, 15))
+    assert store.first_seen(records(0, 1)[0], 'crime') is not None
+    assert store.first_seen(records(99, 100)[0], 'crime') is None
+    store.close()
+
+def test_seen_records_persist_across_restarts(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite3')
+    store = DedupStore(path)
+    store.store_new(records(0, 100), 'crime', lambda batch: None)
+    store.close()
+
+    reopened = DedupStore(path)
+    assert len(reopened) == 100
+    new, _ = reopened.filter_new(records(50, 150), 'crime')
+    assert [r['id'] for r in new] == list(range(100, 150))
+    reopened.close()
+
+def test_failed_sink_leaves_records_unseen(tmp_path):
+    store = DedupStore(str(tmp_path / 'dedup.sqlite3'))
+
+    def failing_sink(batch):
+        raise IOError("disk full")
+
+    with pytest.raises(IOError):
+        store.store_new(records(0, 10), 'crime', failing_sink)
+    stored = []
+    assert store.store_new(records(0, 10), 'crime', stored.extend) == 10
+    assert store.store_new(records(0, 10), 'crime', stored.extend) == 0
+    assert len(stored) == 10
+    store.close()
+
+def test_filter_grows_past_its_capacity(tmp_path):
+    store = DedupStore(str(tmp_path / 'dedup.sqlite3'), capacity=100)
+    for start in range(0, 1000, 100):
+        store.store_new(records(start, start + 100), 'crime', lambda batch: None)
+    assert store.bloom.capacity >= 1000
+    assert store.filter_new(records(0, 1000), 'crime')[0] == []
+    assert os.path.exists(store.path)
+    store.close()
@@ -0,0 +1,95 @@
+import gzip
+import json
+import pytest
+import ndjson_store
+from ndjson_store import (NDJSONSegmentWriter, RecentDigests, iter_file_records, iter_records,
+                          iter_segment_blocks, iter_segment_entries, list_segments, record_digest)
+
+def incidents(start, stop):
+    return [{'id': i, 'value': f"v{i}"} for i in range(start, stop)]
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ndjson_store.os, 'fsync', calls.append)
+    return calls
+
+def test_segments_rotate_by_size_and_keep_write_order(tmp_path):
+    line_size = len(json.dumps(incidents(0, 1)[0], separators=(',', ':'))) + 1
+    with NDJSONSegmentWriter(str(tmp_path), 'crime', max_segment_bytes=10 * line_size) as writer:
+        assert writer.append(incidents(0, 25)) == 25
+    segments = list_segments(str(tmp_path), 'crime')
+    assert len(segments) == 3
+    assert [len(list(iter_file_records(path))) for path in segments] == [10, 10, 5]
+    assert [r['id'] for r in iter_records(str(tmp_path), 'crime')] == list(range(25))
+
+def test_segments_rotate_by_age(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(ndjson_store.time, 'monotonic', lambda: clock[0])
+    writer = NDJSONSegmentWriter(str(tmp_path), 'crime', max_segment_age=60)
+    writer.append(incidents(0, 5))
+    first = writer.path
+    clock[0] += 61
+    writer.append(incidents(5, 10))
+    writer.close()
+    assert writer.path != first
+    assert len(list_segments(str(tmp_path), 'crime')) == 2
+
+@pytest.mark.parametrize('policy, appends, seals', [('always', 3, 1), ('rotate', 0, 1), ('never', 0, 0)])
+def test_fsync_policy(tmp_path, fsyncs, policy, appends, seals):
+    writer = NDJSONSegmentWriter(str(tmp_path), 'crime', fsync_policy=policy)
+    for start in range(0, 30, 10):
+        writer.append(incidents(start, start + 10))
+    assert len(fsyncs) == appends
+    writer.close()
+    assert len(fsyncs) == appends + seals
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        NDJSONSegmentWriter(str(tmp_path), 'crime', fsync_policy='sometimes')
+
+def test_active_compressed_segment_is_readable_and_resumable(tmp_path):
+    writer = NDJSONSegmentWriter(str(tmp_path), 'crime', compress=True)
+    writer.append(incidents(0, 10))
+    # Not sealed: flushed gzip members without an end-of-stream marker yet
+    entries = list(iter_segment_entries(writer.path))
+    assert [r['id'] for r, _ in entries] == list(range(10))
+    writer.append(incidents(10, 15))
+    writer.close()
+    resumed = [r['id'] for r, _ in iter_segment_entries(writer.path, entries[-1][1])]
+    assert resumed == list(range(10, 15))
+    with gzip.open(writer.path, 'rb') as f:
+        # Offsets count uncompressed bytes
+        assert entries[-1][1] == len(b''.join(f.readlines()[:10]))
+
+def test_partial_trailing_line_is_left_for_the_next_reader(tmp_path):
+    path = tmp_path / 'crime_1.ndjson'
+    path.write_bytes(b'{"id": 1}\n{"id": 2}\n{"id": 3')
+    assert [r['id'] for r, _ in iter_segment_entries(str(path))] == [1, 2]
+    blocks = list(iter_segment_blocks(str(path), block_size=4))
+    assert b''.join(block for block, _ in blocks) == b'{"id": 1}\n{"id": 2}\n'
+    assert blocks[-1][1] == 20
+
+def test_legacy_json_dumps_are_streamed(tmp_path):
+    with open(tmp_path / 'crime_20240101_000000.json', 'w') as f:
+        json.dump(incidents(0, 3), f, indent=2)
+    NDJSONSegmentWriter(str(tmp_path), 'crime').append(incidents(3, 5))
+    assert [r['id'] for r in iter_records(str(tmp_path), 'crime')] == list(range(5))
+
+def test_distinct_window_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(ndjson_store, 'DISTINCT_WINDOW', 5)
+    writer = NDJSONSegmentWriter(str(tmp_path), 'crime')
+    writer.append(incidents(0, 10) + incidents(7, 10) + incidents(0, 2))
+    writer.close()
+    # Recent repeats are skipped; 0 and 1 fell out of the window of 5
+    assert [r['id'] for r in iter_records(str(tmp_path), 'crime', distinct=True)] == list(range(10)) + [0, 1]
+
+    window = RecentDigests(maxlen=3)
+    assert [window.add(d) for d in b'abcab'] == [True, True, True, False, False]
+    assert len(window.digests) == 3
+
+def test_key_store_deduplicates_against_everything_it_holds(tmp_path):
+    NDJSONSegmentWriter(str(tmp_path), 'crime').append(incidents(0, 10) + incidents(0, 10))
+    held = {record_digest(r) for r in incidents(0, 5)}
+    store = type('Store', (), {'add': lambda self, d: d not in held and not held.add(d)})()
+    assert [r['id'] for r in iter_records(str(tmp_path), 'crime', key_store=store)] == list(range(5, 10))
@@ -0,0 +1,96 @@
+import json
+import os
+from processing_manifest import DigestIndex, ProcessingManifest
+
+def append_lines(path, *ids):
+    with open(path, 'a') as f:
+        f.writelines(json.dumps({'id': i}) + '\n' for i in ids)
+
+def scan(manifest, base):
+    changes, removed = manifest.scan(str(base), 'crime')
+    return {change.name: (change.action, change.offset) for change in changes}, removed
+
+def commit_all(manifest, base):
+    changes, _ = manifest.scan(str(base), 'crime')
+    for change in changes:
+        manifest.commit('crime', change, os.path.getsize(change.path))
+
+def test_watermark_resumes_appended_segments(tmp_path):
+    base = tmp_path / 'collected'
+    base.mkdir()
+    segment = base / 'crime_20240101.ndjson'
+    append_lines(segment, 1, 2)
+    manifest = ProcessingManifest(str(tmp_path / 'manifest.json'))
+
+    assert scan(manifest, base) == ({'crime_20240101.ndjson': ('new', 0)}, [])
+    commit_all(manifest, base)
+    consumed = os.path.getsize(segment)
+    assert scan(manifest, base) == ({}, [])
+
+    append_lines(segment, 3)
+    assert scan(manifest, base) == ({'crime_20240101.ndjson': ('append', consumed)}, [])
+
+    # Rewriting the consumed bytes invalidates the watermark even if the file grew
+    segment.write_text(json.dumps({'id': 9}) + '\n' + json.dumps({'id': 2}) + '\n' + json.dumps({'id': 3}) + '\n')
+    assert scan(manifest, base) == ({'crime_20240101.ndjson': ('replaced', 0)}, [])
+
+def test_touched_files_are_not_reprocessed(tmp_path):
+    base = tmp_path / 'collected'
+    base.mkdir()
+    dump = base / 'crime_20240101.json'
+    dump.write_text(json.dumps([{'id': 1}]))
+    manifest = ProcessingManifest(str(tmp_path / 'manifest.json'))
+    commit_all(manifest, base)
+
+    os.utime(dump, (1_000_000, 1_000_000))
+    assert scan(manifest, base) == ({}, [])
+    assert manifest.entries['crime']['crime_20240101.json']['mtime'] == 1_000_000
+
+    dump.write_text(json.dumps([{'id': 2}]))
+    assert scan(manifest, base) == ({'crime_20240101.json': ('replaced', 0)}, [])
+
+def test_manifest_survives_restarts_and_reports_removed_files(tmp_path):
+    base = tmp_path / 'collected'
+    base.mkdir()
+    for name in ('crime_1.ndjson', 'crime_2.ndjson', 'amenities_1.ndjson'):
+        append_lines(base / name, 1)
+    path = str(tmp_path / 'state' / 'manifest.json')
+    manifest = ProcessingManifest(path)
+    commit_all(manifest, base)
+    manifest.save()
+
+    os.remove(base / 'crime_1.ndjson')
+    reloaded = ProcessingManifest(path)
+    assert reloaded.has_category('crime')
+    assert sorted(reloaded.entries['crime']) == ['crime_1.ndjson', 'crime_2.ndjson']
+    assert scan(reloaded, base) == ({}, ['crime_1.ndjson'])
+
+    with open(path, 'w') as f:
+        f.write('{"crime": ')
+    assert ProcessingManifest(path).entries == {}
+
+def test_digest_index_persists_only_flushed_digests(tmp_path):
+    path = str(tmp_path / 'index' / 'crime.digests')
+    index = DigestIndex(path)
+    assert index.add(b'a' * 8)
+    assert not index.add(b'a' * 8)
+    index.add(b'b' * 8)
+    index.flush()
+    index.add(b'c' * 8)
+    index.discard_pending()
+    assert not index.add(b'b' * 8)
+    assert index.add(b'c' * 8)
+    index.discard_pending()
+
+    # A digest cut short by a crash mid-write is ignored
+    with open(path, 'ab') as f:
+        f.write(b'dddd')
+    reloaded = DigestIndex(path)
+    assert reloaded.digests == {b'a' * 8, b'b' * 8}
+    assert reloaded.add(b'c' * 8)
+    reloaded.flush()
+    assert DigestIndex(path).digests == {b'a' * 8, b'b' * 8, b'c' * 8}
+
+    reloaded.reset()
+    assert not os.path.exists(path)
+    assert DigestIndex(path).add(b'a' * 8)
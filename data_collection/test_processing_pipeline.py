@@ -0,0 +1,100 @@
+import gzip
+import json
+import pandas as pd
+import pytest
+from ndjson_store import NDJSONSegmentWriter, list_segments
+from processing_pipeline import CategoryJob, ProcessingPipeline
+
+class TaggingProcessor:
+    """Built in each worker process; tags rows with the worker's view of them"""
+
+    def tag(self, df, label='processed'):
+        return df.assign(label=label, batch_rows=len(df))
+
+def write_segment(path, records, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, 'wb') as f:
+        f.write(b''.join(json.dumps(record).encode() + b'\n' for record in records))
+
+def test_rows_are_deduplicated_in_file_order_across_blocks(tmp_path):
+    records = [{'id': i, 'value': i % 7} for i in range(300)]
+    write_segment(tmp_path / 'crime_1.ndjson', records[:200])
+    write_segment(tmp_path / 'crime_2.ndjson.gz', records[100:], compress=True)
+    with open(tmp_path / 'crime_0.json', 'w') as f:
+        json.dump(records[:10] + [{'id': -1, 'value': 0}], f)
+
+    # Blocks of a few lines each, so every file is split across many parse jobs
+    pipeline = ProcessingPipeline(TaggingProcessor, workers=2, queue_size=3, block_size=64, work_dir=str(tmp_path))
+    sources = [(path, 0) for path in list_segments(str(tmp_path), 'crime')]
+    results = pipeline.run({
+        'crime': CategoryJob('tag', sources, ('crime',)),
+        'reviews': CategoryJob('tag', [])
+    })
+
+    crime = results['crime']
+    assert crime.records == 301
+    assert crime.data['id'].tolist() == list(range(10)) + [-1] + list(range(10, 300))
+    assert (crime.data['label'] == 'crime').all()
+    assert (crime.data['batch_rows'] == 301).all()
+    assert crime.failed == set()
+    # Segments are consumed to their (uncompressed) end; the legacy dump is not a segment
+    for path, _ in sources:
+        if path.endswith('.json'):
+            assert path not in crime.offsets
+        else:
+            with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as f:
+                assert crime.offsets[path] == len(f.read())
+    assert results['reviews'].data.empty
+    assert set(pipeline.timings.summary()) == {'load', 'parse', 'process', 'pipeline'}
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith('pipeline_')] == []
+
+def test_offset_stops_before_a_block_that_fails_to_parse(tmp_path):
+    path = tmp_path / 'crime_1.ndjson'
+    good = b''.join(json.dumps({'id': i}).encode() + b'\n' for i in range(20))
+    path.write_bytes(good + b'{not json}\n' + good + b'{"id": 99')
+
+    seen = set()
+    keep = lambda digest: digest not in seen and not seen.add(digest)
+    pipeline = ProcessingPipeline(TaggingProcessor, workers=2, block_size=len(good) - 1)
+    result = pipeline.run({'crime': CategoryJob('tag', [(str(path), 0)], keep=keep)})['crime']
+
+    assert result.failed == {str(path)}
+    assert result.offsets[str(path)] < len(good) + len('{not json}\n')
+    # The trailing partial line is never part of a block
+    assert 99 not in result.data['id'].tolist()
+    assert len(seen) == result.records
+
+def test_incremental_runs_go_through_the_pipeline(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.chdir(tmp_path)
+    from data_processor import NeighborhoodDataProcessor
+
+    crime = [{'id': i, 'date': f"2024-01-{i % 28 + 1:02d}"} for i in range(400)]
+    amenities = [{'id': i, 'neighborhood': 'Mission', 'category': 'cafe', 'count': 1, 'rating': float(i % 5)} for i in range(10)]
+    writer = NDJSONSegmentWriter('collected_data', 'crime')
+    writer.append(crime[:300])
+    amenity_writer = NDJSONSegmentWriter('collected_data', 'amenities')
+    amenity_writer.append(amenities[:6])
+
+    processor = NeighborhoodDataProcessor(workers=2)
+    first = processor.run_processing(incremental=True)
+    assert len(first['crime']) == 300
+    assert set(processor.stage_timings) >= {'load', 'parse', 'process', 'write', 'pipeline'}
+
+    # The active segments grow; only the new (and not yet seen) records are processed
+    writer.append(crime[250:])
+    amenity_writer.append(amenities[6:])
+    writer.close()
+    amenity_writer.close()
+    second = processor.run_processing(incremental=True)
+    assert sorted(second['crime']['id']) == list(range(300, 400))
+    assert processor.run_processing(incremental=True) == {}
+
+    stored = processor.store.read('crime')
+    assert sorted(stored['id']) == list(range(400))
+    # Amenity aggregates merge with the saved state rather than being recomputed from the new rows
+    assert second['amenities'].loc[0, 'count'] == 10
+    assert second['amenities'].loc[0, 'rating'] == pytest.approx(2.0)
+    manifest = processor.manifest.entries['crime']
+    path = list_segments('collected_data', 'crime')[0]
+    assert manifest[path.split('/')[-1]]['offset'] == len(open(path, 'rb').read())
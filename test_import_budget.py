@@ -0,0 +1,71 @@
+"""Import-time budgets of the entry points
+
+Runs the module-level imports of each entry point in a fresh interpreter
+under ``python -X importtime`` and compares the cumulative import time of
+its top-level imports to the entry point's budget. The heavy optional
+dependencies must not be loaded at all; the agents load them on first use.
+Entry points whose third-party dependencies are not installed are skipped.
+Set IMPORT_BUDGET_SCALE to loosen the budgets on slow runners.
+"""
+import ast
+import os
+import re
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds of cumulative import time per entry point, on a warm file system cache
+BUDGETS = {
+    'app.py': 3.0,
+    'server.py': 2.0,
+    'data_collection/run_agent_system.py': 3.0,
+}
+
+# Loaded on first use only
+LAZY_MODULES = ['plotly', 'prophet', 'tensorflow']
+
+def top_level_imports(path: str) -> str:
+    """Source of the module-level import statements of a file"""
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read(), filename=path)
+    statements = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in statements)
+
+def import_times(entry_point: str):
+    """Cumulative import time in seconds of every top-level import, and all modules loaded"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', top_level_imports(os.path.join(ROOT, entry_point))],
+        cwd=ROOT, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        missing = re.search(r"No module named '([\w.]+)'", result.stderr)
+        package = missing.group(1).split('.')[0] if missing else None
+        if package is not None and not os.path.exists(os.path.join(ROOT, package)):
+            pytest.skip(f"{entry_point} needs {package}, which is not installed")
+        lines = result.stderr.strip().splitlines()
+        pytest.fail(f"{entry_point} failed to import: {lines[-1] if lines else f'exit code {result.returncode}'}")
+
+    top_level, loaded = {}, set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; nested imports are indented
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        loaded.add(name.strip())
+        if not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative) / 1e6
+    return top_level, loaded
+
+@pytest.mark.parametrize('entry_point', list(BUDGETS))
+def test_entry_point_imports_within_budget(entry_point):
+    top_level, loaded = import_times(entry_point)
+    assert [m for m in LAZY_MODULES if any(name.split('.')[0] == m for name in loaded)] == []
+
+    budget = BUDGETS[entry_point] * float(os.getenv('IMPORT_BUDGET_SCALE', '1.0'))
+    seconds = sum(top_level.values())
+    heaviest = ", ".join(
+        f"{name} {time:.2f}s" for name, time in sorted(top_level.items(), key=lambda item: -item[1])[:5]
+    )
+    assert seconds <= budget, f"importing {entry_point} took {seconds:.2f}s (budget {budget:.2f}s): {heaviest}"